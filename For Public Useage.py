@@ -1,92 +1,84 @@
+import io
+import os
+import sqlite3
+import tempfile
+import time
+
+import pandas as pd
 import streamlit as st
 
+from growagarden.bulk import value_csv, value_parquet
+from growagarden.catalog import get_catalog
+from growagarden.core import best_mutations, top_crops
+from growagarden.metrics import timer
+from growagarden.price_history import DAY, PriceHistory
+from growagarden.rankings import METRICS
+from growagarden.streamlit_cache import sorted_options, values_tables
+from growagarden.streamlit_metrics import finish_rerun, profiling_panel
+from growagarden.trade_optimizer import balance_trade
+from growagarden.valuation import CALCULATION_MODES, MODE_PER_ITEM, MODE_PER_KG
+
 # ✅ MUST BE FIRST
 st.set_page_config(page_title="Grow a Garden App", layout="wide")
 
-# === Crop Values ===
-BASE_PRICES = {
-    "Carrot": 22, "Strawberry": 19, "Blueberry": 21, "Orange Tulip": 792,
-    "Tomato": 35, "Corn": 44, "Daffodil": 988, "Watermelon": 2905,
-    "Pumpkin": 3854, "Apple": 266, "Bamboo": 3944, "Coconut": 2670,
-    "Cactus": 3224, "Dragon Fruit": 4566, "Mango": 6308, "Grape": 7554,
-    "Mushroom": 142443, "Pepper": 7577, "Cacao": 10456, "Beanstalk": 18788,
-    "Peach": 283, "Pineapple": 2350, "Moonglow": 20300, "Blood Banana": 6100,
-    "Moon Melon": 17750, "Celestiberry": 9100, "Moonflower": 8900,
-    "Starfruit": 14559, "Mint": 6800, "Nightshade": 2300, "Raspberry": 98,
-    "Pear": 553, "Glowshroom": 282, "Moon Mango": 24340, "Moon Blossom": 53512,
-    "Soul Fruit": 3328, "Cursed Fruit": 15944, "Lotus": 24598,
-    "Candy Blossom": 99436, "Cherry Blossom": 566, "Venus Fly Trap": 18854,
-    "Banana": 1634, "Lemon": 554, "Passionfruit": 3299, "Eggplant": 7089,
-    "Cranberry": 2054, "Durian": 4911, "Easter Egg": 4844, "Papaya": 1288,
-    "Candy Sunflower": 164440, "Red Lollipop": 81297, "Chocolate Carrot": 17258,
-    "Hive Fruit": 1038, "Sunflower": 6318, "Pink Lily": 58663,
-    "Nectarine": 35000, "Purple Dahlia": 65000, "Lilac": 940000,
-    "Rose": 4513, "Foxglove": 15500
-}
+rerun_started = time.perf_counter()
 
-# === Constants ===
-PRICE_PER_KG = {
-    "Carrot": 100, "Strawberry": 80, "Blueberry": 120, "Orange Tulip": 17000,
-    "Tomato": 60, "Corn": 76, "Daffodil": 60, "Raspberry": 60, "Pear": 77,
-    "Pineapple": 750, "Peach": 90, "Apple": 77.57, "Grape": 3300,
-    "Venus Fly Trap": 1324, "Mango": 510, "Dragon Fruit": 70,
-    "Cursed Fruit": 100, "Soul Fruit": 77, "Candy Blossom": 3900, "Lotus": 435,
-    "Durian": 660, "Bamboo": 1051, "Coconut": 50, "Pumpkin": 60,
-    "Watermelon": 80, "Cactus": 1110, "Passionfruit": 1400, "Pepper": 1850,
-    "Starfruit": 5611, "Moonflower": 4000, "Moonglow": 3400,
-    "Blood Banana": 4600, "Moon Melon": 130, "Beanstalk": 2344,
-    "Moon Mango": 5544, "Mushroom": 0, "Cacao": 0, "Celestiberry": 0,
-    "Mint": 0, "Nightshade": 0, "Glowshroom": 0, "Moon Blossom": 0,
-    "Cherry Blossom": 0, "Banana": 0, "Lemon": 0, "Eggplant": 0,
-    "Cranberry": 0, "Easter Egg": 0, "Papaya": 0, "Candy Sunflower": 0,
-    "Red Lollipop": 0, "Chocolate Carrot": 0, "Hive Fruit": 0, "Sunflower": 0,
-    "Pink Lily": 0, "Nectarine": 0, "Purple Dahlia": 0, "Lilac": 0, "Rose": 0,
-    "Foxglove": 0
+# === Crop Values ===
+# Shared catalog (growagarden/data/catalog.json); picked up again on the next
+# rerun whenever the file changes.
+catalog = get_catalog()
+BASE_PRICES = catalog.base_prices
+PRICE_PER_KG = catalog.price_per_kg
+MUTATION_MULTIPLIERS = catalog.mutation_multipliers
+VALUATION = catalog.valuation
+
+# Sort crop names for selectbox consistency (cached per catalog revision)
+SORTED_CROP_NAMES, SORTED_MUTATION_NAMES = sorted_options(catalog.revision)
+
+# === Price History ===
+PRICE_HISTORY_PATH = os.environ.get("GROWAGARDEN_PRICE_DB", "/mount/data/price_history.db")
+HISTORY_WINDOWS = {"24 hours": DAY, "7 days": 7 * DAY, "30 days": 30 * DAY, "1 year": 365 * DAY}
+HISTORY_CHART = {
+    "mark": {"type": "line", "interpolate": "step-after"},
+    "encoding": {
+        "x": {"field": "Time", "type": "temporal"},
+        "y": {"field": "Price", "type": "quantitative"},
+        "color": {"field": "Series", "type": "nominal"},
+    },
 }
 
-MUTATION_MULTIPLIERS = {
-    "Wet": 2, "Chilled": 2, "Chocolate": 2, "Moonlit": 2,
-    "Bloodlit": 4, "Plasma": 5, "Frozen": 10, "Golden": 20, "Zombified": 25,
-    "Shocked": 50, "Rainbow": 50, "Celestial": 120, "Disco": 125, "Twisted": 30,
-    "Pollinated": 32, # Using the second value as requested
-    "Voided": 155,
-}
+@st.cache_resource
+def get_price_history():
+    os.makedirs(os.path.dirname(PRICE_HISTORY_PATH) or ".", exist_ok=True)
+    return PriceHistory(PRICE_HISTORY_PATH)
 
-# Sort crop names for selectbox consistency
-SORTED_CROP_NAMES = sorted(list(BASE_PRICES.keys()))
-SORTED_MUTATION_NAMES = sorted(list(MUTATION_MULTIPLIERS.keys()))
+@st.cache_resource(max_entries=4)
+def record_catalog_prices(revision):
+    # One snapshot per catalog revision; `python -m growagarden.price_history record`
+    # samples on a schedule when finer history is wanted
+    get_price_history().record_catalog(catalog)
 
 # === Helper ===
 def calculate_value(crop, units, mutations, calculation_mode):
-    initial_value = 0
+    mode = CALCULATION_MODES.get(calculation_mode)
+    if mode is None:
+        # This case should ideally not be reached if UI logic is correct
+        st.error(f"Internal error: Invalid calculation mode '{calculation_mode}'.")
+        return 0
     try:
-        if calculation_mode == "Price per KG":
-            base_unit_price = PRICE_PER_KG.get(crop, 0)
-            # Ensure units is float for weight calculation
-            initial_value = base_unit_price * float(units)
-        elif calculation_mode == "Fixed Base Price per Item":
-            base_item_price = BASE_PRICES.get(crop, 0)
-             # Ensure units is int for quantity calculation
-            initial_value = base_item_price * int(units)
-        else:
-            # This case should ideally not be reached if UI logic is correct
-            st.error(f"Internal error: Invalid calculation mode '{calculation_mode}'.")
-            return 0
+        # Weight is a float, quantity a whole number of items
+        units = float(units) if mode == MODE_PER_KG else int(units)
     except ValueError:
         st.error(f"Error: Could not convert units '{units}' to the required number type for {calculation_mode}.")
         return 0
 
-
-    mutation_multiplier_total = 1
-    for m in mutations:
-        mutation_multiplier_total *= MUTATION_MULTIPLIERS.get(m, 1)
-
-    return initial_value * mutation_multiplier_total
+    value = VALUATION.value(crop, units, mutations, mode)
+    return int(value) if mode == MODE_PER_ITEM else value
 
 # === UI ===
 st.title("🌿 Grow a Garden - Calculator & Trading App")
 
-tabs = st.tabs(["📈 Calculator", "🔁 Trading", "📚 Values"])
+tabs = st.tabs(["📈 Calculator", "🔁 Trading", "📚 Values", "📦 Bulk"])
 
 # Initialize session state for radio button default indices if they don't exist
 # These store the *index* of the selected option (0 or 1)
@@ -250,28 +242,162 @@ with tabs[1]:
             else:
                 st.write(f"Trader B's offer is worth {diff:,.2f} coins more.")
 
+    # --- Balance Trader B's offer from Trader A's inventory ---
+    st.subheader("🧮 Balance the Trade")
+    st.caption("List Trader A's inventory and we'll pick the items that make a fair trade for Trader B's offer.")
+    inventory_df = st.data_editor(
+        pd.DataFrame({"Crop": pd.Series(dtype=str), "Mode": pd.Series(dtype=str),
+                      "Units": pd.Series(dtype=float), "Mutations": pd.Series(dtype=object)}),
+        num_rows="dynamic",
+        column_config={
+            "Crop": st.column_config.SelectboxColumn("Crop", options=SORTED_CROP_NAMES, required=True),
+            "Mode": st.column_config.SelectboxColumn("Mode", options=radio_options_trade, default=radio_options_trade[0], required=True),
+            "Units": st.column_config.NumberColumn("Weight (kg) / Quantity", min_value=0.0, default=1.0, required=True),
+            "Mutations": st.column_config.MultiselectColumn("Mutations", options=SORTED_MUTATION_NAMES),
+        },
+        width="stretch",
+        key="inventory_editor"
+    )
+    balance_objective = st.radio("Optimise for:", ("Fewest items", "Smallest overshoot"), horizontal=True, key="balance_objective")
+
+    if st.button("Find Balanced Offer", key="btn_balance"):
+        target_value = calculate_value(crop_b, units_b, muts_b, effective_mode_b)
+        rows = inventory_df.dropna(subset=["Crop", "Mode", "Units"])
+        inventory = [(row.Crop, row.Units, list(row.Mutations) if isinstance(row.Mutations, list) else [])
+                     for row in rows.itertuples()]
+        balanced = balance_trade(
+            target_value, inventory, VALUATION,
+            mode=[CALCULATION_MODES[m] for m in rows["Mode"]],
+            objective="items" if balance_objective == "Fewest items" else "overshoot",
+        )
+        if balanced is None:
+            st.warning(f"No combination of these items is within 10% of Trader B's {target_value:,.2f} coins.")
+        else:
+            chosen, total = balanced
+            st.success(f"Offer these {len(chosen)} item(s) worth {total:,.2f} coins for Trader B's {target_value:,.2f} coins.")
+            st.dataframe(
+                [{"Crop": c, "Units": u, "Mutations": ", ".join(m) or "None"} for c, u, m in chosen],
+                width="stretch"
+            )
+
 # === Values Tab ===
 with tabs[2]:
     st.header("📚 Crop Values Reference")
     st.subheader("Defined Prices")
-    # Create a comprehensive list of all crop names from both dictionaries
-    all_crop_keys = sorted(list(set(list(BASE_PRICES.keys()) + list(PRICE_PER_KG.keys()))))
-    data_for_df = []
-    for k in all_crop_keys:
-        data_for_df.append({
-            "Crop": k,
-            "Base Price (per item)": BASE_PRICES.get(k, "N/A"), # Use .get for safety
-            "Price per KG": PRICE_PER_KG.get(k, "N/A")    # Use .get for safety
-        })
-    st.dataframe(data_for_df, use_container_width=True)
-
-    st.subheader("🌟 Mutations & Multipliers")
-    st.dataframe(
-        [{"Mutation": k, "Multiplier": v} for k, v in sorted(MUTATION_MULTIPLIERS.items())],
-        use_container_width=True
-    )
+    with timer("page.values_tab"):
+        crop_values_df, mutation_values_df = values_tables(catalog.revision)
+        st.dataframe(crop_values_df, width="stretch")
+
+        st.subheader("🌟 Mutations & Multipliers")
+        st.dataframe(mutation_values_df, width="stretch")
+
+    st.subheader("🏆 Rankings")
+    # Served from the shared ranking index (rebuilt only when the catalog changes)
+    col1, col2, col3 = st.columns(3)
+    ranking_metric = col1.selectbox("Rank by", list(METRICS), format_func=METRICS.get, key="ranking_metric")
+    ranking_count = col2.number_input("Show top", min_value=1, max_value=100, value=20, key="ranking_count")
+    ranking_budget = col3.number_input("Budget (0 = no limit)", min_value=0.0, step=100.0, key="ranking_budget")
+    ranked = top_crops(ranking_metric, int(ranking_count), max_value=ranking_budget or None, catalog=catalog)
+    st.dataframe([{"Rank": i + 1, "Crop": crop, METRICS[ranking_metric]: value}
+                  for i, (crop, value) in enumerate(ranked)], hide_index=True, width="stretch")
+
+    col1, col2 = st.columns(2)
+    combo_crop = col1.selectbox("Best mutations for", SORTED_CROP_NAMES, key="combo_crop")
+    combo_size = col2.slider("Max mutations", 1, len(SORTED_MUTATION_NAMES), 3, key="combo_size")
+    # Crops without a price per KG are ranked per item, as in the calculator
+    combo_mode = MODE_PER_KG if PRICE_PER_KG.get(combo_crop, 0) > 0 else MODE_PER_ITEM
+    combo_column = "Value per KG" if combo_mode == MODE_PER_KG else "Value per item"
+    st.dataframe([{"Mutations": ", ".join(mutations) or "None", combo_column: value}
+                  for mutations, value in best_mutations(combo_crop, 10, combo_size, mode=combo_mode,
+                                                         catalog=catalog)],
+                 hide_index=True, width="stretch")
+
+    st.subheader("📈 Price History")
+    col1, col2 = st.columns(2)
+    history_crop = col1.selectbox("Crop", SORTED_CROP_NAMES, key="history_crop")
+    history_window = col2.selectbox("Window", list(HISTORY_WINDOWS), index=1, key="history_window")
+    with timer("page.price_history"):
+        # The history DB is only opened (and the catalog snapshotted) here, so the
+        # rest of the page needs neither a writable data directory nor DB I/O
+        try:
+            record_catalog_prices(catalog.revision)
+            # Only the visible window is read, downsampled to hourly/daily means when long
+            history_end = int(time.time()) + 1
+            history = get_price_history().series(catalog.crop_id(history_crop),
+                                                 history_end - HISTORY_WINDOWS[history_window], history_end)
+        except (OSError, sqlite3.Error) as e:
+            st.warning(f"Price history is unavailable: {e}")
+        else:
+            if len(history["ts"]):
+                chart = pd.DataFrame({
+                    "Time": pd.to_datetime(history["ts"], unit="s"),
+                    "Price per KG": history["price_per_kg"],
+                    "7-day average": history["rolling_price_per_kg"],
+                }).melt("Time", var_name="Series", value_name="Price")
+                # A fixed Vega-Lite spec; st.line_chart rebuilds an Altair chart (~100 ms) every rerun
+                st.vega_lite_chart(chart, HISTORY_CHART, width="stretch")
+            else:
+                st.caption("No price history recorded for this window yet.")
+
+# === Bulk Tab ===
+with tabs[3]:
+    st.header("📦 Bulk Inventory Valuation")
+    st.caption("Upload a CSV or Parquet file with a `crop` column, a `weight` (kg) or `quantity` column, "
+               "and optional `mutations` (e.g. `Wet|Chilled`) and `mode` columns.")
+    uploaded = st.file_uploader("Inventory file", type=["csv", "parquet"], key="bulk_upload")
+
+    # Only the latest upload's export is kept; the previous temp file is closed
+    if st.session_state.get("bulk_export") is not None and (
+            uploaded is None or st.session_state.get("bulk_file_id") != uploaded.file_id):
+        st.session_state.bulk_export.close()
+        st.session_state.bulk_export = None
+        st.session_state.bulk_file_id = None
+
+    if uploaded is not None:
+        # Value each upload once, in chunks; later reruns reuse the summary and export file
+        if st.session_state.get("bulk_file_id") != uploaded.file_id:
+            export = tempfile.TemporaryFile(mode="w+b")
+            export_text = io.TextIOWrapper(export, encoding="utf-8", newline="")
+            try:
+                if uploaded.name.lower().endswith(".parquet"):
+                    summary = value_parquet(uploaded, export_text)
+                else:
+                    summary = value_csv(io.TextIOWrapper(uploaded, encoding="utf-8", newline=""), export_text)
+                export_text.flush()
+                export_text.detach()
+                st.session_state.bulk_file_id = uploaded.file_id
+                st.session_state.bulk_summary = summary
+                st.session_state.bulk_export = export
+            except ValueError as e:
+                export.close()
+                st.session_state.bulk_file_id = None
+                st.error(f"Could not read '{uploaded.name}': {e}")
+
+        if st.session_state.get("bulk_file_id") == uploaded.file_id:
+            summary = st.session_state.bulk_summary
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Rows valued", f"{summary.rows:,}")
+            col2.metric("Total value", f"{summary.total:,.2f}")
+            col3.metric("Skipped rows", f"{summary.invalid_rows:,}")
+
+            st.subheader("By Crop")
+            st.dataframe(summary.by_crop(), width="stretch")
+            st.subheader("By Mutation")
+            st.dataframe(summary.by_mutation(), width="stretch")
+
+            # Deferred: the export is only read from disk when the button is clicked, not on every rerun
+            def read_export(export=st.session_state.bulk_export):
+                export.seek(0)
+                return export.read()
+
+            st.download_button("Download valued file", read_export,
+                               file_name=uploaded.name.rsplit(".", 1)[0] + "_valued.csv",
+                               mime="text/csv", key="bulk_download")
 
 st.markdown("---")
 st.caption("Grow a Garden Fan Tool, By Gregothey.")
 st.caption("Prices are rough estimates and may not be exact.")
 st.caption("C/KG Will Take Longer To Add For Newer Stuff")
+st.caption(f"Rendered in {(time.perf_counter() - rerun_started) * 1000:.1f} ms")
+finish_rerun("app", rerun_started)
+profiling_panel()
@@ -1,108 +1,100 @@
-
+import os
 import streamlit as st
-import sqlite3
 import time
-from PIL import Image
-import qrcode
 from io import BytesIO
-from streamlit_autorefresh import st_autorefresh
+
+from growagarden.catalog import get_catalog
+from growagarden.core import offer_values, trade_fairness
+from growagarden.metrics import timed, timer
+from growagarden.offer_codec import decode_offer, encode_offer, migrate_text_offer
+from growagarden.running_offer import RunningOffer
+from growagarden.streamlit_cache import kg_prices
+from growagarden.streamlit_metrics import finish_rerun, profiling_panel
+from growagarden.trade_codes import normalize_code
 
 # === Page Configuration (must be first Streamlit command) ===
 st.set_page_config(page_title="Grow a Garden Trade Calculator", layout="wide")
 
+rerun_started = time.perf_counter()
+
 # === Constants ===
-PRICE_PER_KG = {
-    "Carrot": 100,
-    "Strawberry": 80,
-    "Blueberry": 120,
-    "Orange Tulip": 17000,
-    "Tomato": 60,
-    "Corn": 76,
-    "Daffodil": 60,
-    "Raspberry": 60,
-    "Pear": 77,
-    "Pineapple": 750,
-    "Peach": 90,
-    "Apple": 77.57,
-    "Grape": 3300,
-    "Venus Fly Trap": 1324,
-    "Mango": 510,
-    "Dragon Fruit": 70,
-    "Cursed Fruit": 100,
-    "Soul Fruit": 77,
-    "Candy Blossom": 3900,
-    "Lotus": 435,
-    "Durian": 660,
-    "Bamboo": 1051,
-    "Coconut": 50,
-    "Pumpkin": 60,
-    "Watermelon": 80,
-    "Cactus": 1110,
-    "Passionfruit": 1400,
-    "Pepper": 1850,
-    "Starfruit": 5611,
-    "Moonflower": 4000,
-    "Moonglow": 3400,
-    "Blood Banana": 4600,
-    "Moon Melon": 130,
-    "Beanstalk": 2344,
-    "Moon Mango": 2277,
-}
-
-MUTATION_MULTIPLIERS = {
-    "Wet": 2,
-    "Chilled": 2,
-    "Chocolate": 2,
-    "Moonlit": 2,
-    "Bloodlit": 4,
-    "Plasma": 5,
-    "Frozen": 10,
-    "Golden": 20,
-    "Zombified": 25,
-    "Shocked": 50,
-    "Rainbow": 50,
-    "Celestial": 120,
-    "Disco": 125,
-    "Twisted": 30,
-}
+# Shared catalog (growagarden/data/catalog.json); picked up again on the next
+# rerun whenever the file changes. This page only trades by weight, so it
+# lists the crops that have a price per kg.
+catalog = get_catalog()
+PRICE_PER_KG = kg_prices(catalog.revision)
+MUTATION_MULTIPLIERS = catalog.mutation_multipliers
+CROP_OPTIONS = list(PRICE_PER_KG)
+MUTATION_OPTIONS = catalog.mutations.names
+VALUATION = catalog.valuation
 
 # === Utilities ===
 def calculate_value(crop, weight, mutations):
-    base_price = PRICE_PER_KG.get(crop, 0)
-    total_multiplier = 1
-    for mutation in mutations:
-        total_multiplier *= MUTATION_MULTIPLIERS.get(mutation, 1)
-    return weight * base_price * total_multiplier
-
-def trade_fairness(value1, value2):
-    if abs(value1 - value2) < 0.1 * max(value1, value2):
-        return "Fair Trade"
-    elif value1 > value2:
-        return "Your Win"
-    else:
-        return "Your Loss"
+    return VALUATION.value(crop, weight, mutations)
 
+@st.cache_data(max_entries=256)
 def generate_qr_code(data):
-    qr = qrcode.make(data)
-    buf = BytesIO()
-    qr.save(buf, format="PNG")
-    return buf.getvalue()
+    # qrcode pulls in PIL; only trade modes show a code, so import it here
+    import qrcode
+
+    with timer("qr.generate"):
+        qr = qrcode.make(data)
+        buf = BytesIO()
+        qr.save(buf, format="PNG")
+        return buf.getvalue()
 
 # === Database Setup ===
-conn = sqlite3.connect("/mount/data/growagarden.db", check_same_thread=False)
-cursor = conn.cursor()
-cursor.execute("CREATE TABLE IF NOT EXISTS trades (code TEXT, user TEXT, offer TEXT)")
-conn.commit()
+# An SQLite file, or redis://host:port/db (Redis or growagarden.resp_server)
+# so that several app replicas can serve the same trades
+DB_PATH = os.environ.get("GROWAGARDEN_DB", "/mount/data/growagarden.db")
+
+# The trade DB and its background threads are created on the first visit to
+# a trade mode, once per server process (schema setup and the legacy-offer
+# migration included); Calculator visitors never touch them.
+@st.cache_resource
+def get_trade_store():
+    # One pooled store per server process, shared by every session
+    from growagarden.trade_backends import open_trade_backend
+
+    store = open_trade_backend(DB_PATH)
+    store.migrate_offers(lambda text: migrate_text_offer(text, get_catalog().valuation))
+    return store
+
+@st.cache_resource
+def get_trade_sweeper():
+    # Deletes abandoned trades in the background, once per server process
+    # (Redis expires them by itself)
+    from growagarden.trade_sweeper import TradeSweeper
+
+    store = get_trade_store()
+    return TradeSweeper(store).start() if store.needs_sweeper else None
+
+@st.cache_resource
+def get_trade_writer():
+    # Offers are committed by a background thread so a slow or locked DB never stalls a rerun
+    from growagarden.write_behind import WriteBehind
 
-# === Autorefresh every 3 seconds ===
-st_autorefresh(interval=3000, limit=None, key="auto_refresh")
+    return WriteBehind(get_trade_store()).start()
+
+@st.cache_resource
+def get_order_book():
+    # Open offers posted to the public board, in memory, shared by every session
+    from growagarden.marketplace import OrderBook
+
+    return OrderBook(VALUATION, catalog.revision)
+
+# Board posts are dropped after this long, like idle trades
+BOARD_TTL = 60 * 60
 
 # === Session Setup ===
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
 if "my_offer" not in st.session_state:
-    st.session_state.my_offer = []
+    # Rows of your offer with a running total (see "Your Offer" below)
+    st.session_state.my_offer = RunningOffer(VALUATION, catalog.revision)
+elif st.session_state.my_offer.revision != catalog.revision:
+    st.session_state.my_offer.reprice(VALUATION, catalog.revision)
 
 if "trade_code" not in st.session_state:
     st.session_state.trade_code = None
@@ -115,21 +107,91 @@ st.sidebar.title("Modes")
 st.session_state.mode = st.sidebar.selectbox("Select Mode", ["Calculator", "1-Person Trade", "2-Person Trade"])
 
 # === Trade Code Logic ===
-def save_offer(trade_code, user, offer_data):
-    cursor.execute("REPLACE INTO trades (code, user, offer) VALUES (?, ?, ?)", (trade_code, user, offer_data))
-    conn.commit()
+@timed("trade.save_offer")
+def save_offer(trade_code, user, offer):
+    trade_writer.save_offer(trade_code, user, encode_offer(offer, VALUATION))
 
+@timed("trade.get_other_offer")
 def get_other_offer(trade_code, user):
-    cursor.execute("SELECT user, offer FROM trades WHERE code=? AND user<>?", (trade_code, user))
-    row = cursor.fetchone()
-    return eval(row[1]) if row else []
+    """(rows, total value) of the counterparty's offer.
+
+    Cached in the session with the feed and row versions it was read at: an
+    unchanged feed skips the database, and an unchanged row version skips
+    decoding and revaluing.
+    """
+    if not trade_code:
+        return [], 0.0
+    cached = st.session_state.get("other_offer")
+    key = (trade_code, user, catalog.revision)
+    feed_version = trade_store.feed.counterparty_version(trade_code, user)
+    if cached and cached["key"] == key and cached["feed_version"] == feed_version:
+        return cached["rows"], cached["total"]
+
+    row = trade_store.get_other_offer_row(trade_code, user)
+    row_version = (row[0], row[2]) if row else None
+    if not (cached and cached["key"] == key and cached["row_version"] == row_version):
+        rows = decode_offer(row[1], VALUATION) if row and row[1] else []
+        cached = {"key": key, "row_version": row_version, "rows": rows,
+                  "total": sum(offer_values(rows, catalog=catalog))}
+    cached["feed_version"] = feed_version
+    st.session_state.other_offer = cached
+    return cached["rows"], cached["total"]
+
+# Offer row callbacks: each edit revalues only the row that changed
+def add_offer_row():
+    row_id = st.session_state.my_offer.add(CROP_OPTIONS[0])
+    st.session_state[f"crop_{row_id}"] = CROP_OPTIONS[0]
+    st.session_state[f"weight_{row_id}"] = 0.0
+    st.session_state[f"mutations_{row_id}"] = []
+
+def update_offer_row(row_id):
+    st.session_state.my_offer.set(row_id, st.session_state[f"crop_{row_id}"],
+                                  st.session_state[f"weight_{row_id}"], st.session_state[f"mutations_{row_id}"])
+
+def remove_offer_row(row_id):
+    st.session_state.my_offer.remove(row_id)
+
+# Board callbacks
+def post_to_board(user, want_min, want_max):
+    book = get_order_book()
+    book.cancel(st.session_state.get("board_offer_id"))
+    my_offer = st.session_state.my_offer
+    st.session_state.board_offer_id = book.post(user, my_offer.items(), want_min, want_max,
+                                                st.session_state.trade_code, my_offer.total)
+    st.session_state.board_posted = (user, want_min, want_max, st.session_state.trade_code, my_offer.changes)
+
+def cancel_board_post():
+    get_order_book().cancel(st.session_state.pop("board_offer_id", None))
+    st.session_state.pop("board_posted", None)
+
+def join_board_trade(trade_code):
+    st.session_state.trade_code = trade_code
+
+# Characters Markdown (or Streamlit's $...$ math) would read as formatting
+MARKDOWN_SPECIAL = set("\\`*_{}[]()#+-.!|<>$~")
+
+def escape_markdown(text):
+    """``text`` shown literally by ``st.markdown``; for anything users typed."""
+    return "".join("\\" + c if c in MARKDOWN_SPECIAL else c for c in str(text))
+
+# Polls the change feed (a PRAGMA check unless the database changed) and only
+# reruns the page when the counterparty's offer has actually changed.
+@st.fragment(run_every=1)
+def watch_counterparty(trade_code, user):
+    # An open page keeps its trade alive even while nobody edits it
+    trade_store.touch(trade_code, user)
+    version = trade_store.feed.counterparty_version(trade_code, user)
+    if st.session_state.get("counterparty_version", version) != version:
+        st.session_state.counterparty_version = version
+        st.rerun()
+    st.session_state.counterparty_version = version
 
 # === Calculator Mode ===
 if st.session_state.mode == "Calculator":
     st.title("Grow a Garden Crop Value Calculator")
-    crop = st.selectbox("Select Crop", list(PRICE_PER_KG.keys()))
+    crop = st.selectbox("Select Crop", CROP_OPTIONS)
     weight = st.number_input("Weight (kg)", min_value=0.0, step=0.1)
-    mutations = st.multiselect("Mutations", list(MUTATION_MULTIPLIERS.keys()))
+    mutations = st.multiselect("Mutations", MUTATION_OPTIONS)
 
     if st.button("Calculate"):
         total_value = calculate_value(crop, weight, mutations)
@@ -138,29 +200,57 @@ if st.session_state.mode == "Calculator":
 # === 1 or 2-Person Trade Mode ===
 else:
     st.title("Grow a Garden Trade Center")
+    trade_store = get_trade_store()
+    get_trade_sweeper()
+    trade_writer = get_trade_writer()
 
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("Your Offer")
         username = st.text_input("Enter Your Name", key="user1")
-        st.session_state.my_offer = []
-        for i in range(5):
-            crop = st.selectbox(f"Crop {i+1}", list(PRICE_PER_KG.keys()), key=f"crop_{i}")
-            weight = st.number_input(f"Weight {i+1}", min_value=0.0, step=0.1, key=f"weight_{i}")
-            mutations = st.multiselect(f"Mutations {i+1}", list(MUTATION_MULTIPLIERS.keys()), key=f"mutations_{i}")
-            st.session_state.my_offer.append((crop, weight, mutations))
+        my_offer = st.session_state.my_offer
+        if not my_offer.rows:
+            add_offer_row()
+        for i, row_id in enumerate(list(my_offer.rows)):
+            crop_col, weight_col, mutations_col, remove_col = st.columns([3, 2, 4, 1], vertical_alignment="bottom")
+            crop_col.selectbox(f"Crop {i+1}", CROP_OPTIONS, key=f"crop_{row_id}",
+                               on_change=update_offer_row, args=(row_id,))
+            weight_col.number_input(f"Weight {i+1}", min_value=0.0, step=0.1, key=f"weight_{row_id}",
+                                    on_change=update_offer_row, args=(row_id,))
+            mutations_col.multiselect(f"Mutations {i+1}", MUTATION_OPTIONS, key=f"mutations_{row_id}",
+                                      on_change=update_offer_row, args=(row_id,))
+            remove_col.button("✖", key=f"remove_{row_id}", help="Remove this item",
+                              on_click=remove_offer_row, args=(row_id,))
+        st.button("➕ Add Item", on_click=add_offer_row)
 
-        if st.button("Generate Trade Code") or not st.session_state.trade_code:
-            st.session_state.trade_code = str(abs(hash(username + str(time.time()))))[:6]
+        if st.button("Generate Trade Code"):
+            st.session_state.trade_code = trade_store.create_trade()
+
+        join_code = st.text_input("Or Join a Trade Code", key="join_code")
+        if st.button("Join Trade"):
+            code = normalize_code(join_code)
+            if code and trade_store.trade_exists(code):
+                st.session_state.trade_code = code
+            else:
+                st.error("That trade code doesn't exist or has expired.")
 
-        save_offer(st.session_state.trade_code, username, str(st.session_state.my_offer))
-        st.info(f"Your Trade Code: `{st.session_state.trade_code}`")
-        st.image(generate_qr_code(st.session_state.trade_code), width=150)
+        if st.session_state.trade_code:
+            # Only write when the offer, code or name changed since the last save
+            saved = (st.session_state.trade_code, username, my_offer.changes)
+            if st.session_state.get("saved_offer") != saved:
+                save_offer(st.session_state.trade_code, username, my_offer.items())
+                st.session_state.saved_offer = saved
+            st.info(f"Your Trade Code: `{st.session_state.trade_code}`")
+            st.image(generate_qr_code(st.session_state.trade_code), width=150)
+        else:
+            st.info("Generate a trade code to share, or join the other trader's code.")
 
     with col2:
         st.subheader("Other Offer")
         if st.session_state.mode == "2-Person Trade":
-            other_offer = get_other_offer(st.session_state.trade_code, username)
+            if st.session_state.trade_code:
+                watch_counterparty(st.session_state.trade_code, username)
+            other_offer, other_value = get_other_offer(st.session_state.trade_code, username)
             if other_offer:
                 for i, (crop, weight, mutations) in enumerate(other_offer):
                     st.markdown(f"**Crop {i+1}:** {crop}, {weight}kg")
@@ -170,12 +260,64 @@ else:
         else:
             st.markdown("This is a single-person trade. No comparison needed.")
 
-    # Value comparison
-    your_value = sum(calculate_value(c, w, m) for c, w, m in st.session_state.my_offer)
-    other_value = sum(calculate_value(c, w, m) for c, w, m in get_other_offer(st.session_state.trade_code, username)) if st.session_state.mode == "2-Person Trade" else 0
+    # Value comparison, from the running totals
+    your_value = my_offer.total
+    if st.session_state.mode != "2-Person Trade":
+        other_value = 0
 
     st.subheader("Trade Summary")
     st.write(f"Your Offer Value: ${your_value:,.2f}")
     if st.session_state.mode == "2-Person Trade":
         st.write(f"Other Offer Value: ${other_value:,.2f}")
         st.write(f"Trade Result: **{trade_fairness(your_value, other_value)}**")
+
+    # === Open Offer Board ===
+    # Post your offer with the range of values you'd take for it, and get
+    # the open offers that would be a fair trade in both directions.
+    if st.session_state.mode == "2-Person Trade":
+        st.subheader("Open Offer Board")
+        book = get_order_book()
+        if book.revision != catalog.revision:
+            book.reprice(VALUATION, catalog.revision)
+        book.expire(time.time() - BOARD_TTL)
+
+        min_col, max_col, crop_col = st.columns(3)
+        want_min = min_col.number_input("Want at least ($)", min_value=0.0, step=1000.0, key="want_min")
+        want_max = max_col.number_input("Want at most ($, 0 = no limit)", min_value=0.0, step=1000.0,
+                                        key="want_max") or float("inf")
+        want_crop = crop_col.selectbox("Their offer includes", ["Any crop"] + CROP_OPTIONS, key="want_crop")
+
+        posted = st.session_state.get("board_posted")
+        offer_id = st.session_state.get("board_offer_id")
+        if offer_id is not None and offer_id not in book.offers:
+            posted = offer_id = None    # expired
+            cancel_board_post()
+        if not (username and st.session_state.trade_code and my_offer.total > 0):
+            st.caption("Enter your name, add items and generate a trade code to post on the board.")
+        elif offer_id is None:
+            st.button("📌 Post My Offer", on_click=post_to_board, args=(username, want_min, want_max))
+        else:
+            # Keep the post in step with the offer it advertises
+            if posted != (username, want_min, want_max, st.session_state.trade_code, my_offer.changes):
+                post_to_board(username, want_min, want_max)
+            st.button("Remove My Post", on_click=cancel_board_post)
+
+        if offer_id is not None or my_offer.total > 0:
+            with timer("board.match"):
+                found = book.match_value(my_offer.total, 10, want_min, want_max,
+                                         None if want_crop == "Any crop" else want_crop, exclude_user=username)
+            st.caption(f"{len(book):,} open offers on the board.")
+            for match in found:
+                items = ", ".join(f"{crop} {units}kg" + (f" ({', '.join(m)})" if m else "")
+                                  for crop, units, m in match.items)
+                info_col, join_col = st.columns([5, 1], vertical_alignment="center")
+                info_col.markdown(f"**{escape_markdown(match.user)}** offers \\${match.value:,.2f}: "
+                                  f"{escape_markdown(items)}")
+                join_col.button("Join", key=f"board_join_{match.offer_id}", on_click=join_board_trade,
+                                args=(match.trade_code,), disabled=match.trade_code == st.session_state.trade_code)
+            if not found:
+                st.info("No fair matches on the board yet.")
+
+st.sidebar.caption(f"Rendered in {(time.perf_counter() - rerun_started) * 1000:.1f} ms")
+finish_rerun("trade", rerun_started)
+profiling_panel()
@@ -1,64 +1,22 @@
 import tkinter as tk
-from tkinter import ttk
-
-# Base prices for crops
-CROP_PRICES = {
-    "Carrot": 20,
-    "Strawberry": 90,
-    "Blueberry": 40,
-    "Orange Tulip": 750,
-    "Tomato": 80,
-    "Corn": 100,
-    "Daffodil": 60,
-    "Raspberry": 1500,
-    "Pear": 2000,
-    "Pineapple": 3000,
-    "Peach": 100,
-    "Apple": 400,  # Average of 300–500
-    "Grape": 10000,
-    "Venus Fly Trap": 15000,
-    "Mango": 6500,
-    "Dragon Fruit": 4750,
-    "Cursed Fruit": 50000,  # Average of 20,000–80,000
-    "Soul Fruit": 10500,    # Average of 5,000–16,000
-    "Candy Blossom": 100000,
-    "Lotus": 20000,
-    "Durian": 4500,
-    "Bamboo": 1200,
-    "Coconut": 2500,
-    "Pumpkin": 1000,
-    "Watermelon": 1200,
-    "Cactus": 3000,
-    "Passionfruit": 8000,
-    "Pepper": 5000,
-    "Starfruit": 7500,
-    "Moonflower": 6000,
-    "Moonglow": 9000,
-    "Blood Banana": 12000,
-    "Moon Melon": 15000,
-}
-
-# Mutation multipliers
-MUTATION_MULTIPLIERS = {
-    "Wet": 2,
-    "Chilled": 2,
-    "Chocolate": 2,
-    "Moonlit": 2,
-    "Bloodlit": 4,
-    "Plasma": 5,
-    "Frozen": 10,
-    "Golden": 20,
-    "Zombified": 25,
-    "Shocked": 50,
-    "Rainbow": 50,
-    "Celestial": 120,
-    "Disco": 125,
-}
-
-# Mutations that can stack to form another mutation
-STACKABLE_MUTATIONS = {
-    frozenset(["Wet", "Chilled"]): "Frozen",
-}
+from tkinter import filedialog, messagebox, ttk
+
+import numpy as np
+
+from growagarden.catalog import get_catalog
+from growagarden.portfolio import Portfolio, PortfolioWorker
+
+# Portfolio window
+ROW_HEIGHT = 20
+POLL_MS = 30        # how often background results are picked up
+DEBOUNCE_MS = 150   # mutation toggles this close together are valued as one batch
+PORTFOLIO_COLUMNS = [
+    ("crop", "Crop", 140, "w"),
+    ("units", "Units", 80, "e"),
+    ("mode", "Mode", 50, "center"),
+    ("mutations", "Mutations", 240, "w"),
+    ("value", "Value", 160, "e"),
+]
 
 class GrowAGardenCalculator:
     def __init__(self, root):
@@ -71,7 +29,7 @@ class GrowAGardenCalculator:
 
         self.selected_crop = tk.StringVar()
         self.crop_combobox = ttk.Combobox(root, textvariable=self.selected_crop)
-        self.crop_combobox['values'] = list(CROP_PRICES.keys())
+        self.crop_combobox['values'] = list(get_catalog().base_prices)
         self.crop_combobox.grid(row=0, column=1, padx=10, pady=10)
 
         # Mutations selection
@@ -80,7 +38,7 @@ class GrowAGardenCalculator:
 
         self.mutation_vars = {}
         self.mutation_checks = {}
-        for idx, mutation in enumerate(MUTATION_MULTIPLIERS.keys()):
+        for idx, mutation in enumerate(get_catalog().mutation_multipliers):
             var = tk.BooleanVar()
             chk = ttk.Checkbutton(root, text=mutation, variable=var)
             chk.grid(row=1 + idx // 4, column=1 + idx % 4, padx=5, pady=5, sticky="w")
@@ -95,31 +53,323 @@ class GrowAGardenCalculator:
         self.result_label = ttk.Label(root, text="Final Value: ₵0")
         self.result_label.grid(row=6, column=0, columnspan=2, padx=10, pady=10)
 
+        self.portfolio_button = ttk.Button(root, text="Open Portfolio…", command=self.open_portfolio)
+        self.portfolio_button.grid(row=7, column=0, columnspan=2, padx=10, pady=10)
+        self.portfolio_window = None
+
     def calculate_value(self):
+        # Fetched per click so edits to the catalog file show up without a restart
+        catalog = get_catalog()
         crop = self.selected_crop.get()
-        if crop not in CROP_PRICES:
+        if crop not in catalog.base_prices:
             self.result_label.config(text="Please select a valid crop.")
             return
 
-        base_price = CROP_PRICES[crop]
+        base_price = catalog.base_prices[crop]
         selected_mutations = [mutation for mutation, var in self.mutation_vars.items() if var.get()]
 
-        # Handle stacking mutations
-        mutations_to_apply = set(selected_mutations)
-        for combo, result in STACKABLE_MUTATIONS.items():
-            if combo.issubset(mutations_to_apply):
-                mutations_to_apply.difference_update(combo)
-                mutations_to_apply.add(result)
-
-        # Calculate final multiplier
-        final_multiplier = 1
-        for mutation in mutations_to_apply:
-            multiplier = MUTATION_MULTIPLIERS.get(mutation, 1)
-            final_multiplier *= multiplier
+        # Stacking (e.g. Wet + Chilled -> Frozen) is resolved by the shared cache
+        mutations = catalog.mutations
+        final_multiplier = mutations.multiplier(mutations.mask(selected_mutations))
 
         final_value = base_price * final_multiplier
         self.result_label.config(text=f"Final Value: ₵{final_value:,}")
 
+    def open_portfolio(self):
+        if self.portfolio_window is not None and self.portfolio_window.window.winfo_exists():
+            self.portfolio_window.window.lift()
+            return
+        self.portfolio_window = PortfolioWindow(self.root)
+
+class VirtualTreeview(ttk.Frame):
+    """A Treeview that only holds the rows on screen.
+
+    The data is ``row_count()`` rows read through ``get_row(index)``. The
+    Treeview has one item per visible line, and scrolling re-fills those
+    items from other rows, so drawing costs the same with 50 or 50k rows.
+    Selection is a boolean array over all rows, shown with a tag.
+    """
+
+    def __init__(self, parent, columns, row_count, get_row, on_select=None):
+        super().__init__(parent)
+        self.row_count = row_count
+        self.get_row = get_row
+        self.on_select = on_select
+        self.first = 0
+        self.items = []
+        self.shown = []
+        self.selected = np.zeros(0, dtype=bool)
+        self.anchor = None
+
+        ttk.Style(self).configure("Virtual.Treeview", rowheight=ROW_HEIGHT)
+        self.tree = ttk.Treeview(self, columns=[c[0] for c in columns], show="headings",
+                                 selectmode="none", style="Virtual.Treeview")
+        for name, heading, width, anchor in columns:
+            self.tree.heading(name, text=heading, anchor=anchor)
+            self.tree.column(name, width=width, anchor=anchor, stretch=name == "mutations")
+        self.tree.tag_configure("selected", background="#cde6ff")
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scrollbar)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_by(3))
+        self.tree.bind("<Button-1>", lambda e: self.on_click(e, "set"))
+        self.tree.bind("<Control-Button-1>", lambda e: self.on_click(e, "toggle"))
+        self.tree.bind("<Shift-Button-1>", lambda e: self.on_click(e, "extend"))
+        self.tree.bind("<Up>", lambda e: self.move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self.move_selection(1))
+        self.tree.bind("<Prior>", lambda e: self.scroll_by(-len(self.items)))
+        self.tree.bind("<Next>", lambda e: self.scroll_by(len(self.items)))
+        self.tree.bind("<Home>", lambda e: self.scroll_to(0))
+        self.tree.bind("<End>", lambda e: self.scroll_to(self.row_count()))
+        self.tree.bind("<Control-a>", lambda e: self.select_all())
+
+    # Window
+    def on_resize(self, event):
+        header = ROW_HEIGHT + 4
+        if self.items and self.tree.bbox(self.items[0]):
+            header = self.tree.bbox(self.items[0])[1]
+        visible = max(1, (event.height - header) // ROW_HEIGHT)
+        while len(self.items) < visible:
+            self.items.append(self.tree.insert("", "end", values=()))
+            self.shown.append(None)
+        while len(self.items) > visible:
+            self.tree.delete(self.items.pop())
+            self.shown.pop()
+        self.refresh()
+
+    def refresh(self):
+        """Re-read the rows on screen; call after the data changed."""
+        count = self.row_count()
+        if len(self.selected) != count:
+            selected = np.zeros(count, dtype=bool)
+            keep = min(count, len(self.selected))
+            selected[:keep] = self.selected[:keep]
+            self.selected = selected
+        self.first = max(0, min(self.first, count - len(self.items)))
+        for slot, item in enumerate(self.items):
+            index = self.first + slot
+            if index < count:
+                shown = (self.get_row(index), ("selected",) if self.selected[index] else ())
+            else:
+                shown = ((), ())
+            # Unchanged lines are not sent to Tk again
+            if shown != self.shown[slot]:
+                self.tree.item(item, values=shown[0], tags=shown[1])
+                self.shown[slot] = shown
+        self.tree.yview_moveto(0)
+        if count:
+            self.scrollbar.set(self.first / count, min((self.first + len(self.items)) / count, 1.0))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll_to(self, first):
+        first = max(0, min(int(first), self.row_count() - len(self.items)))
+        if first != self.first:
+            self.first = first
+            self.refresh()
+        return "break"
+
+    def scroll_by(self, rows):
+        return self.scroll_to(self.first + rows)
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(amount) * self.row_count())
+        else:
+            self.scroll_by(int(amount) * (len(self.items) if unit == "pages" else 1))
+
+    def on_mousewheel(self, event):
+        # Windows reports multiples of 120 per notch, macOS small deltas
+        steps = -(event.delta // 120) if abs(event.delta) >= 120 else -event.delta
+        return self.scroll_by(3 * steps)
+
+    # Selection
+    def selected_rows(self):
+        return np.flatnonzero(self.selected)
+
+    def index_at(self, y):
+        item = self.tree.identify_row(y)
+        if not item:
+            return None
+        index = self.first + self.items.index(item)
+        return index if index < self.row_count() else None
+
+    def on_click(self, event, mode):
+        if self.tree.identify_region(event.x, event.y) == "heading":
+            return None
+        self.tree.focus_set()
+        index = self.index_at(event.y)
+        if index is None:
+            return "break"
+        if mode == "toggle":
+            self.selected[index] = not self.selected[index]
+            self.anchor = index
+        elif mode == "extend" and self.anchor is not None:
+            low, high = sorted((self.anchor, index))
+            self.selected[low:high + 1] = True
+        else:
+            self.selected[:] = False
+            self.selected[index] = True
+            self.anchor = index
+        self.selection_changed()
+        return "break"
+
+    def move_selection(self, step):
+        count = self.row_count()
+        if not count:
+            return "break"
+        index = max(0, min((self.anchor if self.anchor is not None else -1) + step, count - 1))
+        self.selected[:] = False
+        self.selected[index] = True
+        self.anchor = index
+        if index < self.first:
+            self.first = index
+        elif index >= self.first + len(self.items):
+            self.first = index - len(self.items) + 1
+        self.selection_changed()
+        return "break"
+
+    def select_all(self):
+        self.selected[:] = True
+        self.selection_changed()
+        return "break"
+
+    def selection_changed(self):
+        self.refresh()
+        if self.on_select is not None:
+            self.on_select()
+
+class PortfolioWindow:
+    """Many inventory rows, loaded from CSV and valued in the background.
+
+    Parsing and valuation run in ``PortfolioWorker``; this window only picks
+    up finished results every ``POLL_MS`` through ``after``, within a small
+    time budget, so the Tk thread never waits on them. Mutation toggles
+    apply to the selected rows at once, and the rows they changed are
+    valued together ``DEBOUNCE_MS`` after the last toggle.
+    """
+
+    def __init__(self, root):
+        self.window = tk.Toplevel(root)
+        self.window.title("Portfolio")
+        self.window.geometry("760x560")
+        self.portfolio = Portfolio()
+        self.worker = PortfolioWorker(self.portfolio)
+        self.poll_job = None
+        self.revalue_job = None
+
+        toolbar = ttk.Frame(self.window)
+        toolbar.grid(row=0, column=0, sticky="ew", padx=10, pady=(10, 0))
+        ttk.Button(toolbar, text="Open CSV…", command=self.open_csv).pack(side="left")
+        ttk.Button(toolbar, text="Select All", command=lambda: self.view.select_all()).pack(side="left", padx=5)
+        self.status_label = ttk.Label(toolbar, text="No rows loaded.")
+        self.status_label.pack(side="left", padx=10)
+
+        self.view = VirtualTreeview(self.window, PORTFOLIO_COLUMNS, lambda: len(self.portfolio),
+                                    self.portfolio.row, on_select=self.selection_changed)
+        self.view.grid(row=1, column=0, sticky="nsew", padx=10, pady=10)
+        self.window.rowconfigure(1, weight=1)
+        self.window.columnconfigure(0, weight=1)
+
+        # Mutations of the selected rows; "alternate" when only some of them have it
+        mutations_frame = ttk.LabelFrame(self.window, text="Mutations of the selected rows")
+        mutations_frame.grid(row=2, column=0, sticky="ew", padx=10)
+        self.mutation_vars = {}
+        self.mutation_checks = {}
+        for idx, mutation in enumerate(get_catalog().mutation_multipliers):
+            var = tk.BooleanVar()
+            chk = ttk.Checkbutton(mutations_frame, text=mutation, variable=var,
+                                  command=lambda m=mutation: self.toggle_mutation(m))
+            chk.grid(row=idx // 6, column=idx % 6, padx=5, pady=2, sticky="w")
+            self.mutation_vars[mutation] = var
+            self.mutation_checks[mutation] = chk
+
+        self.total_label = ttk.Label(self.window, text="Total Value: ₵0")
+        self.total_label.grid(row=3, column=0, sticky="w", padx=10, pady=10)
+
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.selection_changed()
+
+    def open_csv(self):
+        path = filedialog.askopenfilename(parent=self.window, title="Open inventory",
+                                          filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if not path:
+            return
+        self.worker.load_csv(path)
+        self.view.first = 0
+        self.view.selected[:] = False
+        self.view.anchor = None
+        self.view.refresh()
+        self.selection_changed()
+        self.poll()
+
+    def toggle_mutation(self, mutation):
+        rows = self.view.selected_rows()
+        self.mutation_checks[mutation].state(["!alternate"])
+        if self.portfolio.set_mutation(rows, mutation, self.mutation_vars[mutation].get()):
+            self.view.refresh()
+            self.update_totals()
+            if self.revalue_job is not None:
+                self.window.after_cancel(self.revalue_job)
+            self.revalue_job = self.window.after(DEBOUNCE_MS, self.revalue)
+
+    def revalue(self):
+        self.revalue_job = None
+        self.worker.revalue()
+        self.poll()
+
+    def poll(self):
+        """Apply whatever the worker finished, then check back while it is busy."""
+        if self.poll_job is not None:
+            self.window.after_cancel(self.poll_job)
+            self.poll_job = None
+        if self.worker.drain():
+            self.view.refresh()
+            self.update_totals()
+        if self.worker.error is not None:
+            error, self.worker.error = self.worker.error, None
+            messagebox.showerror("Portfolio", f"Could not load the inventory: {error}", parent=self.window)
+        if self.worker.busy:
+            self.poll_job = self.window.after(POLL_MS, self.poll)
+        else:
+            self.update_totals()
+
+    def selection_changed(self):
+        rows = self.view.selected_rows()
+        counts = self.portfolio.mutation_counts(rows)
+        for (mutation, chk), count in zip(self.mutation_checks.items(), counts):
+            self.mutation_vars[mutation].set(bool(rows.size) and count == rows.size)
+            chk.state(["alternate" if 0 < count < rows.size else "!alternate",
+                       "!disabled" if rows.size else "disabled"])
+        self.update_totals()
+
+    def update_totals(self):
+        rows = self.view.selected_rows()
+        pending = int(np.count_nonzero(self.portfolio.stale))
+        text = f"Total Value: ₵{self.portfolio.total():,.2f}"
+        if rows.size:
+            text += f"   Selected ({rows.size:,} rows): ₵{self.portfolio.total(rows):,.2f}"
+        if pending:
+            text += f"   (valuing {pending:,} rows…)"
+        self.total_label.config(text=text)
+        status = f"{len(self.portfolio):,} rows"
+        if self.portfolio.invalid_rows:
+            status += f", {self.portfolio.invalid_rows:,} invalid rows skipped"
+        self.status_label.config(text=status)
+
+    def close(self):
+        for job in (self.poll_job, self.revalue_job):
+            if job is not None:
+                self.window.after_cancel(job)
+        self.worker.shutdown()
+        self.window.destroy()
+
 if __name__ == "__main__":
     root = tk.Tk()
     app = GrowAGardenCalculator(root)
@@ -0,0 +1,65 @@
+"""Throughput of bulk CSV valuation, with peak memory to show it stays bounded.
+
+    python benchmarks/bench_bulk.py --rows 2000000
+"""
+import argparse
+import csv
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from growagarden.bulk import value_csv
+from growagarden.catalog import get_catalog
+
+
+def write_inventory(path, rows):
+    catalog = get_catalog()
+    rng = random.Random(rows)
+    crops, mutations = catalog.crop_names, catalog.mutations.names
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["crop", "weight", "mutations"])
+        for _ in range(rows):
+            writer.writerow([rng.choice(crops), round(rng.uniform(0.1, 30), 2),
+                             "|".join(rng.sample(mutations, rng.randint(0, 3)))])
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-rows", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source, valued = os.path.join(tmp, "inventory.csv"), os.path.join(tmp, "valued.csv")
+        write_inventory(source, args.rows)
+        size_mb = os.path.getsize(source) / 1e6
+        before = peak_rss_mb()
+
+        for label, out_path in (("summary only", None), ("with export", valued)):
+            start = time.perf_counter()
+            with open(source, newline="") as f:
+                out = open(out_path, "w", newline="") if out_path else None
+                try:
+                    summary = value_csv(f, out, chunk_rows=args.chunk_rows)
+                finally:
+                    if out:
+                        out.close()
+            elapsed = time.perf_counter() - start
+            print(f"{label:>12}: {summary.rows:,} rows ({size_mb:.0f} MB) in {elapsed:.2f} s "
+                  f"= {summary.rows / elapsed:,.0f} rows/s")
+
+        print(f"peak RSS {peak_rss_mb():.0f} MB (was {before:.0f} MB before valuing)")
+
+
+if __name__ == "__main__":
+    main()
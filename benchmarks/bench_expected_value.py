@@ -0,0 +1,57 @@
+"""Expected-value engine: exact enumeration vs Monte Carlo, and Monte Carlo scaling across cores.
+
+Every catalog mutation gets the same probability (Wet/Chilled higher, so the
+Frozen stacking rule matters) and weights are lognormal. Monte Carlo is run
+with 1, 2, 4, ... worker processes up to the CPU count.
+
+    python benchmarks/bench_expected_value.py --draws 20000000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from growagarden.catalog import get_catalog
+from growagarden.expected_value import WeightDistribution, expected_values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--draws", type=int, default=20_000_000)
+    parser.add_argument("--probability", type=float, default=0.05)
+    parser.add_argument("--crop", default="Carrot")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    catalog = get_catalog()
+    probabilities = dict.fromkeys(catalog.mutations.names, args.probability)
+    probabilities.update(Wet=0.3, Chilled=0.2)
+    weights = WeightDistribution.lognormal(2.0, 0.5)
+
+    def run(method, workers=1):
+        started = time.perf_counter()
+        result = expected_values(probabilities, weights, crops=[args.crop], method=method,
+                                 draws=args.draws, workers=workers, seed=1)
+        return time.perf_counter() - started, result["crops"][0]
+
+    elapsed, exact = run("exact")
+    print(f"exact ({2 ** len(probabilities):,} masks): {elapsed * 1000:.1f} ms")
+    print(f"  mean {exact['mean']:.4g}  std {exact['std']:.4g}  "
+          + "  ".join(f"p{q} {v:.4g}" for q, v in exact["percentiles"].items()))
+
+    print(f"\nmonte carlo, {args.draws:,} draws ({os.cpu_count()} CPUs):")
+    baseline = None
+    workers = 1
+    while workers <= max(args.max_workers, 1):
+        elapsed, row = run("monte_carlo", workers)
+        baseline = baseline or elapsed
+        errors = [abs(row["percentiles"][q] / v - 1) for q, v in exact["percentiles"].items()]
+        print(f"  {workers:>2} workers: {elapsed:6.2f}s  {args.draws / elapsed / 1e6:6.1f}M draws/s  "
+              f"speedup x{baseline / elapsed:4.2f}  max percentile error vs exact {max(errors):.2%}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""DB queries and full-page reruns per minute for one idle 2-Person Trade session.
+
+"before" replays the old st_autorefresh loop: a full rerun every 3 s doing
+an unconditional REPLACE + commit and two counterparty reads. "after" replays
+the change-feed watcher: a fragment tick every second that reads the
+feed (plus a rate-limited last-touched refresh) and triggers a
+full rerun only when the counterparty's offer version moves. Pass
+--counterparty-edits to see reruns track real changes.
+
+    python benchmarks/bench_idle_session.py --counterparty-edits 2
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from growagarden.trade_store import TradeStore
+
+CODE, ME, THEM = "123456", "me", "them"
+MY_OFFER = str([("Carrot", 1.0, [])])
+
+
+def count_statements(conn, counter):
+    conn.set_trace_callback(lambda sql: counter.__setitem__("queries", counter["queries"] + 1))
+    return conn
+
+
+def before(path, seconds, edit_times):
+    counter = {"queries": 0, "reruns": 0}
+    conn = count_statements(sqlite3.connect(path), counter)
+    conn.execute("CREATE TABLE IF NOT EXISTS trades (code TEXT, user TEXT, offer TEXT)")
+    for t in range(0, seconds, 3):
+        counter["reruns"] += 1
+        conn.execute("REPLACE INTO trades (code, user, offer) VALUES (?, ?, ?)", (CODE, ME, MY_OFFER))
+        conn.commit()
+        for _ in range(2):
+            conn.execute("SELECT user, offer FROM trades WHERE code=? AND user<>?", (CODE, ME)).fetchone()
+    conn.close()
+    return counter
+
+
+def after(path, seconds, edit_times):
+    counter = {"queries": 0, "reruns": 0}
+    store = TradeStore(path)
+    store.save_offer(CODE, THEM, "[]")
+    store.save_offer(CODE, ME, MY_OFFER)
+
+    # Only count statements issued from here on, by this session
+    with store.connection() as conn:
+        count_statements(conn, counter)
+
+    seen = store.feed.counterparty_version(CODE, ME)
+    for t in range(seconds):
+        if t in edit_times:
+            store.save_offer(CODE, THEM, str([("Carrot", float(t), [])]))
+            counter["queries"] -= 1  # the counterparty's write is not ours
+        store.touch(CODE, ME)
+        version = store.feed.counterparty_version(CODE, ME)
+        if version != seen:
+            seen = version
+            counter["reruns"] += 1
+            store.save_offer(CODE, ME, MY_OFFER)
+            for _ in range(2):
+                store.get_other_offer(CODE, ME)
+    store.close()
+    return counter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--counterparty-edits", type=int, default=0,
+                        help="number of counterparty offer edits during the window")
+    args = parser.parse_args()
+
+    step = args.seconds // (args.counterparty_edits + 1)
+    edit_times = {step * (i + 1) for i in range(args.counterparty_edits)}
+    per_minute = 60 / args.seconds
+
+    for name, scenario in (("before", before), ("after", after)):
+        with tempfile.TemporaryDirectory() as tmp:
+            result = scenario(os.path.join(tmp, "growagarden.db"), args.seconds, edit_times)
+        print(f"{name:>6}: {result['queries'] * per_minute:6.1f} DB queries/min  "
+              f"{result['reruns'] * per_minute:5.1f} reruns/min")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Marketplace order book: insert throughput, match latency and memory at 100k open offers.
+
+Offers are 1-5 random weighted crops, wanting 70-95% to 105-150% of their
+own value. Match latency is compared with a linear scan over every offer,
+which is what a board without an index would do.
+
+    python benchmarks/bench_marketplace.py --offers 100000
+"""
+import argparse
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from growagarden.catalog import get_catalog
+from growagarden.marketplace import OrderBook
+from growagarden.trade_optimizer import is_fair
+
+
+def random_offer(r, crops, mutations):
+    items = [(r.choice(crops), round(r.uniform(0.5, 20), 1), r.sample(mutations, r.randrange(3)))
+             for _ in range(r.randrange(1, 6))]
+    return items, r.uniform(0.7, 0.95), r.uniform(1.05, 1.5)
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return statistics.median(latencies) * 1e6, latencies[int(len(latencies) * 0.99) - 1] * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--offers", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--users", type=int, default=20_000)
+    args = parser.parse_args()
+
+    catalog = get_catalog()
+    crops = [crop for crop, price in catalog.price_per_kg.items() if price > 0]
+    r = random.Random(0)
+    generated = [random_offer(r, crops, catalog.mutations.names) for _ in range(args.offers)]
+    book = OrderBook(catalog.valuation, catalog.revision)
+    values = book._values([items for items, _, _ in generated])
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    started = time.perf_counter()
+    ids = [book.post(f"user{i % args.users}", items, value * low, value * high, value=value)
+           for i, ((items, low, high), value) in enumerate(zip(generated, values))]
+    elapsed = time.perf_counter() - started
+    grown = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 - rss_before
+    print(f"insert (pre-valued): {args.offers:,} offers in {elapsed:.2f}s ({args.offers / elapsed:,.0f}/s), "
+          f"peak RSS +{grown / 2**20:.0f} MiB (~{grown / args.offers:.0f} bytes/offer, items included)")
+
+    started = time.perf_counter()
+    for items, low, high in generated[:args.queries]:
+        book.cancel(book.post("timing", items, low, high))
+    print(f"post with valuation + cancel: {(time.perf_counter() - started) / args.queries * 1e6:.1f} us")
+
+    queries = r.sample(ids, args.queries)
+    for label, crop_for in (("all crops", lambda offer: None),
+                            ("one crop", lambda offer: next(iter(offer.crops)))):
+        latencies, found = [], 0
+        for offer_id in queries:
+            offer = book.offers[offer_id]
+            crop = crop_for(offer)
+            start = time.perf_counter()
+            found += len(book.matches(offer_id, args.k, crop))
+            latencies.append(time.perf_counter() - start)
+        p50, p99 = percentiles(latencies)
+        print(f"match ({label}, k={args.k}): p50 {p50:7.1f} us  p99 {p99:7.1f} us  "
+              f"{found / len(queries):.1f} matches/query")
+
+    latencies = []
+    offers = list(book.offers.values())
+    for offer_id in queries[:max(args.queries // 20, 1)]:
+        me = book.offers[offer_id]
+        start = time.perf_counter()
+        scan = [o for o in offers if o.user != me.user and o.wants(me.value)
+                and me.want_min <= o.value <= me.want_max and is_fair(me.value, o.value)]
+        sorted(scan, key=lambda o: abs(o.value - me.value))[:args.k]
+        latencies.append(time.perf_counter() - start)
+    p50, p99 = percentiles(latencies)
+    print(f"match by linear scan:       p50 {p50:7.1f} us  p99 {p99:7.1f} us")
+
+    cancelled = r.sample(ids, min(args.queries * 5, len(ids)))
+    started = time.perf_counter()
+    for offer_id in cancelled:
+        book.cancel(offer_id)
+    elapsed = time.perf_counter() - started
+    print(f"cancel: {len(cancelled) / elapsed:,.0f}/s, {len(book):,} offers left")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Micro-benchmark: binary offer codec vs the old str()/eval() round-trip.
+
+    python benchmarks/bench_offer_codec.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from growagarden.mutations import STACKABLE_MUTATIONS, MutationResolver
+from growagarden.offer_codec import decode_offer, encode_offer
+from growagarden.valuation import ValuationTable
+
+MUTATION_MULTIPLIERS = {
+    "Wet": 2, "Chilled": 2, "Chocolate": 2, "Moonlit": 2, "Bloodlit": 4,
+    "Plasma": 5, "Frozen": 10, "Golden": 20, "Zombified": 25, "Shocked": 50,
+    "Rainbow": 50, "Celestial": 120, "Disco": 125, "Twisted": 30,
+}
+CROPS = ["Carrot", "Strawberry", "Blueberry", "Orange Tulip", "Tomato", "Corn",
+         "Grape", "Mango", "Candy Blossom", "Moon Mango"]
+VALUATION = ValuationTable(dict.fromkeys(CROPS, 100),
+                           mutations=MutationResolver(MUTATION_MULTIPLIERS, STACKABLE_MUTATIONS))
+
+
+def make_offer(rows):
+    rng = random.Random(rows)
+    return [(rng.choice(CROPS), round(rng.uniform(0.1, 50), 1),
+             rng.sample(list(MUTATION_MULTIPLIERS), rng.randint(0, 3))) for _ in range(rows)]
+
+
+def main():
+    for rows in (5, 500):
+        offer = make_offer(rows)
+        text, blob = str(offer), encode_offer(offer, VALUATION)
+        number = 200000 // rows
+
+        results = {
+            "str()": timeit.timeit(lambda: str(offer), number=number),
+            "eval()": timeit.timeit(lambda: eval(text), number=number),
+            "encode": timeit.timeit(lambda: encode_offer(offer, VALUATION), number=number),
+            "decode": timeit.timeit(lambda: decode_offer(blob, VALUATION), number=number),
+        }
+        print(f"{rows} rows: text {len(text)} B, binary {len(blob)} B")
+        for name, seconds in results.items():
+            print(f"  {name:>7}: {seconds / number * 1e6:9.2f} us/offer")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Responsiveness of the desktop portfolio window with a large inventory loaded.
+
+Loads --rows inventory rows through ``PortfolioWorker`` the way the window
+does: parsing and valuation run in the background while the "UI" thread
+calls ``drain`` every POLL_MS. Reports the longest time the UI thread spent
+in one call (a frame), how long until every row was valued, and the same
+for toggling a mutation on every row. The totals are checked against the
+bulk valuation. With a display, it then opens the real Tk window and times
+scrolling and toggling there too, including the redraw.
+
+    python benchmarks/bench_portfolio.py --rows 50000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_bulk import write_inventory
+from growagarden.bulk import value_csv
+from growagarden.portfolio import Portfolio, PortfolioWorker
+
+FRAME_BUDGET_MS = 50
+POLL_MS = 30
+
+
+def run_until_idle(worker):
+    """Drain like the window's poll loop; returns (seconds until idle, longest drain in ms)."""
+    start, longest = time.perf_counter(), 0.0
+    while worker.busy:
+        tick = time.perf_counter()
+        worker.drain()
+        longest = max(longest, time.perf_counter() - tick)
+        time.sleep(POLL_MS / 1000)
+    return time.perf_counter() - start, longest * 1000
+
+
+def headless(path):
+    portfolio = Portfolio()
+    worker = PortfolioWorker(portfolio)
+    worker.load_csv(path)
+    seconds, longest = run_until_idle(worker)
+    with open(path, newline="") as f:
+        loaded_ok = np.isclose(portfolio.total(), value_csv(f).total)
+    print(f"load + value {len(portfolio):,} rows: {seconds * 1000:.0f} ms, longest UI-thread step {longest:.1f} ms")
+
+    rows = np.arange(len(portfolio))
+    mutation = portfolio.catalog.mutations.names[0]
+    tick = time.perf_counter()
+    portfolio.set_mutation(rows, mutation, True)
+    worker.revalue()
+    toggle = (time.perf_counter() - tick) * 1000
+    seconds, longest = run_until_idle(worker)
+    valuation = portfolio.catalog.valuation
+    expected_after = valuation.batch_value(portfolio.crop_ids, portfolio.units, portfolio.modes, portfolio.masks).sum()
+    print(f"toggle {mutation} on every row: {toggle:.1f} ms on the UI thread, valued {seconds * 1000:.0f} ms later, "
+          f"longest UI-thread step {longest:.1f} ms")
+    worker.shutdown()
+    return loaded_ok and np.isclose(portfolio.total(), expected_after), max(longest, toggle)
+
+
+def gui(path):
+    import tkinter as tk
+
+    import app
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"GUI timings skipped: {e}")
+        return 0.0
+    root.withdraw()
+    window = app.PortfolioWindow(root)
+    window.worker.load_csv(path)
+    window.poll()
+    while window.worker.busy:
+        root.update()
+    root.update()
+
+    def frame(fn):
+        tick = time.perf_counter()
+        fn()
+        root.update_idletasks()
+        return (time.perf_counter() - tick) * 1000
+
+    view = window.view
+    scrolls = [frame(lambda f=f: view.on_scrollbar("moveto", str(f / 200))) for f in range(200)]
+    view.select_all()
+    mutation = next(iter(window.mutation_vars))
+    window.mutation_vars[mutation].set(True)
+    toggle = frame(lambda: window.toggle_mutation(mutation))
+    poll = 0.0
+    while window.revalue_job is not None or window.worker.busy:
+        poll = max(poll, frame(root.update))
+    print(f"Tk: scroll p50 {np.median(scrolls):.2f} ms  max {max(scrolls):.2f} ms; "
+          f"toggle on all rows {toggle:.1f} ms; longest frame while revaluing {poll:.1f} ms")
+    window.close()
+    root.destroy()
+    return max(max(scrolls), toggle, poll)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "inventory.csv")
+        write_inventory(path, args.rows)
+        ok, longest = headless(path)
+        longest = max(longest, gui(path))
+    print(f"totals match the bulk valuation: {ok}; longest frame {longest:.1f} ms (budget {FRAME_BUDGET_MS} ms)")
+    sys.exit(0 if ok and longest <= FRAME_BUDGET_MS else 1)
+
+
+if __name__ == "__main__":
+    main()
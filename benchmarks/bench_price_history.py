@@ -0,0 +1,98 @@
+"""Price history: minute-level backfill, point-in-time lookups, averages and chart windows.
+
+Backfills --days of one-minute samples for --crops crops, then times the
+read paths against the full history. Peak RSS shows that queries only
+touch the chunks and rollups they need.
+
+    python benchmarks/bench_price_history.py --days 365 --crops 2
+"""
+import argparse
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from growagarden.price_history import DAY, PriceHistory
+
+
+def timed_queries(fn, args_list):
+    latencies = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--crops", type=int, default=2)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    start = 1_700_000_000 // DAY * DAY
+    end = start + args.days * DAY
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "price_history.db")
+        history = PriceHistory(path)
+
+        began = time.perf_counter()
+        samples = 0
+        for crop_id in range(args.crops):
+            # A month of minutes per call, like a bulk import would
+            for month in range(start, end, 30 * DAY):
+                ts = np.arange(month, min(month + 30 * DAY, end), 60)
+                kg = 100 + rng.standard_normal(len(ts)).cumsum() * 0.1
+                history.append(crop_id, ts, kg, kg * 2)
+                samples += len(ts)
+        elapsed = time.perf_counter() - began
+        size = sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+        print(f"backfill: {samples:,} samples in {elapsed:.1f}s ({samples / elapsed:,.0f}/s), "
+              f"{size / samples:.1f} bytes/sample, {size / 2**20:.1f} MiB")
+
+        began = time.perf_counter()
+        history.record({crop_id: (101.0, 202.0) for crop_id in range(args.crops)}, end - 1)
+        print(f"live append (one sample per crop): {(time.perf_counter() - began) * 1000:.2f} ms")
+
+        r = random.Random(1)
+
+        def crops():
+            return r.randrange(args.crops)
+
+        cases = {
+            "point-in-time price_at": (history.price_at,
+                                       [(crops(), r.randrange(start, end)) for _ in range(args.queries)]),
+            "7-day average": (lambda c, t: history.average(c, 7 * DAY, now=t),
+                              [(crops(), r.randrange(start + 7 * DAY, end)) for _ in range(args.queries)]),
+            "aggregate, random range": (history.aggregate,
+                                        [(crops(), *sorted(r.sample(range(start, end), 2)))
+                                         for _ in range(args.queries)]),
+        }
+        for label, window in (("24h", DAY), ("30d", 30 * DAY), ("1y", 365 * DAY)):
+            if window <= args.days * DAY:
+                cases[f"chart series {label}"] = (
+                    history.series, [(crops(), t - window, t)
+                                     for t in (r.randrange(start + window, end + 1)
+                                               for _ in range(max(args.queries // 10, 1)))])
+
+        for label, (fn, args_list) in cases.items():
+            p50, p99 = timed_queries(fn, args_list)
+            print(f"  {label:<26} p50 {p50 * 1000:8.3f} ms   p99 {p99 * 1000:8.3f} ms")
+        history.close()
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"peak RSS: {peak:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
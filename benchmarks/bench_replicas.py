@@ -0,0 +1,180 @@
+"""Two app replicas converging on one trade through the networked (Redis-protocol) backend.
+
+Starts the bundled ``growagarden.resp_server`` (or uses --url, e.g. a real
+Redis), then two replica processes, each with its own backend client and
+write-behind queue, the way two Streamlit nodes behind a load balancer
+would run. Replica 0 creates a trade and replica 1 joins it by code. Both
+then edit their offer --edits times while watching the other's through the
+change feed; propagation latency is from one replica's save_offer call to
+the other seeing the new offer. At the end both must read identical offers.
+
+    python benchmarks/bench_replicas.py --edits 200
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from growagarden.resp import RespClient
+from growagarden.trade_backends import open_trade_backend
+from growagarden.write_behind import WriteBehind
+
+
+def summary(latencies):
+    latencies = sorted(latencies)
+    return {"p50_ms": statistics.median(latencies) * 1000,
+            "p99_ms": latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000,
+            "max_ms": latencies[-1] * 1000}
+
+
+def timed_calls(fn, n=500):
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return summary(latencies)
+
+
+def replica(index, url, codes, barrier, results, edits, edit_interval):
+    store = open_trade_backend(url)
+    writer = WriteBehind(store, interval=0.005).start()
+    store.feed.poll_interval = 0.002
+    user = f"replica{index}"
+    if index == 0:
+        code = store.create_trade()
+        codes.put(code)
+    else:
+        # Joins by code, after checking it exists like the page does
+        code = codes.get()
+        assert store.trade_exists(code)
+    barrier.wait()
+
+    # Watch the other replica's offer: each offer carries the wall-clock time it was saved at
+    seen, propagation, stop = set(), [], threading.Event()
+
+    def watch():
+        version = -1
+        while not stop.is_set():
+            version = store.feed.wait(code, user, version, timeout=0.05)
+            row = store.get_other_offer_row(code, user)
+            if row and row[1] not in seen:
+                seen.add(row[1])
+                propagation.append(time.time() - float(row[1].split(b"@")[1]))
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+
+    enqueue = []
+    for i in range(edits):
+        start = time.perf_counter()
+        writer.save_offer(code, user, b"%d:%d@%.6f" % (index, i, time.time()))
+        enqueue.append(time.perf_counter() - start)
+        time.sleep(edit_interval)
+    writer.flush()
+    barrier.wait()
+    time.sleep(0.2)
+    stop.set()
+    watcher.join()
+    writer.stop()
+
+    # Round trips and pipelining, straight against the backend
+    other = f"replica{1 - index}"
+    ops = {
+        "enqueue (write-behind)": summary(enqueue),
+        "save_offer": timed_calls(
+            lambda counter=iter(range(10**9)): store.save_offer(code, f"{user}-extra", b"%d" % next(counter)), 200),
+        "get_other_offer_row": timed_calls(lambda: store.get_other_offer_row(code, user)),
+        "counterparty_version": timed_calls(lambda: store.feed.counterparty_version(code, user)),
+    }
+    batch = {(code, f"{user}-bulk{i}"): b"x" for i in range(500)}
+    start = time.perf_counter()
+    store.save_offers(batch)
+    pipelined = time.perf_counter() - start
+    start = time.perf_counter()
+    for (c, u), _ in batch.items():
+        store.save_offer(c, u, b"y")
+    sequential = time.perf_counter() - start
+
+    barrier.wait()
+    results.put({
+        "index": index,
+        "offers": {u: offer for u, offer, _ in store.get_offers(code) if u in (user, other)},
+        "propagation": summary(propagation) if propagation else None,
+        "seen": len(seen),
+        "ops": ops,
+        "pipelined_500_ms": pipelined * 1000,
+        "sequential_500_ms": sequential * 1000,
+    })
+    store.close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="use this Redis instead of starting the bundled server")
+    parser.add_argument("--edits", type=int, default=200)
+    parser.add_argument("--edit-interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        port = free_port()
+        server = subprocess.Popen([sys.executable, "-m", "growagarden.resp_server", "--port", str(port)],
+                                  cwd=ROOT, stderr=subprocess.DEVNULL)
+        url = f"redis://127.0.0.1:{port}/0"
+        client = RespClient.from_url(url)
+        for _ in range(100):
+            try:
+                client.execute("PING")
+                break
+            except OSError:
+                time.sleep(0.05)
+        client.close()
+
+    try:
+        codes, results = multiprocessing.Queue(), multiprocessing.Queue()
+        barrier = multiprocessing.Barrier(2)
+        replicas = [multiprocessing.Process(target=replica, args=(i, url, codes, barrier, results, args.edits,
+                                                                  args.edit_interval)) for i in range(2)]
+        for process in replicas:
+            process.start()
+        reports = sorted((results.get(timeout=120) for _ in replicas), key=lambda r: r["index"])
+        for process in replicas:
+            process.join()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    # Both read the same offers, and they are each replica's last edit
+    final = {user: offer.split(b"@")[0].decode() for user, offer in reports[0]["offers"].items()}
+    converged = (reports[0]["offers"] == reports[1]["offers"]
+                 and final == {f"replica{i}": f"{i}:{args.edits - 1}" for i in range(2)})
+    print(f"backend {url}: replicas converged: {converged} ({final})")
+    for report in reports:
+        p = report["propagation"]
+        print(f"replica{report['index']}: observed {report['seen']}/{args.edits} of the other's edits, "
+              f"propagation p50 {p['p50_ms']:.1f} ms  p99 {p['p99_ms']:.1f} ms  max {p['max_ms']:.1f} ms")
+    for name, stats in reports[0]["ops"].items():
+        print(f"  {name:<28} p50 {stats['p50_ms']:7.3f} ms  p99 {stats['p99_ms']:7.3f} ms")
+    print(f"  500 offers: pipelined {reports[0]['pipelined_500_ms']:.1f} ms, "
+          f"one call each {reports[0]['sequential_500_ms']:.1f} ms")
+    sys.exit(0 if converged else 1)
+
+
+if __name__ == "__main__":
+    main()
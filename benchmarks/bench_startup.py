@@ -0,0 +1,121 @@
+"""Cold start of the trade page: import time and time to first render, against a budget.
+
+Import time runs the page's top-level imports under ``python -X importtime``
+in a fresh interpreter. Time to first render starts a fresh interpreter,
+runs the page once through Streamlit's AppTest (Calculator mode, what a new
+visitor sees) and then switches to a trade mode, which is when the trade,
+QR and database dependencies are loaded. Exits non-zero if a budget is
+exceeded, so it can guard CI.
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGE = os.path.join(ROOT, "For_Public_Useage.py")
+
+# Modules a Calculator-only visit must not import
+LAZY_MODULES = ("qrcode", "PIL", "pandas", "growagarden.trade_store", "growagarden.write_behind")
+
+FIRST_RENDER = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=60).run()
+first = time.perf_counter() - started
+lazy = [m for m in json.loads(sys.argv[2]) if m in sys.modules]
+started = time.perf_counter()
+at.sidebar.selectbox[0].select("1-Person Trade").run()
+trade = time.perf_counter() - started
+assert not at.exception, at.exception
+print(json.dumps({"first_render": first, "first_trade_render": trade, "eager_lazy_modules": lazy}))
+"""
+
+
+def page_imports(path):
+    """The page's top-level import statements, as source."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def import_time(source):
+    """``(total seconds, {top-level module: cumulative seconds})`` from ``-X importtime``.
+
+    Modules the bare interpreter imports at startup (``site``, ``encodings``...) are left out.
+    """
+    def run(code):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+        modules = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if not name.startswith("  "):
+                modules[name.strip()] = int(cumulative) / 1e6
+        return modules
+
+    startup = run("pass")
+    modules = {name: seconds for name, seconds in run(source).items() if name not in startup}
+    return sum(modules.values()), modules
+
+
+def first_render(tmp):
+    env = dict(os.environ, PYTHONPATH=ROOT, GROWAGARDEN_DB=os.path.join(tmp, "growagarden.db"))
+    result = subprocess.run([sys.executable, "-c", FIRST_RENDER, PAGE, json.dumps(LAZY_MODULES)],
+                            cwd=tmp, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=800)
+    parser.add_argument("--render-budget-ms", type=float, default=1000)
+    parser.add_argument("--top", type=int, default=8, help="heaviest imports to list")
+    args = parser.parse_args()
+
+    totals, per_module = [], {}
+    for _ in range(args.runs):
+        total, modules = import_time(page_imports(PAGE))
+        totals.append(total)
+        for name, seconds in modules.items():
+            per_module.setdefault(name, []).append(seconds)
+    import_ms = statistics.median(totals) * 1000
+    print(f"page imports: {import_ms:.0f} ms (median of {args.runs})")
+    heaviest = sorted(per_module.items(), key=lambda item: -statistics.median(item[1]))[:args.top]
+    for name, seconds in heaviest:
+        print(f"  {name:<40} {statistics.median(seconds) * 1000:7.1f} ms")
+
+    renders = []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            renders.append(first_render(tmp))
+    first_ms = statistics.median(r["first_render"] for r in renders) * 1000
+    trade_ms = statistics.median(r["first_trade_render"] for r in renders) * 1000
+    print(f"time to first render (Calculator): {first_ms:.0f} ms")
+    print(f"first switch to a trade mode:      {trade_ms:.0f} ms")
+
+    failures = []
+    eager = sorted({m for r in renders for m in r["eager_lazy_modules"]})
+    if eager:
+        failures.append(f"loaded before a trade mode was selected: {', '.join(eager)}")
+    if import_ms > args.import_budget_ms:
+        failures.append(f"page imports {import_ms:.0f} ms > budget {args.import_budget_ms:.0f} ms")
+    if first_ms > args.render_budget_ms:
+        failures.append(f"first render {first_ms:.0f} ms > budget {args.render_budget_ms:.0f} ms")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Load benchmark: N concurrent trade sessions hammering one SQLite file.
+
+Each simulated session repeats what one 2-Person Trade autorefresh does:
+save its own offer, then read the counterparty's offer twice. The legacy
+mode reproduces the old per-rerun connect + REPLACE + commit pattern.
+
+    python benchmarks/bench_trade_store.py --sessions 200 --reruns 20
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from growagarden.trade_store import TradeStore
+
+
+def legacy_rerun(path, code, user, offer):
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE IF NOT EXISTS trades (code TEXT, user TEXT, offer TEXT)")
+    conn.commit()
+    cursor.execute("REPLACE INTO trades (code, user, offer) VALUES (?, ?, ?)", (code, user, offer))
+    conn.commit()
+    for _ in range(2):
+        cursor.execute("SELECT user, offer FROM trades WHERE code=? AND user<>?", (code, user))
+        cursor.fetchone()
+    conn.close()
+
+
+def store_rerun(store, code, user, offer):
+    store.save_offer(code, user, offer)
+    for _ in range(2):
+        store.get_other_offer(code, user)
+
+
+def run(mode, sessions, reruns, change_every):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "growagarden.db")
+        store = TradeStore(path) if mode == "store" else None
+        latencies = []
+        lock = threading.Lock()
+
+        def session(i):
+            code, user = f"{i // 2:06d}", f"user{i}"
+            local = []
+            for rerun in range(reruns):
+                offer = str([("Carrot", 1.0 + rerun // change_every, [])])
+                start = time.perf_counter()
+                if store is None:
+                    legacy_rerun(path, code, user, offer)
+                else:
+                    store_rerun(store, code, user, offer)
+                local.append(time.perf_counter() - start)
+            with lock:
+                latencies.extend(local)
+
+        threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        if store is not None:
+            store.close()
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "reruns_per_sec": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--change-every", type=int, default=5,
+                        help="reruns between offer edits (unchanged reruns skip the write)")
+    args = parser.parse_args()
+
+    for mode in ("legacy", "store"):
+        result = run(mode, args.sessions, args.reruns, args.change_every)
+        print(f"{result['mode']:>7}: {result['reruns_per_sec']:8.0f} reruns/s  "
+              f"p50 {result['p50_ms']:6.2f} ms  p99 {result['p99_ms']:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Write-behind vs synchronous offer saves under a simulated autorefresh load.
+
+Each of --users sessions (two per trade) reruns every --refresh seconds,
+editing its offer with probability --edit-rate; a rerun encodes and saves
+the offer, then reads the counterparty's. A background "slow disk" holds
+the write lock for --lock-ms every --lock-every-ms, the way a long sweep
+batch or a stalled fsync would. Render latency is the time one rerun
+spends in the store.
+
+    python benchmarks/bench_write_behind.py --users 500 --reruns 10
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from growagarden.catalog import get_catalog
+from growagarden.offer_codec import encode_offer
+from growagarden.trade_store import TradeStore
+from growagarden.write_behind import WriteBehind
+
+
+def slow_disk(path, hold, every, stop):
+    conn = sqlite3.connect(path, isolation_level=None)
+    while not stop.wait(every):
+        conn.execute("BEGIN IMMEDIATE")
+        time.sleep(hold)
+        conn.execute("COMMIT")
+    conn.close()
+
+
+def run(mode, args):
+    catalog = get_catalog()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "growagarden.db")
+        store = TradeStore(path, busy_timeout=30)
+        codes = store.create_trades(args.users // 2 + 1)
+        writer = WriteBehind(store).start() if mode == "write-behind" else None
+        save = writer.save_offer if writer else store.save_offer
+
+        stop = threading.Event()
+        locker = threading.Thread(target=slow_disk, args=(path, args.lock_ms / 1000, args.lock_every_ms / 1000, stop))
+        locker.start()
+        latencies = []
+        lock = threading.Lock()
+
+        def session(i):
+            r = random.Random(i)
+            code, user = codes[i // 2], f"user{i}"
+            weight = 1.0
+            local = []
+            time.sleep(r.random() * args.refresh)
+            for _ in range(args.reruns):
+                if r.random() < args.edit_rate:
+                    weight += 0.1
+                started = time.perf_counter()
+                save(code, user, encode_offer([("Carrot", weight, ["Wet"]), ("Apple", 2.0, [])], catalog.valuation))
+                store.get_other_offer_row(code, user)
+                local.append(time.perf_counter() - started)
+                time.sleep(args.refresh * r.uniform(0.9, 1.1))
+            with lock:
+                latencies.extend(local)
+
+        threads = [threading.Thread(target=session, args=(i,)) for i in range(args.users)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if writer:
+            writer.stop()
+        stop.set()
+        locker.join()
+        store.close()
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "renders": len(latencies),
+        "commits": store.commits,
+        "rows_written": store.writes,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--refresh", type=float, default=1.0, help="seconds between autorefresh reruns")
+    parser.add_argument("--edit-rate", type=float, default=0.5)
+    parser.add_argument("--lock-ms", type=float, default=50)
+    parser.add_argument("--lock-every-ms", type=float, default=500)
+    args = parser.parse_args()
+
+    for mode in ("sync", "write-behind"):
+        result = run(mode, args)
+        print(f"{result['mode']:>12}: {result['renders']} renders  "
+              f"p50 {result['p50_ms']:7.2f} ms  p99 {result['p99_ms']:7.2f} ms  max {result['max_ms']:7.1f} ms  "
+              f"{result['commits']} commits for {result['rows_written']} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Load test for the valuation service: p50/p99 latency and requests/sec.
+
+Starts ``python -m growagarden.server`` on a free port (unless --port points
+at a running one) and drives it with keep-alive connections.
+
+    python benchmarks/loadtest_server.py --workers 2 --connections 32 --items 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from growagarden.catalog import get_catalog
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_body(endpoint, items):
+    catalog = get_catalog()
+    rng = random.Random(items)
+
+    def item():
+        return {"crop": rng.choice(catalog.crop_names), "units": round(rng.uniform(0.1, 20), 2),
+                "mutations": rng.sample(catalog.mutations.names, rng.randint(0, 2))}
+
+    if endpoint == "/value":
+        payload = {"items": [item() for _ in range(items)]}
+    else:
+        payload = {"trades": [{"mine": [item()], "theirs": [item()]} for _ in range(items)]}
+    return json.dumps(payload).encode()
+
+
+async def client(host, port, request, deadline, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = int(head.split(b"Content-Length: ", 1)[1].split(b"\r\n", 1)[0])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, endpoint, body, connections, seconds):
+    request = (f"POST {endpoint} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+               f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    await asyncio.gather(*(client(host, port, request, deadline, latencies) for _ in range(connections)))
+    return latencies, time.perf_counter() - started
+
+
+def wait_for_port(host, port, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on {host}:{port} did not come up")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="use an already running server")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--endpoint", choices=("/value", "/compare"), default="/value")
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--items", type=int, default=20, help="items (or trades) per request")
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    server = None
+    port = args.port
+    if port is None:
+        port = free_port()
+        server = subprocess.Popen([sys.executable, "-m", "growagarden.server", "--host", args.host,
+                                   "--port", str(port), "--workers", str(args.workers), "--db", ""],
+                                  cwd=ROOT)
+    try:
+        wait_for_port(args.host, port)
+        latencies, elapsed = asyncio.run(run_load(args.host, port, args.endpoint,
+                                                  make_body(args.endpoint, args.items),
+                                                  args.connections, args.seconds))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    latencies.sort()
+    print(f"{args.endpoint} x{args.items}, {args.connections} connections, {args.workers} worker(s)")
+    print(f"  requests/sec: {len(latencies) / elapsed:10.0f}")
+    print(f"  p50 latency:  {statistics.median(latencies) * 1000:10.2f} ms")
+    print(f"  p99 latency:  {latencies[int(len(latencies) * 0.99) - 1] * 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""Benchmark suite: valuation, trade comparison, persistence, codec, QR and page reruns.
+
+Each case reports the best and median time per operation over several
+repeats. Results are written to JSON and compared with the stored baseline
+(benchmarks/baseline.json); cases slower than the threshold are flagged.
+
+    python benchmarks/run_all.py                       # run everything, compare
+    python benchmarks/run_all.py valuation codec       # cases whose name starts with these
+    python benchmarks/run_all.py --save-baseline       # make this run the new baseline
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from io import BytesIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from growagarden.catalog import get_catalog
+from growagarden.core import calculate_value, offer_values, trade_fairness
+from growagarden.marketplace import OrderBook
+from growagarden.offer_codec import decode_offer, encode_offer
+from growagarden.running_offer import RunningOffer
+from growagarden.trade_store import TradeStore
+from growagarden.write_behind import WriteBehind
+
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+CASES = {}
+
+
+def case(name, unit="call"):
+    """Register ``setup(tmp) -> fn``; ``fn()`` is timed and covers ``unit`` ops per call.
+
+    ``unit`` is ``"call"`` or ``(label, ops)`` when one call does ``ops`` operations.
+    """
+    def register(setup):
+        CASES[name] = (setup, unit)
+        return setup
+    return register
+
+
+def make_offer(catalog, rows, seed=0):
+    rng = random.Random(seed)
+    return [(rng.choice(catalog.crop_names), round(rng.uniform(0.1, 50), 1),
+             rng.sample(catalog.mutations.names, rng.randint(0, 3))) for _ in range(rows)]
+
+
+def mutation_combos(catalog, max_size):
+    names = catalog.mutations.names
+    return [list(c) for size in range(max_size + 1) for c in itertools.combinations(names, size)]
+
+
+CATALOG = get_catalog()
+SINGLE_COMBOS = [(crop, m) for crop in CATALOG.crop_names for m in mutation_combos(CATALOG, 2)]
+BATCH_COMBOS = [(crop, m) for crop in CATALOG.crop_names for m in mutation_combos(CATALOG, 3)]
+LARGE_OFFER_ROWS = 10_000
+
+
+# === Valuation ===
+@case("valuation.single_all_combos", ("value", len(SINGLE_COMBOS)))
+def valuation_single(tmp):
+    def run():
+        for crop, mutations in SINGLE_COMBOS:
+            calculate_value(crop, 2.5, mutations, catalog=CATALOG)
+    return run
+
+
+@case("valuation.batch_all_combos", ("row", len(BATCH_COMBOS)))
+def valuation_batch(tmp):
+    valuation = CATALOG.valuation
+    crop_ids, masks = valuation.encode(*zip(*BATCH_COMBOS))
+    units = [2.5] * len(BATCH_COMBOS)
+    return lambda: valuation.batch_value(crop_ids, units, 0, masks)
+
+
+@case("core.trade_fairness_large_offers", ("row", 2 * LARGE_OFFER_ROWS))
+def fairness_large(tmp):
+    mine = make_offer(CATALOG, LARGE_OFFER_ROWS, seed=1)
+    theirs = make_offer(CATALOG, LARGE_OFFER_ROWS, seed=2)
+    return lambda: trade_fairness(sum(offer_values(mine, catalog=CATALOG)),
+                                  sum(offer_values(theirs, catalog=CATALOG)))
+
+
+@case("offer.running_total_edit_500_rows")
+def running_total_edit(tmp):
+    offer = RunningOffer(CATALOG.valuation)
+    row_ids = [offer.add(*row) for row in make_offer(CATALOG, 500)]
+    turn = itertools.count()
+
+    def run():
+        # One row edited per rerun; the other 499 are not revalued
+        i = next(turn)
+        offer.set(row_ids[i % 500], "Carrot", 1.0 + i % 7, ["Wet"])
+        return offer.total
+    return run
+
+
+@case("market.match_100k_offers")
+def market_match(tmp):
+    book = OrderBook(CATALOG.valuation, CATALOG.revision)
+    r = random.Random(0)
+    for i in range(100_000):
+        value = r.lognormvariate(10, 2)
+        book.post(f"user{i}", [("Carrot", 1.0, [])], value * 0.8, value * 1.25, value=value)
+    targets = [r.lognormvariate(10, 2) for _ in range(1000)]
+    turn = itertools.count()
+    return lambda: book.match_value(targets[next(turn) % 1000], 10)
+
+
+# === Persistence ===
+def _store(tmp, users=100):
+    store = TradeStore(os.path.join(tmp, "bench.db"))
+    code = store.create_trade()
+    blobs = [encode_offer(make_offer(CATALOG, 5, seed=i), CATALOG.valuation) for i in range(2)]
+    for user in range(users):
+        store.save_offer(code, f"user{user}", blobs[0])
+    return store, code, blobs
+
+
+@case("store.save_offer_changed")
+def store_save_changed(tmp):
+    store, code, blobs = _store(tmp)
+    turn = itertools.count()
+
+    def run():
+        # Alternate between two offers so every call really writes
+        i = next(turn)
+        store.save_offer(code, f"user{i % 100}", blobs[i // 100 % 2 ^ 1])
+    return run
+
+
+@case("store.save_offer_queued")
+def store_save_queued(tmp):
+    store, code, blobs = _store(tmp)
+    writer = WriteBehind(store).start()
+    turn = itertools.count()
+
+    def run():
+        # What a rerun pays with write-behind; the commit happens on the writer thread
+        i = next(turn)
+        writer.save_offer(code, f"user{i % 100}", blobs[i // 100 % 2 ^ 1])
+    return run
+
+
+@case("store.save_offer_unchanged")
+def store_save_unchanged(tmp):
+    store, code, blobs = _store(tmp)
+    return lambda: store.save_offer(code, "user0", blobs[0])
+
+
+@case("store.get_other_offer")
+def store_get_other(tmp):
+    store, code, blobs = _store(tmp, users=2)
+    return lambda: store.get_other_offer(code, "user0")
+
+
+# === Serialization ===
+for rows in (5, 500):
+    @case(f"codec.encode_{rows}_rows")
+    def codec_encode(tmp, rows=rows):
+        offer = make_offer(CATALOG, rows)
+        return lambda: encode_offer(offer, CATALOG.valuation)
+
+    @case(f"codec.decode_{rows}_rows")
+    def codec_decode(tmp, rows=rows):
+        blob = encode_offer(make_offer(CATALOG, rows), CATALOG.valuation)
+        return lambda: decode_offer(blob, CATALOG.valuation)
+
+
+@case("qr.generate")
+def qr_generate(tmp):
+    import qrcode
+
+    codes = itertools.cycle(f"{i:06d}" for i in range(1000))
+
+    def run():
+        # The page caches by code; this is the cost of a cache miss
+        buf = BytesIO()
+        qrcode.make(next(codes)).save(buf, format="PNG")
+        return buf.getvalue()
+    return run
+
+
+# === Pages ===
+def _app(script, tmp):
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    # Fresh databases per case, in this case's temp directory
+    st.cache_resource.clear()
+    os.environ["GROWAGARDEN_DB"] = os.path.join(tmp, "page.db")
+    os.environ["GROWAGARDEN_PRICE_DB"] = os.path.join(tmp, "price_history.db")
+    return AppTest.from_file(os.path.join(ROOT, script), default_timeout=60).run()
+
+
+@case("page.app_rerun")
+def page_app(tmp):
+    return _app("For Public Useage.py", tmp).run
+
+
+@case("page.trade_calculator_rerun")
+def page_trade_calculator(tmp):
+    return _app("For_Public_Useage.py", tmp).run
+
+
+@case("page.trade_2p_rerun")
+def page_trade_2p(tmp):
+    at = _app("For_Public_Useage.py", tmp)
+    at.sidebar.selectbox[0].set_value("2-Person Trade").run()
+    next(b for b in at.button if b.label == "Generate Trade Code").click().run()
+    return at.run
+
+
+# === Runner ===
+def measure(fn, repeat, min_time):
+    fn()  # warm caches and lazy imports
+    timer = timeit.Timer(fn)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    times = [seconds / number for seconds in timer.repeat(repeat, number)]
+    return {"best_seconds": min(times), "median_seconds": statistics.median(times),
+            "number": number, "repeat": repeat}
+
+
+def run_cases(names, repeat, min_time):
+    results = {}
+    for name in names:
+        setup, unit = CASES[name]
+        label, ops = ("call", 1) if unit == "call" else unit
+        with tempfile.TemporaryDirectory() as tmp:
+            result = measure(setup(tmp), repeat, min_time)
+        result.update(unit=label, ops_per_call=ops,
+                      best_seconds_per_op=result["best_seconds"] / ops)
+        results[name] = result
+        print(f"{name:<34} {result['best_seconds'] * 1e3:10.3f} ms/call"
+              + (f"  {result['best_seconds_per_op'] * 1e6:8.3f} us/{label}" if ops > 1 else ""),
+              flush=True)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print the ratio to the baseline per case; returns the names that regressed."""
+    regressions = []
+    print(f"\nvs baseline ({baseline['meta'].get('git')} at {baseline['meta'].get('timestamp')}):")
+    for name, result in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"  {name:<34} (new)")
+            continue
+        ratio = result["best_seconds"] / base["best_seconds"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 / (1 + threshold):
+            flag = "  faster"
+        print(f"  {name:<34} x{ratio:6.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("only", nargs="*", help="run cases whose name starts with any of these")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per repeat (at least)")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="also write the results to --baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="flag cases this much slower than the baseline (0.25 = 25%%)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 on a regression")
+    args = parser.parse_args()
+
+    names = [name for name in CASES if not args.only or name.startswith(tuple(args.only))]
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "catalog": CATALOG.revision.split(":")[0],
+        },
+        "results": run_cases(names, args.repeat, args.min_time),
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+    regressions = []
+    if args.save_baseline:
+        # Merge, so saving a subset keeps the other cases' baselines
+        baseline = {"meta": report["meta"], "results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline["results"] = json.load(f)["results"]
+        baseline["results"].update(report["results"])
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(report["results"], json.load(f), args.threshold)
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Stress test for trade-code allocation: uniqueness over millions of codes and lookup latency.
+
+Several TradeStore instances (as separate app processes would) allocate
+codes from one temp database in interleaved batches.
+
+    python benchmarks/stress_trade_codes.py --codes 2000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from growagarden.trade_store import TradeStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--codes", type=int, default=2_000_000)
+    parser.add_argument("--stores", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=10_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "growagarden.db")
+        stores = [TradeStore(path) for _ in range(args.stores)]
+
+        codes = []
+        start = time.perf_counter()
+        while len(codes) < args.codes:
+            store = stores[len(codes) // args.batch % len(stores)]
+            codes.extend(store.create_trades(min(args.batch, args.codes - len(codes))))
+        elapsed = time.perf_counter() - start
+
+        collisions = len(codes) - len(set(codes))
+        with stores[0].connection() as conn:
+            stored = conn.execute("SELECT COUNT(DISTINCT code) FROM trade_sessions").fetchone()[0]
+        print(f"allocated {len(codes):,} codes in {elapsed:.1f} s ({len(codes) / elapsed:,.0f}/s)")
+        print(f"collisions: {collisions}, distinct codes stored: {stored:,}")
+
+        rng = random.Random(0)
+        samples = [rng.choice(codes) for _ in range(args.lookups // 2)]
+        samples += ["ZZZZZZ"] * (args.lookups - len(samples))  # misses
+        latencies = []
+        for code in samples:
+            t = time.perf_counter()
+            stores[0].trade_exists(code)
+            latencies.append(time.perf_counter() - t)
+        latencies.sort()
+        print(f"trade_exists: p50 {statistics.median(latencies) * 1e6:.1f} us, "
+              f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1e6:.1f} us")
+
+        for store in stores:
+            store.close()
+        if collisions or stored != len(codes):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
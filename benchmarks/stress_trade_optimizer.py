@@ -0,0 +1,114 @@
+"""Stress test for the trade optimizer against brute-force enumeration.
+
+Random small inventories (every subset enumerated) plus long runs of small
+items next to a large one, which a coarse DP rounds away. Every answer must
+be fair, the optimizer must find an answer whenever one exists, and "items"
+answers must use the brute-force minimum number of items. "overshoot" is only optimal to
+within the DP's step, so the largest gap to the brute-force overshoot is
+reported as a fraction of the target.
+
+    python benchmarks/stress_trade_optimizer.py --cases 2000
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from growagarden.trade_optimizer import OBJECTIVES, best_counter_offer, fairness_band
+
+
+def objective_key(total, count, target, objective):
+    over = total - target
+    overshoot = (over < 0, abs(over))
+    return (count, overshoot) if objective == "items" else (overshoot, count)
+
+
+def brute_force(target, values, objective):
+    low, high = fairness_band(target)
+    best = None
+    for size in range(1, len(values) + 1):
+        for combo in itertools.combinations(range(len(values)), size):
+            total = sum(values[i] for i in combo)
+            if low < total < high:
+                key = objective_key(total, size, target, objective)
+                if best is None or key < best:
+                    best = key
+    return best
+
+
+def random_case(rng):
+    n = rng.randint(1, 12)
+    kind = rng.choice(("lognormal", "integers", "mixed"))
+    if kind == "lognormal":
+        values = [rng.lognormvariate(8, 2) for _ in range(n)]
+    elif kind == "integers":
+        values = [float(rng.randint(1, 50) * 100) for _ in range(n)]
+    else:
+        values = [rng.choice((rng.uniform(0.5, 5), rng.uniform(1e3, 1e6))) for _ in range(n)]
+    subset = rng.sample(values, rng.randint(1, n))
+    target = sum(subset) * rng.uniform(0.85, 1.15)
+    return target, values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    unfair = missed = more_items = 0
+    overshoot_gap = 0.0
+    start = time.perf_counter()
+    for _ in range(args.cases):
+        target, values = random_case(rng)
+        low, high = fairness_band(target)
+        for objective in OBJECTIVES:
+            expected = brute_force(target, values, objective)
+            result = best_counter_offer(target, values, objective)
+            if result is None:
+                missed += expected is not None
+                continue
+            indices, total = result
+            if not low < sum(values[i] for i in indices) < high or len(set(indices)) != len(indices):
+                unfair += 1
+            elif objective == "items":
+                more_items += len(indices) > expected[0]
+            elif (total < target) == expected[0][0]:
+                overshoot_gap = max(overshoot_gap, (abs(total - target) - expected[0][1]) / target)
+            else:
+                overshoot_gap = max(overshoot_gap, abs(total - target) / target)
+    elapsed = time.perf_counter() - start
+    print(f"{args.cases} random cases x {len(OBJECTIVES)} objectives in {elapsed:.1f} s: "
+          f"{unfair} unfair answers, {missed} missed answers, {more_items} with more items than needed, "
+          f"overshoot at most {overshoot_gap:.4%} of the target above the optimum")
+
+    # Many small items next to one large one; the fair answers are easy to count by hand
+    # (3 coins x 20000 is too fine for the DP, so only the repair pass can use those items)
+    for small, count in ((60, 600), (120, 600), (140, 600), (0.5, 600), (3, 20_000)):
+        values = [850_000] + [small] * count
+        for objective in OBJECTIVES:
+            result = best_counter_offer(1_000_000, values, objective)
+            needed = int(np.floor((900_000 - 850_000) / small)) + 1
+            reachable = 850_000 + count * small > 900_000
+            ok = (result is not None) == reachable
+            if result is not None:
+                low, high = fairness_band(1_000_000)
+                ok = ok and low < result[1] < high
+                if objective == "items":
+                    ok = ok and len(result[0]) == needed + 1
+            missed += not ok
+            print(f"[850000] + [{small}] x {count}, {objective}: "
+                  f"{'none' if result is None else f'{len(result[0])} items = {result[1]:,.1f}'}"
+                  f"{'' if ok else '  <-- wrong'}")
+    sys.exit(0 if unfair == 0 and missed == 0 and more_items == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+# Shared, UI-free building blocks for the Grow a Garden apps.
+from growagarden.catalog import get_catalog
+from growagarden.core import best_mutations, calculate_value, offer_values, top_crops, trade_fairness
@@ -0,0 +1,193 @@
+import csv
+import re
+from functools import lru_cache
+from itertools import islice
+
+import numpy as np
+
+from growagarden.catalog import get_catalog
+from growagarden.valuation import CALCULATION_MODES, MODE_PER_ITEM, MODE_PER_KG
+
+# Accepted column names (case-insensitive). Units come from "weight" (per kg)
+# or "quantity" (per item); an explicit "mode" column overrides either.
+CROP_COLUMN = "crop"
+UNIT_COLUMNS = {"weight": MODE_PER_KG, "quantity": MODE_PER_ITEM, "units": MODE_PER_KG}
+MUTATIONS_COLUMN = "mutations"
+MODE_COLUMN = "mode"
+MODE_ALIASES = {**{name.lower(): mode for name, mode in CALCULATION_MODES.items()},
+                "kg": MODE_PER_KG, "item": MODE_PER_ITEM, "items": MODE_PER_ITEM}
+
+# Several mutations share one cell: "Wet|Chilled", "Wet;Chilled" or "Wet, Chilled"
+# (or a list of names, in a Parquet list column)
+MUTATION_SEPARATORS = re.compile(r"\s*[|;,]\s*")
+
+DEFAULT_CHUNK_ROWS = 50_000
+
+
+class BulkSummary:
+    """Running totals for a bulk valuation; memory is O(crops + mutations)."""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.rows = 0
+        self.invalid_rows = 0
+        self.total = 0.0
+        self._crop_totals = np.zeros(len(catalog.crop_names) + 1)
+        self._crop_counts = np.zeros(len(catalog.crop_names) + 1, dtype=np.int64)
+        self._mutation_totals = np.zeros(len(catalog.mutations.names))
+        self._mutation_counts = np.zeros(len(catalog.mutations.names), dtype=np.int64)
+
+    def add(self, crop_ids, masks, values):
+        size = len(self._crop_totals)
+        self.rows += len(values)
+        self.total += float(values.sum())
+        self._crop_totals += np.bincount(crop_ids, weights=values, minlength=size)
+        self._crop_counts += np.bincount(crop_ids, minlength=size)
+        for bit in range(len(self._mutation_totals)):
+            has = (masks >> bit) & 1 == 1
+            self._mutation_totals[bit] += values[has].sum()
+            self._mutation_counts[bit] += has.sum()
+
+    def by_crop(self):
+        """``[{"Crop", "Rows", "Total Value"}, ...]`` sorted by value, largest first."""
+        names = list(self.catalog.crop_names) + ["(unknown)"]
+        return sorted(
+            ({"Crop": names[i], "Rows": int(self._crop_counts[i]), "Total Value": float(self._crop_totals[i])}
+             for i in np.flatnonzero(self._crop_counts)),
+            key=lambda row: row["Total Value"], reverse=True)
+
+    def by_mutation(self):
+        """Value of every row carrying each mutation (a row can count towards several)."""
+        names = self.catalog.mutations.names
+        return sorted(
+            ({"Mutation": names[i], "Rows": int(self._mutation_counts[i]),
+              "Total Value": float(self._mutation_totals[i])}
+             for i in np.flatnonzero(self._mutation_counts)),
+            key=lambda row: row["Total Value"], reverse=True)
+
+
+# === Readers ===
+def _columns(header):
+    columns = {name.strip().lower(): i for i, name in enumerate(header)}
+    if CROP_COLUMN not in columns:
+        raise ValueError(f"Missing '{CROP_COLUMN}' column; got {list(header)}.")
+    unit_columns = [name for name in UNIT_COLUMNS if name in columns]
+    if not unit_columns:
+        raise ValueError(f"Need one of {sorted(UNIT_COLUMNS)} columns; got {list(header)}.")
+    return columns, unit_columns[0]
+
+
+def iter_csv_chunks(text_file, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield ``(header, rows)`` with at most ``chunk_rows`` parsed rows at a time."""
+    reader = csv.reader(text_file)
+    header = next(reader, None)
+    if header is None:
+        return
+    while True:
+        rows = list(islice(reader, chunk_rows))
+        if not rows:
+            return
+        yield header, rows
+
+
+def iter_parquet_chunks(path_or_file, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Same as ``iter_csv_chunks`` for Parquet files (needs pyarrow, which Streamlit ships)."""
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(path_or_file)
+    header = parquet.schema_arrow.names
+    for batch in parquet.iter_batches(batch_size=chunk_rows):
+        columns = [column.to_pylist() for column in batch.columns]
+        yield header, list(zip(*columns))
+
+
+# === Valuation ===
+def encode_chunks(chunks, catalog=None):
+    """Parse chunks from ``iter_*_chunks`` into valuation arrays.
+
+    Yields ``(header, rows, crop_ids, units, modes, masks, valid)``; invalid
+    rows have crop id -1, zero units and no mutations.
+    """
+    valuation = (catalog or get_catalog()).valuation
+
+    # Distinct mutation cells repeat a lot; parse each one once
+    @lru_cache(maxsize=4096)
+    def mask_for_text(cell):
+        return valuation.mutation_mask(MUTATION_SEPARATORS.split(cell.strip()))
+
+    @lru_cache(maxsize=4096)
+    def mask_for_names(names):
+        return valuation.mutation_mask(names)
+
+    def mask_for(cell):
+        # Parquet list columns arrive as lists of names, CSV cells as one string
+        if isinstance(cell, (list, tuple, np.ndarray)):
+            return mask_for_names(tuple(str(name).strip() for name in cell))
+        return mask_for_text(str(cell)) if cell else 0
+
+    @lru_cache(maxsize=64)
+    def mode_for(cell, default):
+        return MODE_ALIASES.get(str(cell).strip().lower(), default) if cell else default
+
+    columns = unit_column = None
+    for header, rows in chunks:
+        if columns is None:
+            columns, unit_column = _columns(header)
+        crop_col, unit_col = columns[CROP_COLUMN], columns[unit_column]
+        mutation_col, mode_col = columns.get(MUTATIONS_COLUMN), columns.get(MODE_COLUMN)
+        default_mode = UNIT_COLUMNS[unit_column]
+
+        crop_ids = np.empty(len(rows), dtype=np.int64)
+        units = np.empty(len(rows))
+        masks = np.zeros(len(rows), dtype=np.int64)
+        modes = np.full(len(rows), default_mode, dtype=np.int64)
+        valid = np.ones(len(rows), dtype=bool)
+        for i, row in enumerate(rows):
+            try:
+                crop_ids[i] = valuation.crop_id(str(row[crop_col]).strip())
+                units[i] = float(row[unit_col])
+                if mutation_col is not None:
+                    masks[i] = mask_for(row[mutation_col])
+                if mode_col is not None:
+                    modes[i] = mode_for(row[mode_col], default_mode)
+            except (IndexError, TypeError, ValueError):
+                valid[i] = False
+
+        if not valid.all():
+            crop_ids[~valid], units[~valid], masks[~valid] = -1, 0.0, 0
+        yield header, rows, crop_ids, units, modes, masks, valid
+
+
+def value_chunks(chunks, catalog=None, summary=None, writer=None):
+    """Value every chunk from ``iter_*_chunks`` and fold it into a ``BulkSummary``.
+
+    If ``writer`` (a ``csv.writer``) is given, each input row is written back
+    with its value appended.
+    """
+    catalog = catalog or get_catalog()
+    summary = summary or BulkSummary(catalog)
+    valuation = catalog.valuation
+
+    for i, (header, rows, crop_ids, units, modes, masks, valid) in enumerate(encode_chunks(chunks, catalog)):
+        if i == 0 and writer is not None:
+            writer.writerow(list(header) + ["value"])
+        summary.invalid_rows += int((~valid).sum())
+        values = valuation.batch_value(crop_ids, units, modes, masks)
+        # Unknown crops are priced at 0 but bucketed separately in the summary
+        crop_ids[crop_ids < 0] = len(catalog.crop_names)
+        summary.add(crop_ids[valid], masks[valid], values[valid])
+
+        if writer is not None:
+            writer.writerows(list(row) + [value] for row, value in zip(rows, values.tolist()))
+    return summary
+
+
+def value_csv(text_file, out_file=None, chunk_rows=DEFAULT_CHUNK_ROWS, catalog=None):
+    """Stream a CSV inventory through the valuation engine; see ``value_chunks``."""
+    writer = csv.writer(out_file) if out_file is not None else None
+    return value_chunks(iter_csv_chunks(text_file, chunk_rows), catalog, writer=writer)
+
+
+def value_parquet(path_or_file, out_file=None, chunk_rows=DEFAULT_CHUNK_ROWS, catalog=None):
+    writer = csv.writer(out_file) if out_file is not None else None
+    return value_chunks(iter_parquet_chunks(path_or_file, chunk_rows), catalog, writer=writer)
@@ -0,0 +1,100 @@
+import json
+import logging
+import os
+import threading
+from functools import cached_property
+
+from growagarden.mutations import MutationResolver
+from growagarden.valuation import ValuationTable
+
+logger = logging.getLogger(__name__)
+
+# Crop and mutation ids are their positions in this file; only ever append,
+# since stored offers refer to them by id.
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "catalog.json")
+
+
+class Catalog:
+    """Immutable snapshot of one catalog file.
+
+    Prices live in the array-backed ``valuation`` tables (which also hold the
+    name -> id index); the dict views are only built when first asked for.
+    """
+
+    def __init__(self, data, mtime_ns=0):
+        self.version = data["version"]
+        self.mtime_ns = mtime_ns
+        # Changes on every reload, even if someone forgets to bump "version"
+        self.revision = f"{self.version}:{mtime_ns}"
+
+        crops = data["crops"]
+        self._crops = crops
+        self.crop_names = tuple(row["name"] for row in crops)
+        self.mutations = MutationResolver(
+            {row["name"]: row["multiplier"] for row in data["mutations"]},
+            {frozenset(rule["combo"]): rule["result"] for rule in data.get("stacking", [])},
+        )
+        self.valuation = ValuationTable(
+            {row["name"]: row["price_per_kg"] for row in crops},
+            {row["name"]: row["base_price"] for row in crops},
+            self.mutations,
+        )
+
+    # === Lazy views ===
+    @cached_property
+    def price_per_kg(self):
+        return {row["name"]: row["price_per_kg"] for row in self._crops}
+
+    @cached_property
+    def base_prices(self):
+        return {row["name"]: row["base_price"] for row in self._crops}
+
+    @cached_property
+    def mutation_multipliers(self):
+        return dict(zip(self.mutations.names, self.mutations.values))
+
+    def crop_id(self, crop):
+        return self.valuation.crop_id(crop)
+
+    def row(self, crop_id):
+        return self._crops[crop_id]
+
+
+def load_catalog(path=DEFAULT_PATH):
+    with open(path, encoding="utf-8") as f:
+        mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+        return Catalog(json.load(f), mtime_ns)
+
+
+# === Shared, hot-reloadable instances (one per path) ===
+_current = {}
+_failed_mtimes = {}
+_reload_lock = threading.Lock()
+
+
+def get_catalog(path=DEFAULT_PATH):
+    """Return the current catalog, reloading it first if the file's mtime changed.
+
+    A reload builds a complete new snapshot before swapping the reference, so
+    callers holding the previous snapshot never see a half-updated one.
+    """
+    catalog = _current.get(path)
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime_ns = None
+    if catalog is not None and mtime_ns in (None, catalog.mtime_ns, _failed_mtimes.get(path)):
+        return catalog
+
+    with _reload_lock:
+        if _current.get(path) is not catalog:
+            return _current[path]
+        try:
+            _current[path] = load_catalog(path)
+        except (OSError, ValueError, KeyError) as e:
+            if catalog is None:
+                raise
+            # e.g. the file is mid-write; keep serving the last good snapshot
+            _failed_mtimes[path] = mtime_ns
+            logger.warning("Keeping catalog %s, reload failed: %s", catalog.revision, e)
+        return _current[path]
@@ -0,0 +1,55 @@
+from growagarden.catalog import get_catalog
+from growagarden.rankings import get_rankings
+from growagarden.trade_optimizer import is_fair
+from growagarden.valuation import CALCULATION_MODES, MODE_PER_ITEM, MODE_PER_KG
+
+
+def calculate_value(crop, units, mutations, mode=MODE_PER_KG, catalog=None):
+    """Value one crop; ``mode`` is a ``MODE_*`` id or its display name."""
+    catalog = catalog or get_catalog()
+    mode = CALCULATION_MODES.get(mode, mode)
+    return catalog.valuation.value(crop, units, mutations, mode)
+
+
+def offer_values(offer, modes=MODE_PER_KG, catalog=None):
+    """Value every ``(crop, units, mutations)`` row of an offer in one batch."""
+    catalog = catalog or get_catalog()
+    if not offer:
+        return []
+    crops, units, mutations = zip(*offer)
+    crop_ids, masks = catalog.valuation.encode(crops, mutations)
+    return catalog.valuation.batch_value(crop_ids, units, modes, masks).tolist()
+
+
+def trade_fairness(value1, value2):
+    if is_fair(value1, value2):
+        return "Fair Trade"
+    elif value1 > value2:
+        return "Your Win"
+    else:
+        return "Your Loss"
+
+
+def top_crops(metric="max_mutated_per_kg", k=20, max_value=None, min_value=None, catalog=None):
+    """``[(crop, value), ...]`` for the ``k`` highest ``metric`` values, best first.
+
+    ``metric`` is a key of ``rankings.METRICS``; ``max_value``/``min_value``
+    restrict the range, e.g. the best price per kg under a budget.
+    """
+    catalog = catalog or get_catalog()
+    index = get_rankings(catalog)
+    return [(catalog.crop_names[i], index.value(metric, i))
+            for i in index.top(metric, k, max_value, min_value)]
+
+
+def best_mutations(crop, k=10, max_mutations=None, units=1, mode=MODE_PER_KG, catalog=None):
+    """``[(mutations, value), ...]`` for the ``k`` mutation combos that maximise ``crop``'s value."""
+    catalog = catalog or get_catalog()
+    crop_id = catalog.crop_id(crop)
+    if crop_id < 0:
+        raise ValueError(f"Unknown crop '{crop}'.")
+    mode = CALCULATION_MODES.get(mode, mode)
+    price = catalog.row(crop_id)["base_price" if mode == MODE_PER_ITEM else "price_per_kg"]
+    units = int(units) if mode == MODE_PER_ITEM else units
+    combos = get_rankings(catalog).combos.top(k, max_mutations)
+    return [(list(catalog.mutations.names_for(mask)), price * units * multiplier) for multiplier, mask in combos]
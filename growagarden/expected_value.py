@@ -0,0 +1,286 @@
+"""Expected value, variance and percentiles of crops under random mutations.
+
+Each mutation occurs independently with its own probability and the weight
+follows a ``WeightDistribution``. A crop's value is ``price * weight *
+multiplier``, where only ``price`` depends on the crop, so the distribution
+of ``weight * multiplier`` is computed once and scaled per crop.
+
+That distribution is computed exactly by enumerating every mutation bitmask
+when there are few enough uncertain mutations, and otherwise by vectorized
+Monte Carlo sampling, optionally split across a process pool.
+"""
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from growagarden.catalog import get_catalog
+from growagarden.mutations import multiplier_array
+from growagarden.valuation import MODE_PER_ITEM, MODE_PER_KG
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+# Enumerate at most 2**EXACT_MAX_BITS masks; more uncertain mutations than this are sampled
+EXACT_MAX_BITS = 20
+CHUNK_DRAWS = 1_000_000
+HISTOGRAM_BINS = 1 << 16
+PILOT_DRAWS = 100_000
+
+
+class WeightDistribution:
+    """Weight (kg) of a harvested crop; use the ``fixed``/``uniform``/``lognormal``/``empirical`` constructors."""
+
+    def __init__(self, kind, *params):
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def fixed(cls, weight):
+        return cls("fixed", float(weight))
+
+    @classmethod
+    def uniform(cls, low, high):
+        return cls("uniform", float(low), float(high))
+
+    @classmethod
+    def lognormal(cls, median, sigma):
+        """``median`` in kg; ``sigma`` is the standard deviation of ``log(weight)``."""
+        return cls("lognormal", float(median), float(sigma))
+
+    @classmethod
+    def empirical(cls, weights):
+        """Resample observed weights, e.g. from an inventory."""
+        return cls("empirical", np.sort(np.asarray(weights, dtype=float)))
+
+    def sample(self, rng, n):
+        if self.kind == "fixed":
+            return np.full(n, self.params[0])
+        if self.kind == "uniform":
+            return rng.uniform(*self.params, n)
+        if self.kind == "lognormal":
+            median, sigma = self.params
+            return rng.lognormal(math.log(median), sigma, n)
+        return rng.choice(self.params[0], n)
+
+    def moments(self):
+        """``(E[W], E[W^2])``."""
+        if self.kind == "fixed":
+            return self.params[0], self.params[0] ** 2
+        if self.kind == "uniform":
+            low, high = self.params
+            return (low + high) / 2, (low * low + low * high + high * high) / 3
+        if self.kind == "lognormal":
+            median, sigma = self.params
+            return median * math.exp(sigma ** 2 / 2), median ** 2 * math.exp(2 * sigma ** 2)
+        weights = self.params[0]
+        return float(weights.mean()), float((weights ** 2).mean())
+
+    def cdf(self, x):
+        x = np.asarray(x, dtype=float)
+        if self.kind == "fixed":
+            return (x >= self.params[0]).astype(float)
+        if self.kind == "uniform":
+            low, high = self.params
+            if high <= low:
+                return (x >= low).astype(float)
+            return np.clip((x - low) / (high - low), 0.0, 1.0)
+        if self.kind == "lognormal":
+            median, sigma = self.params
+            with np.errstate(divide="ignore"):
+                z = (np.log(np.maximum(x, 0.0)) - math.log(median)) / (sigma * math.sqrt(2))
+            return 0.5 * (1 + _erf(z))
+        weights = self.params[0]
+        return np.searchsorted(weights, x, side="right") / len(weights)
+
+    def bounds(self):
+        """Range holding all but ~1e-15 of the probability mass."""
+        if self.kind == "fixed":
+            return self.params[0], self.params[0]
+        if self.kind == "uniform":
+            return self.params
+        if self.kind == "lognormal":
+            median, sigma = self.params
+            return median * math.exp(-8 * sigma), median * math.exp(8 * sigma)
+        return float(self.params[0][0]), float(self.params[0][-1])
+
+
+def _erf(z):
+    # Abramowitz & Stegun 7.1.26 (|error| < 1.5e-7); NumPy has no erf and SciPy isn't a dependency
+    z = np.asarray(z, dtype=float)
+    t = 1 / (1 + 0.3275911 * np.abs(z))
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    return np.sign(z) * (1 - poly * np.exp(-z * z))
+
+
+def _probability_vector(resolver, probabilities):
+    p = np.zeros(len(resolver.names))
+    for name, probability in probabilities.items():
+        if name not in resolver.ids:
+            raise ValueError(f"Unknown mutation '{name}'.")
+        if not 0 <= probability <= 1:
+            raise ValueError(f"Probability of '{name}' must be within [0, 1], got {probability}.")
+        p[resolver.ids[name]] = probability
+    return p
+
+
+def multiplier_distribution(resolver, probabilities):
+    """Exact distribution of the multiplier: ``(values, probabilities)``, values ascending.
+
+    Enumerates the ``2**k`` masks over the ``k`` mutations with a probability
+    strictly between 0 and 1; certain ones are always set.
+    """
+    p = _probability_vector(resolver, probabilities)
+    uncertain = np.flatnonzero((p > 0) & (p < 1))
+    if len(uncertain) > EXACT_MAX_BITS:
+        raise ValueError(f"{len(uncertain)} uncertain mutations is too many to enumerate.")
+    always = int(sum(1 << int(i) for i in np.flatnonzero(p == 1)))
+
+    index = np.arange(1 << len(uncertain), dtype=np.int64)
+    masks = np.full(len(index), always, dtype=np.int64)
+    weights = np.ones(len(index))
+    for j, bit in enumerate(uncertain):
+        present = index >> j & 1 == 1
+        masks |= present.astype(np.int64) << int(bit)
+        weights *= np.where(present, p[bit], 1 - p[bit])
+
+    values, inverse = np.unique(multiplier_array(masks, resolver.values, resolver.rules), return_inverse=True)
+    return values, np.bincount(inverse.ravel(), weights=weights, minlength=len(values))
+
+
+# === Exact ===
+def _exact(resolver, probabilities, weights, percentiles):
+    values, probs = multiplier_distribution(resolver, probabilities)
+    w1, w2 = weights.moments()
+    mean = w1 * float(probs @ values)
+    variance = max(w2 * float(probs @ values ** 2) - mean ** 2, 0.0)
+
+    # Quantiles of the mixture sum_j P_j * F_W(x / m_j), by bisection on x
+    w_low, w_high = weights.bounds()
+    q = np.asarray(percentiles, dtype=float) / 100
+    low = np.full(len(q), w_low * values[0])
+    high = np.full(len(q), w_high * values[-1])
+    for _ in range(100):
+        mid = (low + high) / 2
+        below = weights.cdf(mid[:, None] / values[None, :]) @ probs >= q
+        high = np.where(below, mid, high)
+        low = np.where(below, low, mid)
+    return mean, variance, dict(zip(percentiles, high.tolist()))
+
+
+# === Monte Carlo ===
+def _simulate(values, rules, p, weights, draws, seed, edges, shift):
+    """One worker's share: moment sums and a log-spaced histogram of ``weight * multiplier``."""
+    rng = np.random.default_rng(seed)
+    # Small catalogs get a multiplier per possible mask up front, so draws are one gather
+    table = multiplier_array(np.arange(1 << len(values)), values, rules) if len(values) <= EXACT_MAX_BITS else None
+    log_low, log_step = math.log(edges[0]), math.log(edges[1] / edges[0])
+    n, s1, s2 = 0, 0.0, 0.0
+    counts = np.zeros(len(edges) + 1, dtype=np.int64)
+    while n < draws:
+        size = min(CHUNK_DRAWS, draws - n)
+        masks = np.zeros(size, dtype=np.int64)
+        for i in np.flatnonzero(p > 0):
+            masks |= (rng.random(size) < p[i]).astype(np.int64) << int(i)
+        multipliers = table[masks] if table is not None else multiplier_array(masks, values, rules)
+        x = weights.sample(rng, size) * multipliers
+        centred = x - shift
+        s1 += float(centred.sum())
+        s2 += float(centred @ centred)
+        # Bin b holds edges[b - 1] < x <= edges[b] (as searchsorted would), computed directly
+        with np.errstate(divide="ignore"):
+            bins = np.ceil((np.log(x) - log_low) / log_step).astype(np.int64) + 1
+        counts += np.bincount(np.clip(bins, 0, len(edges)), minlength=len(counts))
+        n += size
+    return n, s1, s2, counts
+
+
+def _monte_carlo(resolver, probabilities, weights, percentiles, draws, workers, seed):
+    p = _probability_vector(resolver, probabilities)
+    seeds = np.random.SeedSequence(seed).spawn(max(workers, 1) + 1)
+
+    # A pilot run fixes the histogram range and the shift that keeps the variance sums stable
+    rng = np.random.default_rng(seeds[0])
+    masks = np.zeros(PILOT_DRAWS, dtype=np.int64)
+    for i in np.flatnonzero(p > 0):
+        masks |= (rng.random(PILOT_DRAWS) < p[i]).astype(np.int64) << int(i)
+    pilot = weights.sample(rng, PILOT_DRAWS) * multiplier_array(masks, resolver.values, resolver.rules)
+    low = max(float(pilot[pilot > 0].min(initial=1.0)) / 10, 1e-12)
+    high = max(float(pilot.max()) * 10, low * 10)
+    edges = np.geomspace(low, high, HISTOGRAM_BINS)
+    shift = float(pilot.mean())
+
+    shares = [draws // len(seeds[1:]) + (i < draws % len(seeds[1:])) for i in range(len(seeds[1:]))]
+    args = [(resolver.values, resolver.rules, p, weights, share, s, edges, shift)
+            for share, s in zip(shares, seeds[1:])]
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            parts = list(pool.map(_simulate, *zip(*args)))
+    else:
+        parts = [_simulate(*a) for a in args]
+
+    n = sum(part[0] for part in parts)
+    s1 = sum(part[1] for part in parts)
+    s2 = sum(part[2] for part in parts)
+    counts = sum(part[3] for part in parts)
+    mean = shift + s1 / n
+    variance = max(s2 / n - (s1 / n) ** 2, 0.0) * n / max(n - 1, 1)
+
+    # Percentiles interpolate geometrically inside the histogram bin
+    cumulative = np.cumsum(counts)
+    bounds = np.concatenate([[low], edges, [high]])
+    result = {}
+    for percentile in percentiles:
+        rank = percentile / 100 * n
+        b = int(np.searchsorted(cumulative, rank))
+        before = cumulative[b - 1] if b else 0
+        fraction = (rank - before) / counts[b] if counts[b] else 0.0
+        result[percentile] = float(bounds[b] * (bounds[b + 1] / bounds[b]) ** fraction)
+    return mean, variance, result
+
+
+# === Public API ===
+def expected_values(probabilities, weights=None, mode=MODE_PER_KG, crops=None, percentiles=DEFAULT_PERCENTILES,
+                    method="auto", draws=1_000_000, workers=1, seed=None, catalog=None):
+    """Expected value, variance and percentiles of each crop's value.
+
+    ``probabilities`` maps mutation names to their chance of occurring
+    (independently); stacking rules such as Wet + Chilled -> Frozen apply to
+    every outcome. ``weights`` is a ``WeightDistribution`` (ignored for
+    ``MODE_PER_ITEM``, which values one item). ``method`` is ``"exact"``,
+    ``"monte_carlo"`` or ``"auto"``, which enumerates whenever ``2**k``
+    masks for the ``k`` uncertain mutations are no more than ``draws``.
+
+    Returns ``{"method", "draws", "crops": [{"crop", "mean", "variance",
+    "std", "percentiles": {p: value}}, ...]}``.
+    """
+    catalog = catalog or get_catalog()
+    resolver = catalog.mutations
+    if mode == MODE_PER_ITEM or weights is None:
+        weights = WeightDistribution.fixed(1.0)
+    prices = catalog.base_prices if mode == MODE_PER_ITEM else catalog.price_per_kg
+    crops = list(crops) if crops is not None else list(catalog.crop_names)
+
+    if method == "auto":
+        p = _probability_vector(resolver, probabilities)
+        uncertain = int(((p > 0) & (p < 1)).sum())
+        method = "exact" if uncertain <= EXACT_MAX_BITS and 1 << uncertain <= draws else "monte_carlo"
+    if method == "exact":
+        mean, variance, quantiles = _exact(resolver, probabilities, weights, percentiles)
+    elif method == "monte_carlo":
+        mean, variance, quantiles = _monte_carlo(resolver, probabilities, weights, percentiles,
+                                                 draws, workers, seed)
+    else:
+        raise ValueError(f"Unknown method '{method}'.")
+
+    rows = []
+    for crop in crops:
+        price = prices.get(crop)
+        if price is None:
+            raise ValueError(f"Unknown crop '{crop}'.")
+        rows.append({
+            "crop": crop,
+            "mean": price * mean,
+            "variance": price * price * variance,
+            "std": price * math.sqrt(variance),
+            "percentiles": {q: price * v for q, v in quantiles.items()},
+        })
+    return {"method": method, "draws": draws if method == "monte_carlo" else None, "crops": rows}
@@ -0,0 +1,239 @@
+import itertools
+import math
+import threading
+import time
+from bisect import bisect_left, insort
+
+import numpy as np
+
+from growagarden.catalog import get_catalog
+from growagarden.trade_optimizer import FAIR_TRADE_TOLERANCE, fairness_band, is_fair
+from growagarden.valuation import MODE_PER_KG
+
+# Sorted runs are split once they reach twice this many keys
+CHUNK_LOAD = 512
+
+
+class SortedKeys:
+    """Sorted ``(value, offer id)`` keys kept in chunks of at most ``2 * CHUNK_LOAD``.
+
+    Finding a position is two binary searches (chunk maxima, then the chunk),
+    and inserting or removing shifts one chunk instead of the whole list, so
+    both stay cheap at hundreds of thousands of keys.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._maxes = []
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def add(self, key):
+        self._len += 1
+        if not self._chunks:
+            self._chunks.append([key])
+            self._maxes.append(key)
+            return
+        c = min(bisect_left(self._maxes, key), len(self._maxes) - 1)
+        chunk = self._chunks[c]
+        insort(chunk, key)
+        self._maxes[c] = chunk[-1]
+        if len(chunk) >= 2 * CHUNK_LOAD:
+            self._chunks[c:c + 1] = [chunk[:CHUNK_LOAD], chunk[CHUNK_LOAD:]]
+            self._maxes[c:c + 1] = [chunk[CHUNK_LOAD - 1], chunk[-1]]
+
+    def remove(self, key):
+        c = bisect_left(self._maxes, key)
+        chunk = self._chunks[c]
+        del chunk[bisect_left(chunk, key)]
+        self._len -= 1
+        if chunk:
+            self._maxes[c] = chunk[-1]
+        else:
+            del self._chunks[c]
+            del self._maxes[c]
+
+    def _upward(self, c, i, stop):
+        for chunk in itertools.islice(self._chunks, c, None):
+            for key in itertools.islice(chunk, i, None):
+                if key[0] >= stop:
+                    return
+                yield key
+            i = 0
+
+    def _downward(self, c, i, stop):
+        while c >= 0:
+            chunk = self._chunks[c]
+            for j in range(i, -1, -1):  # i is -1 when starting just before this chunk
+                if chunk[j][0] <= stop:
+                    return
+                yield chunk[j]
+            c -= 1
+            i = len(self._chunks[c]) - 1 if c >= 0 else 0
+
+    def nearest(self, center, low, high):
+        """Keys with ``low < value < high``, closest to ``center`` first."""
+        if not self._chunks:
+            return
+        c = bisect_left(self._maxes, (center, -1))
+        if c == len(self._chunks):
+            c, i = c - 1, len(self._chunks[-1])
+        else:
+            i = bisect_left(self._chunks[c], (center, -1))
+        up = self._upward(c, i, high)
+        down = self._downward(c, i - 1, low)
+        above, below = next(up, None), next(down, None)
+        while above is not None or below is not None:
+            if below is None or (above is not None and above[0] - center <= center - below[0]):
+                yield above
+                above = next(up, None)
+            else:
+                yield below
+                below = next(down, None)
+
+
+class OpenOffer:
+    __slots__ = ("offer_id", "user", "items", "value", "want_min", "want_max", "crops", "trade_code",
+                 "posted_at")
+
+    def __init__(self, offer_id, user, items, value, want_min, want_max, trade_code, posted_at):
+        self.offer_id = offer_id
+        self.user = user
+        self.items = items
+        self.value = value
+        self.want_min = want_min
+        self.want_max = want_max
+        self.crops = frozenset(crop for crop, _, _ in items)
+        self.trade_code = trade_code
+        self.posted_at = posted_at
+
+    def wants(self, value):
+        return self.want_min <= value <= self.want_max
+
+
+class OrderBook:
+    """In-memory board of open offers, matched by value within the fairness band.
+
+    Each offer is a list of "have" rows plus the range of values its poster
+    will accept in return. Offers are indexed by their value in one book for
+    everyone and one per crop they include, so ``matches`` finds the fair
+    counterparties (their value is a fair trade against ours, and ours falls
+    in their wanted range) with a binary search and a walk outward from our
+    value. Posting and cancelling touch one short sorted run per index.
+    """
+
+    def __init__(self, valuation=None, revision=None, tolerance=FAIR_TRADE_TOLERANCE):
+        if valuation is None:
+            catalog = get_catalog()
+            valuation, revision = catalog.valuation, catalog.revision
+        self.valuation = valuation
+        self.revision = revision
+        self.tolerance = tolerance
+        self.offers = {}        # offer id -> OpenOffer, oldest first
+        self.by_value = SortedKeys()
+        self.by_crop = {}       # crop -> SortedKeys of the offers that include it
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.offers)
+
+    def _values(self, offers):
+        """Total value of each ``[(crop, units, mutations), ...]`` offer, priced in one batch."""
+        rows = [row for items in offers for row in items]
+        crops, units, mutations = zip(*rows)
+        crop_ids, masks = self.valuation.encode(crops, mutations)
+        values = self.valuation.batch_value(crop_ids, units, MODE_PER_KG, masks)
+        starts = np.cumsum([0] + [len(items) for items in offers[:-1]])
+        return np.add.reduceat(values, starts).tolist()
+
+    def _index(self, offer):
+        key = (offer.value, offer.offer_id)
+        self.by_value.add(key)
+        for crop in offer.crops:
+            self.by_crop.setdefault(crop, SortedKeys()).add(key)
+
+    def _unindex(self, offer):
+        key = (offer.value, offer.offer_id)
+        self.by_value.remove(key)
+        for crop in offer.crops:
+            self.by_crop[crop].remove(key)
+
+    # === Posting ===
+    def post(self, user, items, want_min=0.0, want_max=float("inf"), trade_code=None, value=None):
+        """Open an offer of ``[(crop, units, mutations), ...]``; returns its id.
+
+        ``value`` may be passed when the rows were already valued.
+        """
+        items = [(crop, float(units), list(mutations)) for crop, units, mutations in items]
+        if not items:
+            raise ValueError("An offer needs at least one item.")
+        value = self._values([items])[0] if value is None else float(value)
+        with self._lock:
+            offer = OpenOffer(next(self._ids), user, items, value, want_min, want_max, trade_code, time.time())
+            self.offers[offer.offer_id] = offer
+            self._index(offer)
+        return offer.offer_id
+
+    def cancel(self, offer_id):
+        """Close an offer; returns False if it was not open."""
+        with self._lock:
+            offer = self.offers.pop(offer_id, None)
+            if offer is None:
+                return False
+            self._unindex(offer)
+            return True
+
+    def expire(self, older_than):
+        """Cancel every offer posted before ``older_than``; returns how many."""
+        with self._lock:
+            expired = list(itertools.takewhile(lambda o: o.posted_at < older_than, self.offers.values()))
+            for offer in expired:
+                del self.offers[offer.offer_id]
+                self._unindex(offer)
+        return len(expired)
+
+    def reprice(self, valuation, revision=None):
+        """Revalue every offer at new prices (e.g. after a catalog reload) and rebuild the indexes."""
+        with self._lock:
+            self.valuation = valuation
+            self.revision = revision
+            self.by_value = SortedKeys()
+            self.by_crop = {}
+            offers = list(self.offers.values())
+            for offer, value in zip(offers, self._values([o.items for o in offers]) if offers else ()):
+                offer.value = value
+                self._index(offer)
+
+    # === Matching ===
+    def match_value(self, value, k=10, want_min=0.0, want_max=float("inf"), crop=None, exclude_user=None,
+                    max_scan=10000):
+        """Up to ``k`` open offers that are a fair trade against ``value``, closest first.
+
+        Only offers worth between ``want_min`` and ``want_max``, that accept
+        ``value`` in return and (if given) include ``crop`` are returned. At
+        most ``max_scan`` offers inside the band are looked at.
+        """
+        low, high = fairness_band(value, self.tolerance)
+        # The band is open but the wanted range is closed
+        low = max(low, math.nextafter(want_min, -math.inf))
+        high = min(high, math.nextafter(want_max, math.inf))
+        found = []
+        with self._lock:
+            book = self.by_value if crop is None else self.by_crop.get(crop)
+            if book is None or low >= high:
+                return found
+            for other_value, offer_id in itertools.islice(book.nearest(value, low, high), max_scan):
+                offer = self.offers[offer_id]
+                if offer.user != exclude_user and offer.wants(value) and is_fair(value, other_value, self.tolerance):
+                    found.append(offer)
+                    if len(found) == k:
+                        break
+        return found
+
+    def matches(self, offer_id, k=10, crop=None):
+        """Counterparties for an open offer, using its own value and wanted range."""
+        offer = self.offers[offer_id]
+        return self.match_value(offer.value, k, offer.want_min, offer.want_max, crop, exclude_user=offer.user)
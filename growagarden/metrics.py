@@ -0,0 +1,227 @@
+"""Lightweight, opt-in timing and counters for the hot paths.
+
+Disabled by default; while disabled ``timed`` and ``timer`` cost a single
+flag check. Turn on with ``enable()`` or ``GROWAGARDEN_METRICS=1``.
+"""
+import bisect
+import functools
+import json
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the latency buckets: 10 us doubling up to ~10 s
+BUCKETS = tuple(0.00001 * 2 ** i for i in range(21))
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the ``q`` quantile (inf if past the last one)."""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(q * self.count)
+        seen = 0
+        for bound, n in zip(BUCKETS + (math.inf,), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return math.inf
+
+
+class Registry:
+    def __init__(self):
+        self.enabled = os.environ.get("GROWAGARDEN_METRICS") == "1"
+        self._lock = threading.Lock()
+        self._timers = {}
+        self._counters = {}
+        self._gauges = {}
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self._timers.get(name)
+            if histogram is None:
+                histogram = self._timers[name] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        if self.enabled:
+            with self._lock:
+                self._gauges[name] = value
+
+    def reset(self):
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    def snapshot(self):
+        """Plain-data copy: ``{"timers": {name: {...}}, "counters": {name: n}, "gauges": {name: value}}``."""
+        with self._lock:
+            timers = {
+                name: {
+                    "count": h.count,
+                    "total_seconds": h.total,
+                    "mean_seconds": h.total / h.count if h.count else 0.0,
+                    "p50_seconds": h.quantile(0.5),
+                    "p99_seconds": h.quantile(0.99),
+                    "buckets": dict(zip([*map(str, BUCKETS), "+Inf"], h.counts)),
+                }
+                for name, h in self._timers.items()
+            }
+            return {"enabled": self.enabled, "timers": timers, "counters": dict(self._counters),
+                    "gauges": dict(self._gauges)}
+
+
+registry = Registry()
+
+
+def enable(on=True):
+    registry.enabled = on
+
+
+def is_enabled():
+    return registry.enabled
+
+
+def count(name, n=1):
+    registry.count(name, n)
+
+
+def gauge(name, value):
+    """Record the current ``value`` of ``name`` (last write wins)."""
+    registry.gauge(name, value)
+
+
+class _Timer:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registry.observe(self.name, time.perf_counter() - self.started)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name):
+    """``with timer("stage"):`` records the block's duration when metrics are on."""
+    return _Timer(name) if registry.enabled else _NULL_TIMER
+
+
+def timed(name):
+    """Decorator form of ``timer``; the histogram count doubles as the call count."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                registry.observe(name, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+
+# === Export ===
+def _metric_name(name):
+    return "growagarden_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+def to_prometheus(snapshot=None):
+    """Prometheus text exposition format."""
+    snapshot = snapshot or registry.snapshot()
+    lines = []
+    for name, t in sorted(snapshot["timers"].items()):
+        metric = _metric_name(name) + "_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, n in t["buckets"].items():
+            cumulative += n
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"{metric}_sum {t['total_seconds']}")
+        lines.append(f"{metric}_count {t['count']}")
+    for name, value in sorted(snapshot["counters"].items()):
+        metric = _metric_name(name) + "_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    for name, value in sorted(snapshot.get("gauges", {}).items()):
+        metric = _metric_name(name)
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def jsonable(snapshot=None):
+    """The snapshot with non-finite quantiles (past the last bucket) as None, since JSON has no Infinity."""
+    snapshot = snapshot or registry.snapshot()
+    timers = {
+        name: {key: None if isinstance(value, float) and not math.isfinite(value) else value
+               for key, value in t.items()}
+        for name, t in snapshot["timers"].items()
+    }
+    return {**snapshot, "timers": timers}
+
+
+def to_json(snapshot=None):
+    return json.dumps(jsonable(snapshot), allow_nan=False)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = to_prometheus().encode(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = to_json().encode(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, host="127.0.0.1"):
+    """Serve ``/metrics`` and ``/metrics.json`` from a daemon thread; returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
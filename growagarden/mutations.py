@@ -0,0 +1,73 @@
+import math
+from functools import lru_cache
+
+import numpy as np
+
+# Mutations that can stack to form another mutation
+STACKABLE_MUTATIONS = {
+    frozenset(["Wet", "Chilled"]): "Frozen",
+}
+
+
+class MutationResolver:
+    """Canonicalises mutation sets into bitmasks and prices them.
+
+    Bit ``i`` of a mask is the ``i``-th mutation in ``multipliers``. Stacking
+    rules are applied in order, so ``Wet | Chilled`` resolves to ``Frozen``,
+    and the resulting multiplier is memoized per mask in a bounded LRU.
+    """
+
+    def __init__(self, multipliers, stacking_rules=STACKABLE_MUTATIONS, cache_size=4096):
+        self.names = list(multipliers)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.values = [multipliers[name] for name in self.names]
+
+        # (mask of the combo, bit of the result or 0 if it is not a known mutation)
+        self.rules = []
+        for combo, result in stacking_rules.items():
+            if all(m in self.ids for m in combo):
+                result_bit = 1 << self.ids[result] if result in self.ids else 0
+                self.rules.append((self.mask(combo), result_bit))
+
+        self.multiplier = lru_cache(maxsize=cache_size)(self._multiplier)
+        self.names_for = lru_cache(maxsize=cache_size)(self._names_for)
+
+    def mask(self, mutations):
+        mask = 0
+        for m in mutations:
+            if m in self.ids:
+                mask |= 1 << self.ids[m]
+        return mask
+
+    def _names_for(self, mask):
+        return tuple(name for i, name in enumerate(self.names) if mask >> i & 1)
+
+    def resolve(self, mask):
+        for combo, result_bit in self.rules:
+            if mask & combo == combo:
+                mask = (mask & ~combo) | result_bit
+        return mask
+
+    def _multiplier(self, mask):
+        resolved = self.resolve(mask)
+        return math.prod(v for i, v in enumerate(self.values) if resolved >> i & 1)
+
+
+# === Vectorized ===
+# Plain (masks, values, rules) arguments so they also work in worker processes
+def resolve_array(masks, rules):
+    """``MutationResolver.resolve`` over an array of masks."""
+    masks = np.array(masks, dtype=np.int64)
+    for combo, result_bit in rules:
+        hit = masks & combo == combo
+        masks = np.where(hit, (masks & ~combo) | result_bit, masks)
+    return masks
+
+
+def multiplier_array(masks, values, rules):
+    """``MutationResolver.multiplier`` over an array of masks."""
+    masks = resolve_array(masks, rules)
+    out = np.ones(len(masks))
+    for i, value in enumerate(values):
+        out *= np.where(masks >> i & 1, value, 1.0)
+    return out
@@ -0,0 +1,56 @@
+import ast
+import struct
+
+# === Wire format ===
+# b"GO" magic and a format version (u8), then a header and rows, all little-endian:
+#   v1: row count (u16); per row a crop id (u16), weight (f32) and mutation bitmask (u32)
+#   v2: row count (u32); per row a crop id (u16), weight (f64) and mutation bitmask (u32)
+# New offers are written as v2, so weights round-trip exactly; v1 rows are
+# still read. Crop ids and mutation bits are positions in the valuation
+# tables, so those tables may only ever be appended to.
+MAGIC = b"GO"
+FORMAT_VERSION = 2
+PREFIX = struct.Struct("<2sB")
+HEADERS = {1: struct.Struct("<2sBH"), 2: struct.Struct("<2sBI")}
+ROWS = {1: struct.Struct("<HfI"), 2: struct.Struct("<HdI")}
+HEADER = HEADERS[FORMAT_VERSION]
+ROW = ROWS[FORMAT_VERSION]
+MAX_ROWS = 0xFFFFFFFF
+
+
+def encode_offer(offer, valuation):
+    """Pack ``[(crop, weight, mutations), ...]`` into the compact binary form."""
+    rows = []
+    for crop, weight, mutations in offer:
+        crop_id = valuation.crop_id(crop)
+        if crop_id < 0:
+            raise ValueError(f"Unknown crop '{crop}' cannot be encoded.")
+        rows.append(ROW.pack(crop_id, weight, valuation.mutation_mask(mutations)))
+    if len(rows) > MAX_ROWS:
+        raise ValueError(f"An offer can hold at most {MAX_ROWS:,} rows, not {len(rows):,}.")
+    return HEADER.pack(MAGIC, FORMAT_VERSION, len(rows)) + b"".join(rows)
+
+
+def decode_offer(data, valuation):
+    """Inverse of ``encode_offer``; legacy ``str(offer)`` text rows are parsed safely."""
+    if isinstance(data, str):
+        return [(crop, weight, list(mutations)) for crop, weight, mutations in ast.literal_eval(data)]
+
+    magic, version = PREFIX.unpack_from(data)
+    if magic != MAGIC or version not in HEADERS:
+        raise ValueError(f"Unsupported offer encoding (magic={magic!r}, version={version}).")
+    header, row = HEADERS[version], ROWS[version]
+    count = header.unpack_from(data)[2]
+
+    names = valuation.crop_names
+    mutations = valuation.mutations
+    rows = row.iter_unpack(data[header.size:header.size + count * row.size])
+    if version == 1:
+        # float32 -> shortest decimal that round-trips, so 0.1 stays 0.1
+        return [(names[crop_id], float(f"{weight:.7g}"), list(mutations.names_for(mask)))
+                for crop_id, weight, mask in rows]
+    return [(names[crop_id], weight, list(mutations.names_for(mask))) for crop_id, weight, mask in rows]
+
+
+def migrate_text_offer(text, valuation):
+    return encode_offer(decode_offer(text, valuation), valuation)
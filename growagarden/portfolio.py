@@ -0,0 +1,231 @@
+"""Inventory portfolio for the desktop app: thousands of rows, valued off the UI thread.
+
+Rows are NumPy columns rather than objects, so 50k rows are a handful of
+arrays and a view formats only the rows on screen. Every edit gives the
+edited rows a new version. ``PortfolioWorker`` parses CSV files and values
+rows in the background; its results are applied by ``drain`` on the
+caller's (UI) thread, and only to rows whose version still matches, so a
+chunk valued before an edit never overwrites the newer value.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from growagarden.bulk import encode_chunks, iter_csv_chunks
+from growagarden.catalog import get_catalog
+from growagarden.mutations import multiplier_array
+from growagarden.valuation import MODE_PER_ITEM
+
+# Rows per parsed CSV chunk and per valuation task; small enough that no
+# single step holds the GIL for long while the UI thread waits
+LOAD_CHUNK_ROWS = 5000
+VALUE_CHUNK_ROWS = 5000
+# Seconds of each ``drain`` call spent applying results
+DRAIN_BUDGET = 0.010
+
+MODE_LABELS = {MODE_PER_ITEM: "item"}
+
+
+def _value_rows(price_per_kg, base_prices, values, rules, crop_ids, units, modes, masks):
+    """``ValuationTable.batch_value`` from plain arrays, so it also runs in worker processes."""
+    per_item = modes == MODE_PER_ITEM
+    prices = np.where(per_item, base_prices[crop_ids], price_per_kg[crop_ids])
+    units = np.where(per_item, np.trunc(units), units)
+    return prices * units * multiplier_array(masks, values, rules)
+
+
+class Portfolio:
+    """Inventory rows as columns, with the last computed value of each row.
+
+    ``values`` is NaN until a row is first valued. ``stale`` rows have been
+    edited since their value was computed; ``dirty`` rows have not been
+    handed to a worker yet.
+    """
+
+    def __init__(self, catalog=None):
+        self.catalog = catalog or get_catalog()
+        self._next_version = 1
+        self.clear()
+
+    def clear(self):
+        self.crop_ids = np.empty(0, dtype=np.int64)
+        self.units = np.empty(0)
+        self.modes = np.empty(0, dtype=np.int64)
+        self.masks = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0)
+        self.versions = np.empty(0, dtype=np.int64)
+        self.stale = np.empty(0, dtype=bool)
+        self.dirty = np.empty(0, dtype=bool)
+        self.invalid_rows = 0
+
+    def __len__(self):
+        return len(self.crop_ids)
+
+    # === Edits ===
+    def _new_version(self):
+        # Versions are never reused, even across clear(), so old results never match new rows
+        version = self._next_version
+        self._next_version += 1
+        return version
+
+    def append(self, crop_ids, units, modes, masks):
+        n = len(crop_ids)
+        self.crop_ids = np.concatenate([self.crop_ids, crop_ids])
+        self.units = np.concatenate([self.units, units])
+        self.modes = np.concatenate([self.modes, modes])
+        self.masks = np.concatenate([self.masks, masks])
+        self.values = np.concatenate([self.values, np.full(n, np.nan)])
+        self.versions = np.concatenate([self.versions, np.full(n, self._new_version(), dtype=np.int64)])
+        self.stale = np.concatenate([self.stale, np.ones(n, dtype=bool)])
+        self.dirty = np.concatenate([self.dirty, np.ones(n, dtype=bool)])
+
+    def set_mutation(self, rows, mutation, on):
+        """Add (or remove) ``mutation`` on ``rows``; returns how many rows changed."""
+        bit = 1 << self.catalog.mutations.ids[mutation]
+        masks = self.masks[rows]
+        updated = masks | bit if on else masks & ~bit
+        changed = np.asarray(rows)[updated != masks]
+        self.masks[changed] = updated[updated != masks]
+        self.versions[changed] = self._new_version()
+        self.stale[changed] = True
+        self.dirty[changed] = True
+        return len(changed)
+
+    def apply_values(self, rows, versions, values):
+        """Store values computed for ``rows`` at ``versions``; rows edited since are skipped."""
+        keep = rows < len(self)
+        rows, versions, values = rows[keep], versions[keep], values[keep]
+        current = self.versions[rows] == versions
+        rows = rows[current]
+        self.values[rows] = values[current]
+        self.stale[rows] = False
+        return len(rows)
+
+    # === Queries ===
+    def mutation_counts(self, rows):
+        """How many of ``rows`` carry each mutation, in ``catalog.mutations.names`` order."""
+        masks = self.masks[rows]
+        return [int(np.count_nonzero(masks >> i & 1)) for i in range(len(self.catalog.mutations.names))]
+
+    def total(self, rows=None):
+        """Sum of the values computed so far (of ``rows``, or every row)."""
+        values = self.values if rows is None else self.values[rows]
+        return float(np.nansum(values))
+
+    def row(self, index):
+        """Display strings for one row: crop, units, mode, mutations and value."""
+        crop_id = int(self.crop_ids[index])
+        crop = self.catalog.crop_names[crop_id] if crop_id >= 0 else "(unknown)"
+        mutations = ", ".join(self.catalog.mutations.names_for(int(self.masks[index])))
+        value = "…" if self.stale[index] else f"₵{self.values[index]:,.2f}"
+        return crop, f"{self.units[index]:g}", MODE_LABELS.get(int(self.modes[index]), "kg"), mutations, value
+
+
+class PortfolioWorker:
+    """Loads and values a ``Portfolio`` in the background.
+
+    CSV files are parsed on a loader thread; valuation tasks of
+    ``VALUE_CHUNK_ROWS`` rows go to ``executor`` (a one-thread pool by
+    default: the work is vectorized NumPy, which releases the GIL, and a
+    process pool would spend most of its time pickling the arrays). Nothing
+    here touches the portfolio from another thread: results wait on a queue
+    until the UI thread calls ``drain``.
+    """
+
+    def __init__(self, portfolio, executor=None):
+        self.portfolio = portfolio
+        self.executor = executor or ThreadPoolExecutor(1, thread_name_prefix="portfolio-valuation")
+        self.error = None
+        self._results = queue.SimpleQueue()
+        self._tasks = 0          # valuation tasks not drained yet
+        self._load_id = 0
+        self._loading = False
+
+    @property
+    def busy(self):
+        return self._loading or self._tasks > 0 or not self._results.empty()
+
+    def shutdown(self):
+        self._load_id += 1
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    # === Loading ===
+    def load_csv(self, path, replace=True):
+        """Start reading an inventory CSV (see ``growagarden.bulk``); rows show up as ``drain`` applies them."""
+        self._load_id += 1
+        if replace:
+            self.portfolio.clear()
+        self._loading = True
+        threading.Thread(target=self._load, args=(path, self._load_id), name="portfolio-loader", daemon=True).start()
+
+    def _load(self, path, load_id):
+        try:
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                for _, _, crop_ids, units, modes, masks, valid in encode_chunks(
+                        iter_csv_chunks(f, LOAD_CHUNK_ROWS), self.portfolio.catalog):
+                    if load_id != self._load_id:
+                        return
+                    self._results.put(("rows", load_id, (crop_ids[valid], units[valid], modes[valid],
+                                                         masks[valid], int((~valid).sum()))))
+        except (OSError, UnicodeDecodeError, ValueError) as e:
+            self._results.put(("error", load_id, e))
+        self._results.put(("loaded", load_id, None))
+
+    # === Valuation ===
+    def revalue(self):
+        """Send every dirty row to the executor; returns the number of rows sent."""
+        portfolio = self.portfolio
+        rows = np.flatnonzero(portfolio.dirty)
+        if not len(rows):
+            return 0
+        portfolio.dirty[rows] = False
+        valuation = portfolio.catalog.valuation
+        tables = (valuation.price_per_kg, valuation.base_prices, valuation.mutations.values, valuation.mutations.rules)
+        for start in range(0, len(rows), VALUE_CHUNK_ROWS):
+            chunk = rows[start:start + VALUE_CHUNK_ROWS]
+            # Fancy indexing copies, so the worker never sees later edits
+            future = self.executor.submit(_value_rows, *tables, portfolio.crop_ids[chunk], portfolio.units[chunk],
+                                          portfolio.modes[chunk], portfolio.masks[chunk])
+            future.add_done_callback(
+                lambda f, chunk=chunk, versions=portfolio.versions[chunk]: self._results.put(("values", chunk, (versions, f))))
+            self._tasks += 1
+        return len(rows)
+
+    def drain(self, budget=DRAIN_BUDGET):
+        """Apply finished work for at most ``budget`` seconds; call from the UI thread.
+
+        Returns True if the portfolio changed.
+        """
+        deadline = time.perf_counter() + budget
+        changed = False
+        while time.perf_counter() < deadline:
+            try:
+                kind, key, payload = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "values":
+                self._tasks -= 1
+                versions, future = payload
+                if future.cancelled():
+                    continue
+                if future.exception() is not None:
+                    self.error = future.exception()
+                    continue
+                changed |= self.portfolio.apply_values(key, versions, future.result()) > 0
+            elif key != self._load_id:
+                continue
+            elif kind == "rows":
+                *columns, invalid = payload
+                self.portfolio.append(*columns)
+                self.portfolio.invalid_rows += invalid
+                # New rows are valued straight away, not debounced like edits
+                self.revalue()
+                changed = True
+            elif kind == "error":
+                self.error = payload
+            elif kind == "loaded":
+                self._loading = False
+        return changed
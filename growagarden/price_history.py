@@ -0,0 +1,449 @@
+"""Append-only price history per crop, stored in day-sized columnar chunks.
+
+    python -m growagarden.price_history record --every 60   # sample the catalog each minute
+    python -m growagarden.price_history import prices.csv   # crop,ts,price_per_kg,base_price
+
+Each (crop, UTC day) is one row of ``price_chunks`` holding NumPy column
+blobs, clustered on ``(crop_id, chunk_start)``, so a point-in-time lookup is
+one B-tree seek plus a binary search inside the chunk. Hourly and daily
+rollups are recomputed from a chunk whenever it changes, which keeps range
+aggregates and long chart windows to a handful of rows. Minute-level data
+for 60 crops is about 0.8 GB per year, none of it held in memory.
+"""
+import argparse
+import csv
+import logging
+import math
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from growagarden.catalog import get_catalog
+from growagarden.valuation import ValuationTable
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SECONDS = 24 * 60 * 60
+HOUR = 60 * 60
+DAY = 24 * HOUR
+# Coarsest first; aggregates use the coarsest buckets that fit and finer ones at the edges
+ROLLUP_RESOLUTIONS = (DAY, HOUR)
+
+# CSV imports hold at most IMPORT_BUFFER_ROWS rows, and write finished
+# chunks in batches of about IMPORT_WRITE_ROWS rows
+IMPORT_BUFFER_ROWS = 200_000
+IMPORT_WRITE_ROWS = 50_000
+
+OFFSET_DTYPE = np.dtype("<i4")
+PRICE_DTYPE = np.dtype("<f8")
+
+# === Statements ===
+CREATE_CHUNKS = """
+CREATE TABLE IF NOT EXISTS price_chunks (
+    crop_id INTEGER NOT NULL,
+    chunk_start INTEGER NOT NULL,
+    first_ts INTEGER NOT NULL,
+    last_ts INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    offsets BLOB NOT NULL,
+    price_per_kg BLOB NOT NULL,
+    base_price BLOB NOT NULL,
+    PRIMARY KEY (crop_id, chunk_start)
+) WITHOUT ROWID
+"""
+CREATE_ROLLUPS = """
+CREATE TABLE IF NOT EXISTS price_rollups (
+    crop_id INTEGER NOT NULL,
+    resolution INTEGER NOT NULL,
+    bucket_start INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    kg_sum REAL NOT NULL,
+    kg_min REAL NOT NULL,
+    kg_max REAL NOT NULL,
+    base_sum REAL NOT NULL,
+    base_min REAL NOT NULL,
+    base_max REAL NOT NULL,
+    PRIMARY KEY (crop_id, resolution, bucket_start)
+) WITHOUT ROWID
+"""
+SELECT_CHUNK = ("SELECT offsets, price_per_kg, base_price FROM price_chunks "
+                "WHERE crop_id = ? AND chunk_start = ?")
+SELECT_CHUNK_AT = """
+SELECT chunk_start, offsets, price_per_kg, base_price FROM price_chunks
+WHERE crop_id = ? AND chunk_start <= ? AND first_ts <= ?
+ORDER BY chunk_start DESC LIMIT 1
+"""
+SELECT_CHUNKS_IN = """
+SELECT chunk_start, offsets, price_per_kg, base_price FROM price_chunks
+WHERE crop_id = ? AND chunk_start > ? AND chunk_start < ? ORDER BY chunk_start
+"""
+UPSERT_CHUNK = """
+INSERT OR REPLACE INTO price_chunks
+    (crop_id, chunk_start, first_ts, last_ts, samples, offsets, price_per_kg, base_price)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+DELETE_ROLLUPS = ("DELETE FROM price_rollups WHERE crop_id = ? AND resolution = ? "
+                  "AND bucket_start >= ? AND bucket_start < ?")
+INSERT_ROLLUP = "INSERT INTO price_rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+SELECT_ROLLUP_TOTAL = """
+SELECT COUNT(*), SUM(samples), SUM(kg_sum), MIN(kg_min), MAX(kg_max),
+       SUM(base_sum), MIN(base_min), MAX(base_max)
+FROM price_rollups WHERE crop_id = ? AND resolution = ? AND bucket_start >= ? AND bucket_start < ?
+"""
+SELECT_ROLLUPS = """
+SELECT bucket_start, samples, kg_sum, base_sum FROM price_rollups
+WHERE crop_id = ? AND resolution = ? AND bucket_start >= ? AND bucket_start < ? ORDER BY bucket_start
+"""
+
+# (samples, kg_sum, kg_min, kg_max, base_sum, base_min, base_max)
+_EMPTY = (0, 0.0, math.inf, -math.inf, 0.0, math.inf, -math.inf)
+
+
+def _combine(a, b):
+    return (a[0] + b[0], a[1] + b[1], min(a[2], b[2]), max(a[3], b[3]),
+            a[4] + b[4], min(a[5], b[5]), max(a[6], b[6]))
+
+
+class PriceHistory:
+    """Time series of ``(price_per_kg, base_price)`` per crop id.
+
+    Timestamps are integer Unix seconds. A later sample at the same
+    timestamp replaces the earlier one; otherwise history is only appended.
+    Connections are pooled the same way as ``TradeStore``'s.
+    """
+
+    def __init__(self, path, pool_size=4, busy_timeout=5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._slots = threading.BoundedSemaphore(pool_size)
+        with self.connection() as conn:
+            conn.execute(CREATE_CHUNKS)
+            conn.execute(CREATE_ROLLUPS)
+
+    # === Connections ===
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                               check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    # === Writing ===
+    def append(self, crop_id, timestamps, price_per_kg, base_price):
+        """Add samples for one crop; arrays (or scalars) of equal length, any order."""
+        with self._transaction() as conn:
+            self._append(conn, crop_id, timestamps, price_per_kg, base_price)
+
+    def append_many(self, samples):
+        """Add ``[(crop_id, timestamps, price_per_kg, base_price), ...]`` in one transaction.
+
+        Samples for the same crop are merged first, so each day chunk they
+        touch (and its rollups) is rewritten once.
+        """
+        by_crop = {}
+        for crop_id, ts, kg, base in samples:
+            parts = by_crop.setdefault(crop_id, ([], [], []))
+            for part, values in zip(parts, (ts, kg, base)):
+                part.append(np.atleast_1d(values))
+        with self._transaction() as conn:
+            for crop_id, (ts, kg, base) in by_crop.items():
+                self._append(conn, crop_id, np.concatenate(ts), np.concatenate(kg), np.concatenate(base))
+
+    def record(self, prices, ts=None):
+        """Append one sample per crop: ``{crop_id: (price_per_kg, base_price)}``."""
+        ts = int(time.time() if ts is None else ts)
+        with self._transaction() as conn:
+            for crop_id, (kg, base) in prices.items():
+                self._append(conn, crop_id, ts, kg, base)
+
+    def record_catalog(self, catalog=None, ts=None):
+        """Snapshot every crop's current catalog prices."""
+        catalog = catalog or get_catalog()
+        self.record({i: (row["price_per_kg"], row["base_price"])
+                     for i, row in enumerate(map(catalog.row, range(len(catalog.crop_names))))}, ts)
+
+    @contextmanager
+    def _transaction(self):
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _append(self, conn, crop_id, timestamps, price_per_kg, base_price):
+        ts = np.atleast_1d(np.asarray(timestamps, dtype=np.int64))
+        if not len(ts):
+            return
+        kg = np.broadcast_to(np.asarray(price_per_kg, dtype=PRICE_DTYPE), ts.shape)
+        base = np.broadcast_to(np.asarray(base_price, dtype=PRICE_DTYPE), ts.shape)
+        order = np.argsort(ts, kind="stable")
+        ts, kg, base = ts[order], kg[order], base[order]
+        chunk_ids = ts // CHUNK_SECONDS
+        for part in np.split(np.arange(len(ts)), np.flatnonzero(np.diff(chunk_ids)) + 1):
+            self._merge_chunk(conn, crop_id, int(chunk_ids[part[0]]) * CHUNK_SECONDS,
+                              ts[part], kg[part], base[part])
+
+    def _merge_chunk(self, conn, crop_id, chunk_start, ts, kg, base):
+        offsets = (ts - chunk_start).astype(OFFSET_DTYPE)
+        row = conn.execute(SELECT_CHUNK, (crop_id, chunk_start)).fetchone()
+        if row is not None:
+            offsets = np.concatenate([np.frombuffer(row[0], OFFSET_DTYPE), offsets])
+            kg = np.concatenate([np.frombuffer(row[1], PRICE_DTYPE), kg])
+            base = np.concatenate([np.frombuffer(row[2], PRICE_DTYPE), base])
+            # Sort by time and keep the last sample written for each timestamp
+            order = np.argsort(offsets, kind="stable")
+            offsets, kg, base = offsets[order], kg[order], base[order]
+            keep = np.append(offsets[1:] != offsets[:-1], True)
+            offsets, kg, base = offsets[keep], kg[keep], base[keep]
+
+        conn.execute(UPSERT_CHUNK, (crop_id, chunk_start, chunk_start + int(offsets[0]),
+                                    chunk_start + int(offsets[-1]), len(offsets),
+                                    offsets.tobytes(), kg.tobytes(), base.tobytes()))
+        # The chunk holds the whole day, so its rollups are rebuilt from it exactly
+        for resolution in ROLLUP_RESOLUTIONS:
+            conn.execute(DELETE_ROLLUPS, (crop_id, resolution, chunk_start, chunk_start + CHUNK_SECONDS))
+            buckets = offsets // resolution
+            starts = np.flatnonzero(np.append(True, buckets[1:] != buckets[:-1]))
+            counts = np.diff(np.append(starts, len(offsets)))
+            conn.executemany(INSERT_ROLLUP, zip(
+                [crop_id] * len(starts), [resolution] * len(starts),
+                (chunk_start + buckets[starts] * resolution).tolist(), counts.tolist(),
+                np.add.reduceat(kg, starts).tolist(), np.minimum.reduceat(kg, starts).tolist(),
+                np.maximum.reduceat(kg, starts).tolist(), np.add.reduceat(base, starts).tolist(),
+                np.minimum.reduceat(base, starts).tolist(), np.maximum.reduceat(base, starts).tolist()))
+
+    # === Point-in-time ===
+    def price_at(self, crop_id, ts):
+        """``(price_per_kg, base_price)`` in effect at ``ts`` (latest sample <= ts), or None."""
+        with self.connection() as conn:
+            row = conn.execute(SELECT_CHUNK_AT, (crop_id, ts, ts)).fetchone()
+        if row is None:
+            return None
+        chunk_start, offsets, kg, base = row
+        i = np.searchsorted(np.frombuffer(offsets, OFFSET_DTYPE), ts - chunk_start, side="right") - 1
+        return (float(np.frombuffer(kg, PRICE_DTYPE)[i]), float(np.frombuffer(base, PRICE_DTYPE)[i]))
+
+    def valuation_at(self, ts, catalog=None):
+        """A ``ValuationTable`` priced as of ``ts``.
+
+        Crops with no history before ``ts`` keep their current catalog price;
+        mutations always use the current catalog.
+        """
+        catalog = catalog or get_catalog()
+        kg_prices, base_prices = dict(catalog.price_per_kg), dict(catalog.base_prices)
+        for crop_id, crop in enumerate(catalog.crop_names):
+            price = self.price_at(crop_id, ts)
+            if price is not None:
+                kg_prices[crop], base_prices[crop] = price
+        return ValuationTable(kg_prices, base_prices, catalog.mutations)
+
+    # === Ranges ===
+    def _raw(self, conn, crop_id, start, end):
+        """Raw ``(ts, price_per_kg, base_price)`` arrays for ``start <= ts < end``."""
+        rows = conn.execute(SELECT_CHUNKS_IN, (crop_id, start - CHUNK_SECONDS, end)).fetchall()
+        if not rows:
+            empty = np.zeros(0)
+            return empty.astype(np.int64), empty, empty
+        ts = np.concatenate([chunk_start + np.frombuffer(o, OFFSET_DTYPE).astype(np.int64)
+                             for chunk_start, o, _, _ in rows])
+        kg = np.concatenate([np.frombuffer(k, PRICE_DTYPE) for _, _, k, _ in rows])
+        base = np.concatenate([np.frombuffer(b, PRICE_DTYPE) for _, _, _, b in rows])
+        inside = (ts >= start) & (ts < end)
+        return ts[inside], kg[inside], base[inside]
+
+    def _aggregate(self, conn, crop_id, start, end, resolutions):
+        if start >= end:
+            return _EMPTY
+        if not resolutions:
+            _, kg, base = self._raw(conn, crop_id, start, end)
+            if not len(kg):
+                return _EMPTY
+            return (len(kg), float(kg.sum()), float(kg.min()), float(kg.max()),
+                    float(base.sum()), float(base.min()), float(base.max()))
+
+        size, finer = resolutions[0], resolutions[1:]
+        first, last = -(-start // size) * size, end // size * size
+        if first >= last:
+            return self._aggregate(conn, crop_id, start, end, finer)
+        buckets, *middle = conn.execute(SELECT_ROLLUP_TOTAL, (crop_id, size, first, last)).fetchone()
+        middle = tuple(middle) if buckets else _EMPTY
+        return _combine(_combine(self._aggregate(conn, crop_id, start, first, finer), middle),
+                        self._aggregate(conn, crop_id, last, end, finer))
+
+    def aggregate(self, crop_id, start, end):
+        """Sample count, mean, min and max of both prices over ``start <= ts < end``.
+
+        Whole days and hours come from the rollups; only the ragged edges
+        (under an hour each) read raw samples. Returns None without samples.
+        """
+        with self.connection() as conn:
+            n, kg_sum, kg_min, kg_max, base_sum, base_min, base_max = self._aggregate(
+                conn, crop_id, int(start), int(end), ROLLUP_RESOLUTIONS)
+        if not n:
+            return None
+        return {"samples": n,
+                "price_per_kg": {"mean": kg_sum / n, "min": kg_min, "max": kg_max},
+                "base_price": {"mean": base_sum / n, "min": base_min, "max": base_max}}
+
+    def average(self, crop_id, seconds=7 * DAY, now=None):
+        """Mean ``(price_per_kg, base_price)`` over the last ``seconds``, e.g. the 7-day average."""
+        now = int(time.time() if now is None else now)
+        result = self.aggregate(crop_id, now - seconds + 1, now + 1)
+        if result is None:
+            return None
+        return result["price_per_kg"]["mean"], result["base_price"]["mean"]
+
+    def series(self, crop_id, start, end, max_points=2000, rolling=7 * DAY):
+        """Chart data for ``start <= ts < end`` with at most about ``max_points`` points.
+
+        Uses raw samples when they fit, otherwise hourly or daily bucket means,
+        so only the visible window is read. Returns ``{"ts", "price_per_kg",
+        "base_price", "rolling_price_per_kg", "resolution"}``; the rolling
+        column is the trailing ``rolling``-second mean at the chosen resolution.
+        """
+        start, end = int(start), int(end)
+        with self.connection() as conn:
+            # The sample count itself comes from the rollups
+            resolution = 0
+            if self._aggregate(conn, crop_id, start, end, ROLLUP_RESOLUTIONS)[0] > max_points:
+                resolution = next((size for size in reversed(ROLLUP_RESOLUTIONS)
+                                   if (end - start) // size <= max_points), ROLLUP_RESOLUTIONS[0])
+
+            if resolution == 0:
+                ts, kg, base = self._raw(conn, crop_id, start, end)
+                history_ts, history_kg, _ = self._raw(conn, crop_id, start - rolling, end)
+                counts = np.ones(len(history_ts))
+            else:
+                rows = np.array(conn.execute(SELECT_ROLLUPS, (crop_id, resolution, start - rolling, end))
+                                .fetchall(), dtype=float).reshape(-1, 4)
+                history_ts, counts, kg_sums = rows[:, 0].astype(np.int64), rows[:, 1], rows[:, 2]
+                history_kg = kg_sums / np.maximum(counts, 1)
+                visible = history_ts >= start
+                ts, kg = history_ts[visible], history_kg[visible]
+                base = rows[visible, 3] / np.maximum(counts[visible], 1)
+
+        # Trailing mean via prefix sums over [t - rolling, t]
+        sums = np.concatenate([[0.0], np.cumsum(history_kg * counts)])
+        weights = np.concatenate([[0.0], np.cumsum(counts)])
+        hi = np.searchsorted(history_ts, ts, side="right")
+        lo = np.searchsorted(history_ts, ts - rolling, side="right")
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rolling_kg = (sums[hi] - sums[lo]) / (weights[hi] - weights[lo])
+        return {"ts": ts, "price_per_kg": kg, "base_price": base,
+                "rolling_price_per_kg": rolling_kg, "resolution": resolution}
+
+    def span(self, crop_id):
+        """``(first_ts, last_ts)`` recorded for a crop, or None."""
+        with self.connection() as conn:
+            row = conn.execute("SELECT MIN(first_ts), MAX(last_ts) FROM price_chunks WHERE crop_id = ?",
+                               (crop_id,)).fetchone()
+        return None if row[0] is None else row
+
+
+# === Command line ===
+def import_csv(history, text_file, catalog=None, buffer_rows=IMPORT_BUFFER_ROWS):
+    """Append rows of ``crop,ts,price_per_kg,base_price``; returns the number imported.
+
+    Rows are streamed, not loaded whole. Each crop collects the rows of its
+    current day chunk; when its rows move on to another chunk, the finished
+    one is queued, and queued chunks are written together every
+    ``IMPORT_WRITE_ROWS`` rows. Time-ordered input therefore writes each
+    chunk once. Unordered input is bounded too: once ``buffer_rows`` rows
+    are held, everything is written and later rows merge into those chunks.
+    """
+    catalog = catalog or get_catalog()
+    current = {}    # crop_id -> (chunk number, ts, price_per_kg, base_price) still collecting
+    ready = []      # finished (crop_id, ts, price_per_kg, base_price), not written yet
+    ready_rows = held = imported = 0
+
+    def write():
+        nonlocal ready_rows, held
+        if ready:
+            history.append_many(ready)
+        held -= ready_rows
+        ready.clear()
+        ready_rows = 0
+
+    for row in csv.DictReader(text_file):
+        crop_id = catalog.crop_id(row["crop"].strip())
+        if crop_id < 0:
+            continue
+        ts = int(float(row["ts"]))
+        chunk = current.get(crop_id)
+        if chunk is None or chunk[0] != ts // CHUNK_SECONDS:
+            if chunk is not None:
+                ready.append((crop_id, *chunk[1:]))
+                ready_rows += len(chunk[1])
+            chunk = current[crop_id] = (ts // CHUNK_SECONDS, [], [], [])
+        chunk[1].append(ts)
+        chunk[2].append(float(row["price_per_kg"]))
+        chunk[3].append(float(row["base_price"]))
+        held += 1
+        imported += 1
+
+        if held >= buffer_rows:
+            ready.extend((crop_id, *chunk[1:]) for crop_id, chunk in current.items())
+            ready_rows = held
+            current.clear()
+        if ready_rows >= IMPORT_WRITE_ROWS or held >= buffer_rows:
+            write()
+
+    ready.extend((crop_id, *chunk[1:]) for crop_id, chunk in current.items())
+    ready_rows = held
+    write()
+    return imported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grow a Garden price history")
+    parser.add_argument("--db", default="/mount/data/price_history.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="snapshot the current catalog prices")
+    record.add_argument("--every", type=float, help="keep sampling every N seconds")
+    load = commands.add_parser("import", help="append samples from a CSV file")
+    load.add_argument("path")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    history = PriceHistory(args.db)
+    if args.command == "import":
+        with open(args.path, newline="", encoding="utf-8") as f:
+            logger.info("Imported %d samples", import_csv(history, f))
+        return
+    while True:
+        history.record_catalog()
+        if not args.every:
+            return
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
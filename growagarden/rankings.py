@@ -0,0 +1,147 @@
+import heapq
+import threading
+
+import numpy as np
+
+from growagarden.catalog import get_catalog
+from growagarden.mutations import multiplier_array, resolve_array
+
+# Ranked per-crop metrics: id -> display name
+METRICS = {
+    "price_per_kg": "Price per KG",
+    "base_price": "Base Price (per item)",
+    "max_mutated_per_kg": "Max Mutated Value per KG",
+    "max_mutated_per_item": "Max Mutated Value per Item",
+}
+
+# Mutation combos are only indexed up to this many mutations (2**16 masks today)
+MAX_COMBO_BITS = 20
+
+
+class MutationCombos:
+    """Every final mutation combo (a mask that stacking rules leave unchanged), best first.
+
+    Combos are bucketed by how many mutations they have, so "best combo with
+    at most r mutations" merges the heads of r + 1 sorted arrays.
+    """
+
+    def __init__(self, resolver):
+        self.key = (tuple(resolver.names), tuple(resolver.values), tuple(resolver.rules))
+        if len(resolver.names) > MAX_COMBO_BITS:
+            raise ValueError(f"{len(resolver.names)} mutations is too many to index combos.")
+        masks = np.arange(1 << len(resolver.names), dtype=np.int64)
+        masks = masks[resolve_array(masks, resolver.rules) == masks]
+        multipliers = multiplier_array(masks, resolver.values, resolver.rules)
+        sizes = np.array([bin(int(m)).count("1") for m in masks])
+
+        order = np.lexsort((masks, -multipliers))
+        self.max_multiplier = float(multipliers[order[0]])
+        self.best_mask = int(masks[order[0]])
+        self.by_size = []
+        for size in range(len(resolver.names) + 1):
+            ranked = order[sizes[order] == size]
+            self.by_size.append((multipliers[ranked], masks[ranked]))
+
+    def top(self, k, max_mutations=None):
+        """``[(multiplier, mask), ...]`` for the ``k`` best combos of at most ``max_mutations``."""
+        limit = len(self.by_size) - 1 if max_mutations is None else min(max_mutations, len(self.by_size) - 1)
+        heads = [zip((-v for v in values[:k].tolist()), masks[:k].tolist())
+                 for values, masks in self.by_size[:limit + 1]]
+        return [(-negated, mask) for negated, mask in heapq.merge(*heads)][:k]
+
+
+class RankingIndex:
+    """Sorted value arrays per metric for one catalog snapshot.
+
+    ``top`` answers range-limited top-k queries with two binary searches and
+    a k-element slice. ``from_previous`` moves only the crops whose prices
+    changed, and rebuilds the mutation side only if the mutation table did.
+    """
+
+    def __init__(self, revision, values, sorted_ids, combos):
+        self.revision = revision
+        self.values = values            # metric -> per-crop values, indexed by crop id
+        self.sorted_ids = sorted_ids    # metric -> crop ids ascending by value
+        self.sorted_values = {metric: values[metric][ids] for metric, ids in sorted_ids.items()}
+        self.combos = combos
+
+    @staticmethod
+    def _metric_values(catalog, combos):
+        price_per_kg = np.array([catalog.row(i)["price_per_kg"] for i in range(len(catalog.crop_names))],
+                                dtype=float)
+        base = np.array([catalog.row(i)["base_price"] for i in range(len(catalog.crop_names))], dtype=float)
+        return {
+            "price_per_kg": price_per_kg,
+            "base_price": base,
+            "max_mutated_per_kg": price_per_kg * combos.max_multiplier,
+            "max_mutated_per_item": base * combos.max_multiplier,
+        }
+
+    @classmethod
+    def build(cls, catalog):
+        combos = MutationCombos(catalog.mutations)
+        values = cls._metric_values(catalog, combos)
+        sorted_ids = {metric: np.lexsort((np.arange(len(v)), v)) for metric, v in values.items()}
+        return cls(catalog.revision, values, sorted_ids, combos)
+
+    @classmethod
+    def from_previous(cls, previous, catalog):
+        # Crop ids are positions, so only an appended-to catalog can reuse the old order
+        if len(catalog.crop_names) < len(previous.values["price_per_kg"]):
+            return cls.build(catalog)
+        resolver = catalog.mutations
+        combos = previous.combos
+        if combos.key != (tuple(resolver.names), tuple(resolver.values), tuple(resolver.rules)):
+            combos = MutationCombos(resolver)
+        values = cls._metric_values(catalog, combos)
+
+        sorted_ids = {}
+        for metric, new in values.items():
+            old = previous.values[metric]
+            ids = previous.sorted_ids[metric]
+            # Appended crops plus any whose value moved; everything else keeps its place
+            changed = np.flatnonzero(new[:len(old)] != old).tolist() + list(range(len(old), len(new)))
+            if len(changed) > len(new) // 2:
+                sorted_ids[metric] = np.lexsort((np.arange(len(new)), new))
+                continue
+            if changed:
+                ids = ids[~np.isin(ids, changed)]
+                for crop_id in changed:
+                    at = np.searchsorted(new[ids], new[crop_id], side="left")
+                    # Ties are ordered by crop id, like a full rebuild
+                    while at < len(ids) and new[ids[at]] == new[crop_id] and ids[at] < crop_id:
+                        at += 1
+                    ids = np.insert(ids, at, crop_id)
+            sorted_ids[metric] = ids
+        return cls(catalog.revision, values, sorted_ids, combos)
+
+    # === Queries ===
+    def top(self, metric, k=20, max_value=None, min_value=None):
+        """Crop ids of the ``k`` highest ``metric`` values within ``[min_value, max_value]``."""
+        values = self.sorted_values[metric]
+        hi = len(values) if max_value is None else int(np.searchsorted(values, max_value, side="right"))
+        lo = 0 if min_value is None else int(np.searchsorted(values, min_value, side="left"))
+        return self.sorted_ids[metric][max(hi - k, lo):hi][::-1].tolist()
+
+    def value(self, metric, crop_id):
+        return float(self.values[metric][crop_id])
+
+
+# === Shared, incrementally rebuilt instance ===
+_current = None
+_build_lock = threading.Lock()
+
+
+def get_rankings(catalog=None):
+    """The ranking index for ``catalog`` (default: the current one), updated from the last one built."""
+    global _current
+    catalog = catalog or get_catalog()
+    index = _current
+    if index is not None and index.revision == catalog.revision:
+        return index
+    with _build_lock:
+        if _current is None:
+            _current = RankingIndex.build(catalog)
+        elif _current.revision != catalog.revision:
+            _current = RankingIndex.from_previous(_current, catalog)
+        return _current
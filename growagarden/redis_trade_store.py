@@ -0,0 +1,148 @@
+import threading
+import time
+from collections import OrderedDict
+
+from growagarden import metrics
+from growagarden.trade_backends import DEFAULT_TRADE_TTL, TradeBackend
+from growagarden.trade_codes import code_for, new_salt
+
+# Remembered trade expiry times, so writes can give offers the trade's deadline
+EXPIRY_CACHE_SIZE = 10000
+
+
+class RedisFeed:
+    """Change feed read from the shared version hashes, so it sees writes from every replica."""
+
+    def __init__(self, store, poll_interval=0.1):
+        self.store = store
+        self.poll_interval = poll_interval
+
+    def publish(self, trade_code, user, version):
+        # Versions are bumped by the write itself
+        pass
+
+    def counterparty_version(self, trade_code, user):
+        # Everyone's versions sum to the trade's version, so the rest is that minus our own:
+        # two O(1) reads however many users the trade has
+        total, own = self.store.client.pipeline([("GET", self.store._key("version", trade_code)),
+                                                 ("HGET", self.store._key("versions", trade_code), user)])
+        return int(total or 0) - int(own or 0)
+
+    def wait(self, trade_code, user, seen, timeout=None):
+        """Poll until the counterparty version differs from ``seen``."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            version = self.counterparty_version(trade_code, user)
+            if version != seen or (deadline is not None and time.monotonic() >= deadline):
+                return version
+            time.sleep(self.poll_interval)
+
+
+class RedisTradeStore(TradeBackend):
+    """Trade offers in Redis (or ``growagarden.resp_server``), shared by any number of app replicas.
+
+    Per trade: ``{prefix}trade:{code}`` holds its expiry time and expires
+    with it; ``offers:{code}`` and ``versions:{code}`` are hashes keyed by
+    user, and ``version:{code}`` is the sum of those versions. All are given
+    the same deadline, so Redis deletes finished trades itself and no
+    sweeper is needed. Codes come from a shared counter
+    scrambled with a shared salt, like the SQLite store's. Every write is two
+    pipelined round trips, however many offers it carries: one reads the
+    stored offers so that only real changes bump a version.
+    """
+
+    def __init__(self, client, prefix="growagarden:", recent_writes=10000):
+        super().__init__(recent_writes)
+        self.client = client
+        self.prefix = prefix
+        self.feed = RedisFeed(self)
+        self._expiry = OrderedDict()
+        self._expiry_lock = threading.Lock()
+        salt_key = self._key("code_salt")
+        _, salt = client.pipeline([("SET", salt_key, new_salt(), "NX"), ("GET", salt_key)])
+        self._code_salt = int(salt)
+
+    def _key(self, *parts):
+        return self.prefix + ":".join(parts)
+
+    def close(self):
+        self.client.close()
+
+    # === Trade sessions ===
+    def create_trades(self, count=1, ttl=DEFAULT_TRADE_TTL):
+        """Allocate ``count`` new trade codes valid for ``ttl`` seconds."""
+        last = self.client.execute("INCRBY", self._key("trade_seq"), count)
+        expires_at = int(time.time() + ttl)
+        codes = [code_for(i, self._code_salt) for i in range(last - count + 1, last + 1)]
+        self.client.pipeline([("SET", self._key("trade", code), expires_at, "EX", int(ttl), "NX") for code in codes])
+        for code in codes:
+            self._remember_expiry(code, expires_at)
+        return codes
+
+    def trade_exists(self, trade_code):
+        return self.client.execute("EXISTS", self._key("trade", trade_code)) == 1
+
+    def expire_trades(self, now=None):
+        # Redis deletes expired keys on its own
+        return 0
+
+    def _remember_expiry(self, trade_code, expires_at):
+        with self._expiry_lock:
+            self._expiry[trade_code] = expires_at
+            if len(self._expiry) > EXPIRY_CACHE_SIZE:
+                self._expiry.popitem(last=False)
+
+    def _expires_at(self, codes):
+        """Expiry time of each trade code (a default TTL from now for unknown codes)."""
+        with self._expiry_lock:
+            known = {code: self._expiry[code] for code in codes if code in self._expiry}
+        missing = [code for code in codes if code not in known]
+        if missing:
+            replies = self.client.pipeline([("GET", self._key("trade", code)) for code in missing])
+            for code, expires_at in zip(missing, replies):
+                if expires_at is None:
+                    known[code] = int(time.time() + DEFAULT_TRADE_TTL)
+                else:
+                    known[code] = int(expires_at)
+                    self._remember_expiry(code, known[code])
+        return known
+
+    # === Offers ===
+    def _write_offers(self, upserts, touches, now):
+        # Touches only matter to the SQLite sweeper; here keys share the trade's deadline
+        if not upserts:
+            return
+        stored = self.client.pipeline([("HGET", self._key("offers", code), user) for (code, user), _ in upserts])
+        changed = [(key, offer_data) for (key, offer_data), current in zip(upserts, stored)
+                   if current != offer_data]
+        if not changed:
+            return
+        expires_at = self._expires_at(sorted({code for (code, _), _ in changed}))
+        commands = []
+        for (code, user), offer_data in changed:
+            commands.append(("HSET", self._key("offers", code), user, offer_data))
+            commands.append(("HINCRBY", self._key("versions", code), user, 1))
+            commands.append(("INCR", self._key("version", code)))
+        for code, deadline in expires_at.items():
+            for kind in ("offers", "versions", "version"):
+                commands.append(("EXPIREAT", self._key(kind, code), deadline))
+        self.client.pipeline(commands)
+
+    def _touch(self, trade_code, user, now):
+        pass
+
+    def _rows(self, trade_code):
+        offers, versions = self.client.pipeline([("HGETALL", self._key("offers", trade_code)),
+                                                 ("HGETALL", self._key("versions", trade_code))])
+        versions = dict(zip(versions[::2], versions[1::2]))
+        return sorted((user.decode(), offer, int(versions.get(user, 0)))
+                      for user, offer in zip(offers[::2], offers[1::2]))
+
+    def get_other_offer_row(self, trade_code, user):
+        """``(user, raw offer, version)`` of the counterparty, or None; the version moves on every edit."""
+        return next((row for row in self._rows(trade_code) if row[0] != user), None)
+
+    @metrics.timed("store.get_offers")
+    def get_offers(self, trade_code):
+        """Return ``[(user, raw offer, version), ...]`` for everyone in the trade."""
+        return self._rows(trade_code)
@@ -0,0 +1,138 @@
+"""Minimal Redis-protocol (RESP2) client.
+
+Talks to Redis itself or to the bundled ``growagarden.resp_server``. Only
+what the trade backend needs: commands, pipelines and a connection pool.
+"""
+import queue
+import socket
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+DEFAULT_PORT = 6379
+
+
+class RespError(Exception):
+    """An error reply from the server (``-ERR ...``)."""
+
+
+def encode_command(args):
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+def read_reply(stream):
+    """Read one reply from a buffered binary stream; error replies are returned as ``RespError``."""
+    line = stream.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("Connection closed by the server.")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        return RespError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        if len(data) != length + 2:
+            raise ConnectionError("Connection closed by the server.")
+        return data[:-2]
+    if kind == b"*":
+        length = int(rest)
+        return None if length < 0 else [read_reply(stream) for _ in range(length)]
+    raise ConnectionError(f"Unexpected reply {line!r}.")
+
+
+class RespClient:
+    """Thread-safe client with a bounded pool of connections.
+
+    ``pipeline`` writes a whole batch of commands in one send and then reads
+    the replies, so a batch costs one network round trip.
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, db=0, pool_size=8, timeout=5.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        """``redis://host:port/db``"""
+        parts = urlsplit(url)
+        db = int(parts.path.lstrip("/") or 0)
+        return cls(parts.hostname or "127.0.0.1", parts.port or DEFAULT_PORT, db, **kwargs)
+
+    # === Connections ===
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn = (sock, sock.makefile("rb"))
+        if self.db:
+            try:
+                self._roundtrip(conn, [("SELECT", self.db)])
+            except BaseException:
+                sock.close()
+                raise
+        return conn
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = None
+        try:
+            if conn is None:
+                conn = self._connect()
+            yield conn
+        except BaseException:
+            # Whatever failed, the stream may be mid-reply; never hand this connection out again
+            if conn is not None:
+                conn[0].close()
+            conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._pool.put(conn)
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait()[0].close()
+            except queue.Empty:
+                break
+
+    # === Commands ===
+    @staticmethod
+    def _roundtrip(conn, commands):
+        sock, stream = conn
+        sock.sendall(b"".join(encode_command(args) for args in commands))
+        return [read_reply(stream) for _ in commands]
+
+    def pipeline(self, commands, raise_errors=True):
+        """Run ``[(command, *args), ...]`` in one round trip; returns the replies in order."""
+        if not commands:
+            return []
+        with self.connection() as conn:
+            replies = self._roundtrip(conn, commands)
+        if raise_errors:
+            for reply in replies:
+                if isinstance(reply, RespError):
+                    raise reply
+        return replies
+
+    def execute(self, *args):
+        return self.pipeline([args])[0]
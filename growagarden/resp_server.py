@@ -0,0 +1,313 @@
+"""Small in-memory Redis-protocol (RESP2) server for tests and single-host setups.
+
+    python -m growagarden.resp_server --port 6379
+
+Lets several app replicas share trade state without an external service.
+It implements the string, hash and expiry commands the trade backend uses
+(plus PING, DBSIZE, FLUSHALL...). Pipelined commands are answered in order
+with one write per batch. Data lives in memory only: run real Redis when it
+has to survive a restart.
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from growagarden.resp import DEFAULT_PORT
+
+logger = logging.getLogger(__name__)
+
+# Expired keys are deleted on access, and by a sweep this often
+EXPIRE_SWEEP_INTERVAL = 1.0
+
+
+class CommandError(Exception):
+    pass
+
+
+def encode_reply(value):
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bool):
+        return b":%d\r\n" % value
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, str):
+        return b"+%s\r\n" % value.encode()
+    if isinstance(value, CommandError):
+        return b"-%s\r\n" % str(value).encode()
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(encode_reply(v) for v in value)
+    raise TypeError(f"Cannot encode {type(value).__name__} as a reply.")
+
+
+def _int(value):
+    try:
+        return int(value)
+    except ValueError:
+        raise CommandError("ERR value is not an integer or out of range") from None
+
+
+class Keyspace:
+    """Keys holding ``bytes`` (strings) or ``dict`` (hashes), with optional deadlines."""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}   # key -> deadline (time.time())
+
+    # === Helpers ===
+    def _live(self, key):
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.time():
+            self.data.pop(key, None)
+            del self.expires[key]
+        return self.data.get(key)
+
+    def _typed(self, key, kind):
+        value = self._live(key)
+        if value is not None and not isinstance(value, kind):
+            raise CommandError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _hash(self, key, create=False):
+        value = self._typed(key, dict)
+        if value is None and create:
+            value = self.data[key] = {}
+        return value
+
+    def sweep(self):
+        now = time.time()
+        for key in [key for key, deadline in self.expires.items() if deadline <= now]:
+            self.data.pop(key, None)
+            del self.expires[key]
+
+    # === Commands ===
+    def execute(self, name, args):
+        """Run one command; every malformed request becomes a ``CommandError`` (an ``-ERR`` reply)."""
+        try:
+            name = name.decode() if isinstance(name, bytes) else name
+        except UnicodeDecodeError:
+            raise CommandError("ERR unknown command") from None
+        handler = getattr(self, f"cmd_{name.lower()}", None)
+        if handler is None:
+            raise CommandError(f"ERR unknown command '{name}'")
+        try:
+            return handler(*args)
+        except TypeError:
+            raise CommandError(f"ERR wrong number of arguments for '{name.lower()}' command") from None
+        except (IndexError, ValueError, UnicodeDecodeError) as e:
+            raise CommandError(f"ERR {e}") from None
+
+    def cmd_ping(self, message=None):
+        return "PONG" if message is None else message
+
+    def cmd_select(self, db):
+        if _int(db) != 0:
+            raise CommandError("ERR only database 0 is supported")
+        return "OK"
+
+    def cmd_dbsize(self):
+        self.sweep()
+        return len(self.data)
+
+    def cmd_flushall(self, *args):
+        self.data.clear()
+        self.expires.clear()
+        return "OK"
+
+    cmd_flushdb = cmd_flushall
+
+    def cmd_get(self, key):
+        return self._typed(key, bytes)
+
+    def cmd_set(self, key, value, *options):
+        deadline = condition = None
+        i = 0
+        while i < len(options):
+            option = options[i].upper()
+            if option in (b"EX", b"PX") and i + 1 < len(options):
+                deadline = time.time() + _int(options[i + 1]) * (1.0 if option == b"EX" else 0.001)
+                i += 2
+            elif option in (b"NX", b"XX"):
+                condition = option
+                i += 1
+            else:
+                raise CommandError("ERR syntax error")
+        exists = self._live(key) is not None
+        if (condition == b"NX" and exists) or (condition == b"XX" and not exists):
+            return None
+        self.data[key] = value
+        if deadline is None:
+            self.expires.pop(key, None)
+        else:
+            self.expires[key] = deadline
+        return "OK"
+
+    def cmd_incrby(self, key, amount):
+        value = _int(self._typed(key, bytes) or b"0") + _int(amount)
+        self.data[key] = str(value).encode()
+        return value
+
+    def cmd_incr(self, key):
+        return self.cmd_incrby(key, b"1")
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._live(key) is not None:
+                del self.data[key]
+                self.expires.pop(key, None)
+                removed += 1
+        return removed
+
+    def cmd_exists(self, *keys):
+        return sum(self._live(key) is not None for key in keys)
+
+    def cmd_expireat(self, key, when):
+        if self._live(key) is None:
+            return 0
+        self.expires[key] = float(_int(when))
+        return 1
+
+    def cmd_expire(self, key, seconds):
+        return self.cmd_expireat(key, str(int(time.time()) + _int(seconds)).encode())
+
+    def cmd_ttl(self, key):
+        if self._live(key) is None:
+            return -2
+        deadline = self.expires.get(key)
+        return -1 if deadline is None else max(int(deadline - time.time() + 0.5), 0)
+
+    def cmd_hset(self, key, *pairs):
+        if not pairs or len(pairs) % 2:
+            raise TypeError
+        fields = self._hash(key, create=True)
+        added = 0
+        for field, value in zip(pairs[::2], pairs[1::2]):
+            added += field not in fields
+            fields[field] = value
+        return added
+
+    def cmd_hget(self, key, field):
+        return (self._hash(key) or {}).get(field)
+
+    def cmd_hgetall(self, key):
+        return [part for item in (self._hash(key) or {}).items() for part in item]
+
+    def cmd_hdel(self, key, *fields):
+        hashed = self._hash(key) or {}
+        removed = sum(hashed.pop(field, None) is not None for field in fields)
+        if key in self.data and not hashed:
+            del self.data[key]
+            self.expires.pop(key, None)
+        return removed
+
+    def cmd_hincrby(self, key, field, amount):
+        fields = self._hash(key, create=True)
+        value = _int(fields.get(field, b"0")) + _int(amount)
+        fields[field] = str(value).encode()
+        return value
+
+
+# === Connections ===
+# Bytes requested from the socket per read
+READ_SIZE = 64 * 1024
+
+
+def parse_command(buffer, pos=0):
+    """One command starting at ``pos``, as ``(list of bytes, next pos)``; None while it is incomplete.
+
+    Commands are arrays of bulk strings, or an inline line.
+    """
+    end = buffer.find(b"\n", pos)
+    if end < 0:
+        return None
+    line = bytes(buffer[pos:end]).rstrip(b"\r")
+    pos = end + 1
+    if not line.startswith(b"*"):
+        return line.split(), pos
+    args = []
+    for _ in range(_int(line[1:])):
+        end = buffer.find(b"\n", pos)
+        if end < 0:
+            return None
+        header = buffer[pos:end]
+        if not header.startswith(b"$"):
+            raise CommandError("ERR Protocol error: expected '$'")
+        start = end + 1
+        pos = start + _int(bytes(header[1:]).rstrip(b"\r")) + 2
+        if pos > len(buffer):
+            return None
+        args.append(bytes(buffer[start:pos - 2]))
+    return args, pos
+
+
+class RespServer:
+    def __init__(self):
+        self.keyspace = Keyspace()
+
+    async def handle_connection(self, reader, writer):
+        buffer = bytearray()
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                buffer += data
+                # Answer every complete command received so far (a pipeline) with one write
+                replies, pos = [], 0
+                while True:
+                    parsed = parse_command(buffer, pos)
+                    if parsed is None:
+                        break
+                    command, pos = parsed
+                    if command:
+                        try:
+                            replies.append(self.keyspace.execute(command[0], command[1:]))
+                        except CommandError as e:
+                            replies.append(e)
+                del buffer[:pos]
+                if replies:
+                    writer.write(b"".join(encode_reply(reply) for reply in replies))
+                    await writer.drain()
+        except (ConnectionError, CommandError):
+            pass
+        finally:
+            writer.close()
+
+    async def sweep_expired(self):
+        while True:
+            await asyncio.sleep(EXPIRE_SWEEP_INTERVAL)
+            self.keyspace.sweep()
+
+
+async def serve(host, port, ready=None):
+    service = RespServer()
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    sweeper = asyncio.create_task(service.sweep_expired())
+    logger.info("RESP server on %s:%d", host, server.sockets[0].getsockname()[1])
+    if ready is not None:
+        ready(server.sockets[0].getsockname()[1])
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        sweeper.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="In-memory Redis-protocol server for Grow a Garden trades")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
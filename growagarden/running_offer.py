@@ -0,0 +1,74 @@
+from growagarden.valuation import MODE_PER_KG
+
+
+class RunningOffer:
+    """An editable offer of any length with a running total.
+
+    Rows are keyed by a stable row id. Setting a row revalues just that row
+    and adjusts the total by the difference, so edits cost O(1) however long
+    the offer is. The total is kept in integer cents: values span many orders
+    of magnitude and a float total would not return to the exact value after
+    a huge row is added and removed again.
+    """
+
+    def __init__(self, valuation, revision=None):
+        self.valuation = valuation
+        self.revision = revision
+        self.rows = {}          # row id -> (crop, units, mutations tuple), in insertion order
+        self._cents = {}        # row id -> value in cents
+        self.total_cents = 0
+        self.changes = 0        # bumped on every effective edit, e.g. to know when to save
+        self._next_id = 0
+
+    @property
+    def total(self):
+        return self.total_cents / 100
+
+    def value(self, row_id):
+        return self._cents[row_id] / 100
+
+    def _price(self, row):
+        crop, units, mutations = row
+        return round(self.valuation.value(crop, units, mutations) * 100)
+
+    # === Editing ===
+    def add(self, crop, units=0.0, mutations=()):
+        row_id = self._next_id
+        self._next_id += 1
+        self.rows[row_id] = None
+        self._cents[row_id] = 0
+        self.set(row_id, crop, units, mutations)
+        return row_id
+
+    def set(self, row_id, crop, units, mutations):
+        """Update one row; returns False (and revalues nothing) if it did not change."""
+        row = (crop, float(units), tuple(mutations))
+        if self.rows[row_id] == row:
+            return False
+        cents = self._price(row)
+        self.total_cents += cents - self._cents[row_id]
+        self.rows[row_id] = row
+        self._cents[row_id] = cents
+        self.changes += 1
+        return True
+
+    def remove(self, row_id):
+        self.total_cents -= self._cents.pop(row_id)
+        del self.rows[row_id]
+        self.changes += 1
+
+    def reprice(self, valuation, revision=None):
+        """Switch to new prices (e.g. after a catalog reload), revaluing every row in one batch."""
+        self.valuation = valuation
+        self.revision = revision
+        if not self.rows:
+            return
+        crops, units, mutations = zip(*self.rows.values())
+        crop_ids, masks = valuation.encode(crops, mutations)
+        values = valuation.batch_value(crop_ids, units, MODE_PER_KG, masks)
+        self._cents = {row_id: round(v * 100) for row_id, v in zip(self.rows, values.tolist())}
+        self.total_cents = sum(self._cents.values())
+
+    def items(self):
+        """``[(crop, units, [mutations]), ...]`` in row order, as stored in a trade."""
+        return [(crop, units, list(mutations)) for crop, units, mutations in self.rows.values()]
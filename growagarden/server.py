@@ -0,0 +1,268 @@
+"""Headless valuation service over HTTP/JSON.
+
+    python -m growagarden.server --port 8000 --workers 4
+
+Endpoints (all batch-friendly):
+
+- ``POST /value``    ``{"items": [item, ...]}`` -> per-item values and the total
+- ``POST /compare``  ``{"trades": [{"mine": [item, ...], "theirs": [item, ...]}, ...]}``
+- ``GET /trade/{code}`` offers currently stored for a trade code
+- ``GET /health``
+- ``GET /metrics`` / ``GET /metrics.json`` per-route latency histograms of this
+  worker (Prometheus text / JSON); start with ``--metrics`` to collect them
+
+An item is ``{"crop": "Carrot", "units": 1.5, "mutations": ["Wet"], "mode": "Price per KG"}``;
+``mutations`` and ``mode`` are optional.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import signal
+from http import HTTPStatus
+
+import numpy as np
+
+from growagarden import metrics
+from growagarden.catalog import get_catalog
+from growagarden.core import trade_fairness
+from growagarden.offer_codec import decode_offer
+from growagarden.trade_backends import open_trade_backend
+from growagarden.valuation import CALCULATION_MODES, MODE_PER_KG
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB = "/mount/data/growagarden.db"
+MAX_BODY_BYTES = 8 * 1024 * 1024
+KEEP_ALIVE_TIMEOUT = 15
+# Timer name for each route; /trade/{code} is timed as "trade"
+ROUTE_TIMERS = {"/health": "health", "/metrics": "metrics", "/metrics.json": "metrics",
+                "/value": "value", "/compare": "compare"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# === Valuation ===
+def value_items(items, catalog):
+    """Value a list of JSON items in one batch; returns a NumPy array."""
+    if not isinstance(items, list):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "'items' must be a list.")
+    try:
+        crops = [item["crop"] for item in items]
+        units = [float(item["units"]) for item in items]
+        mutations = [item.get("mutations") or [] for item in items]
+        modes = [CALCULATION_MODES[item["mode"]] if "mode" in item else MODE_PER_KG for item in items]
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid item: {e!r}") from e
+    # NaN or infinite units would come back as invalid JSON; a string would be read letter by letter
+    if not np.isfinite(units).all():
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "'units' must be a finite number.")
+    if not all(isinstance(m, list) for m in mutations):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "'mutations' must be a list.")
+    if not items:
+        return np.zeros(0)
+    crop_ids, masks = catalog.valuation.encode(crops, mutations)
+    return catalog.valuation.batch_value(crop_ids, units, modes, masks)
+
+
+class ValuationService:
+    def __init__(self, store=None):
+        self.store = store
+
+    def value(self, body):
+        values = value_items(body.get("items"), get_catalog())
+        return {"values": values.tolist(), "total": float(values.sum())}
+
+    def compare(self, body):
+        trades = body.get("trades")
+        if not isinstance(trades, list):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'trades' must be a list.")
+
+        # Every side of every trade is valued in a single batch, then summed per side
+        try:
+            sides = [side for trade in trades for side in (trade["mine"], trade["theirs"])]
+        except (KeyError, TypeError) as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid trade: {e!r}") from e
+        if not all(isinstance(side, list) for side in sides):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'mine' and 'theirs' must be lists.")
+        values = value_items([item for side in sides for item in side], get_catalog())
+        bounds = np.cumsum([0] + [len(side) for side in sides])
+        totals = [float(values[start:end].sum()) for start, end in zip(bounds[:-1], bounds[1:])]
+
+        results = []
+        for mine, theirs in zip(totals[::2], totals[1::2]):
+            results.append({"mine": mine, "theirs": theirs, "result": trade_fairness(mine, theirs)})
+        return {"results": results}
+
+    async def trade(self, code):
+        if self.store is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "No trade store configured.")
+        rows = await asyncio.to_thread(self.store.get_offers, code)
+        catalog = get_catalog()
+        offers = []
+        for user, offer, version in rows:
+            items = decode_offer(offer, catalog.valuation) if offer else []
+            values = value_items([{"crop": c, "units": w, "mutations": m} for c, w, m in items], catalog)
+            offers.append({
+                "user": user,
+                "version": version,
+                "items": [{"crop": c, "units": w, "mutations": m} for c, w, m in items],
+                "value": float(values.sum()),
+            })
+        return {"code": code, "offers": offers}
+
+    async def dispatch(self, method, path, body):
+        # One histogram per route, not per URL, so unknown paths can't grow the registry
+        route = "trade" if path.startswith("/trade/") else ROUTE_TIMERS.get(path, "other")
+        with metrics.timer(f"server.{route}"):
+            return await self._dispatch(method, path, body)
+
+    async def _dispatch(self, method, path, body):
+        if path == "/health" and method == "GET":
+            return {"status": "ok", "catalog": get_catalog().revision}
+        if path == "/metrics" and method == "GET":
+            return metrics.to_prometheus()
+        if path == "/metrics.json" and method == "GET":
+            return metrics.jsonable()
+        if path.startswith("/trade/") and method == "GET":
+            return await self.trade(path[len("/trade/"):])
+        if path in ("/value", "/compare"):
+            if method != "POST":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"{path} only accepts POST.")
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError as e:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid JSON: {e}") from e
+            if not isinstance(payload, dict):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object.")
+            return self.value(payload) if path == "/value" else self.compare(payload)
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {method} {path}.")
+
+    # === HTTP/1.1 with keep-alive ===
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = request_line.split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in header_lines:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                length = headers.get("content-length") or "0"
+                if "transfer-encoding" in headers:
+                    # Chunked bodies are not supported; the unread body would be taken for the next request
+                    status, payload = HTTPStatus.NOT_IMPLEMENTED, {"error": "Transfer-Encoding is not supported."}
+                    keep_alive = False
+                # Digits only: int() would also take "-1", "+5" or "1_0"
+                elif not (length.isascii() and length.isdigit()):
+                    status, payload = HTTPStatus.BAD_REQUEST, {"error": "Invalid Content-Length."}
+                    # Without a length the body cannot be skipped, so the connection cannot be reused
+                    keep_alive = False
+                elif int(length) > MAX_BODY_BYTES:
+                    status, payload = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Request body too large."}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(int(length))
+                    status, payload = await self._respond(method, target.split("?", 1)[0], body)
+
+                # Plain strings (the Prometheus exposition) are sent as text
+                if isinstance(payload, str):
+                    data, content_type = payload.encode(), "text/plain; version=0.0.4"
+                else:
+                    data, content_type = json.dumps(payload).encode(), "application/json"
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method, path, body):
+        try:
+            return HTTPStatus.OK, await self.dispatch(method, path, body)
+        except HTTPError as e:
+            return e.status, {"error": e.message}
+        except Exception:
+            logger.exception("Error handling %s %s", method, path)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error."}
+
+
+# === Launcher ===
+async def serve(host, port, db_path=None, reuse_port=False):
+    service = ValuationService(open_trade_backend(db_path) if db_path else None)
+    server = await asyncio.start_server(service.handle_connection, host, port, reuse_port=reuse_port)
+    async with server:
+        await server.serve_forever()
+
+
+def run_worker(host, port, db_path, reuse_port):
+    try:
+        asyncio.run(serve(host, port, db_path, reuse_port))
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grow a Garden valuation service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes sharing the port via SO_REUSEPORT")
+    parser.add_argument("--db", default=DEFAULT_DB,
+                        help="trade database (SQLite path or redis:// URL) for /trade/{code} ('' to disable)")
+    parser.add_argument("--metrics", action="store_true", help="collect latency metrics for /metrics")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    if args.metrics:
+        # Before the workers fork, so each of them inherits it
+        metrics.enable()
+
+    if args.workers <= 1:
+        run_worker(args.host, args.port, args.db, False)
+        return
+
+    # Turn SIGTERM into KeyboardInterrupt so the workers (which inherit this)
+    # shut down with the parent instead of being orphaned.
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, stop)
+
+    workers = [multiprocessing.Process(target=run_worker, args=(args.host, args.port, args.db, True))
+               for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    logger.info("Serving on %s:%d with %d workers", args.host, args.port, args.workers)
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+
+
+if __name__ == "__main__":
+    main()
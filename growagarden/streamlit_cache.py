@@ -0,0 +1,40 @@
+import streamlit as st
+
+from growagarden.catalog import get_catalog
+from growagarden.metrics import timed
+
+# Derived artifacts for the Streamlit pages. Each is keyed on the catalog
+# revision, so a catalog reload invalidates it and idle reruns only pay for
+# the cache lookup. Returned objects are shared: treat them as read-only.
+# pandas is imported where it is used, so pages that never build a table
+# (the trade page) do not pay for it on a cold start.
+
+
+@st.cache_resource(max_entries=4)
+def sorted_options(revision):
+    """(sorted crop names, sorted mutation names) for selectboxes."""
+    catalog = get_catalog()
+    return sorted(catalog.crop_names), sorted(catalog.mutations.names)
+
+
+@st.cache_resource(max_entries=4)
+def kg_prices(revision):
+    """Crops that can be traded by weight, in catalog order."""
+    return {crop: price for crop, price in get_catalog().price_per_kg.items() if price > 0}
+
+
+@st.cache_resource(max_entries=4)
+@timed("values.build_tables")
+def values_tables(revision):
+    """(crop price table, mutation multiplier table) for the Values tab."""
+    import pandas as pd
+
+    catalog = get_catalog()
+    crops = pd.DataFrame({
+        "Crop": catalog.crop_names,
+        "Base Price (per item)": [catalog.base_prices[c] for c in catalog.crop_names],
+        "Price per KG": [catalog.price_per_kg[c] for c in catalog.crop_names],
+    }).sort_values("Crop", ignore_index=True)
+    mutations = pd.DataFrame(
+        sorted(catalog.mutation_multipliers.items()), columns=["Mutation", "Multiplier"])
+    return crops, mutations
@@ -0,0 +1,96 @@
+import hmac
+import os
+import time
+
+import streamlit as st
+
+from growagarden import metrics
+
+# Set to a port number to also serve /metrics (Prometheus text) and
+# /metrics.json on localhost from the Streamlit process.
+METRICS_PORT_ENV = "GROWAGARDEN_METRICS_PORT"
+# The profiling panel is only shown on pages opened with ?admin=<this token>;
+# without the variable it is never shown.
+ADMIN_TOKEN_ENV = "GROWAGARDEN_ADMIN_TOKEN"
+
+
+@st.cache_resource
+def _metrics_endpoint():
+    # Once per server process; None when no port is configured
+    port = os.environ.get(METRICS_PORT_ENV)
+    return metrics.serve(int(port)) if port else None
+
+
+def finish_rerun(page, started):
+    """Record the rerun of ``page`` that began at ``started`` (a ``perf_counter`` value)."""
+    _metrics_endpoint()
+    if metrics.is_enabled():
+        metrics.registry.observe(f"rerun.{page}", time.perf_counter() - started)
+
+
+def _is_admin():
+    token = os.environ.get(ADMIN_TOKEN_ENV)
+    given = st.query_params.get("admin")
+    return bool(token) and given is not None and hmac.compare_digest(given.encode(), token.encode())
+
+
+def profiling_panel():
+    """Admin-only sidebar panel with per-stage latency histograms and call counts.
+
+    Metrics are collected per server process, so switching profiling on
+    turns it on for every session. The switch is a pair of buttons acting
+    on that shared state, not a toggle, since a toggle's per-session value
+    would reset it on that session's next rerun.
+    """
+    if not _is_admin():
+        return
+
+    with st.sidebar.expander("🛠 Profiling", expanded=metrics.is_enabled()):
+        if not metrics.is_enabled():
+            st.caption("Off for every session.")
+            if st.button("Turn on", key="profiling_on"):
+                metrics.enable(True)
+                st.rerun()
+            return
+        st.caption("On for every session of this server process.")
+        if st.button("Turn off", key="profiling_off"):
+            metrics.enable(False)
+            st.rerun()
+
+        # Only needed once profiling is on; keeps pandas off the cold-start path
+        import pandas as pd
+
+        snapshot = metrics.registry.snapshot()
+        if not snapshot["timers"]:
+            st.caption("No samples yet; interact with the page to collect some.")
+        else:
+            stages = pd.DataFrame([
+                {"Stage": name, "Calls": t["count"], "Mean (ms)": t["mean_seconds"] * 1000,
+                 "p50 (ms)": t["p50_seconds"] * 1000, "p99 (ms)": t["p99_seconds"] * 1000,
+                 "Total (ms)": t["total_seconds"] * 1000}
+                for name, t in sorted(snapshot["timers"].items())
+            ])
+            st.dataframe(stages, hide_index=True, width="stretch")
+
+            stage = st.selectbox("Latency histogram", stages["Stage"], key="profiling_stage")
+            buckets = snapshot["timers"][stage]["buckets"]
+            # Bucket labels are upper bounds in ms; only the occupied range is drawn
+            counts = pd.Series(list(buckets.values()),
+                               index=[f"≤{float(b) * 1000:g}" if b != "+Inf" else ">max" for b in buckets])
+            occupied = counts.to_numpy().nonzero()[0]
+            st.bar_chart(counts.iloc[occupied[0]:occupied[-1] + 1], x_label="ms", y_label="calls")
+
+        if snapshot["counters"]:
+            st.dataframe(pd.DataFrame(sorted(snapshot["counters"].items()), columns=["Counter", "Count"]),
+                         hide_index=True, width="stretch")
+        if snapshot["gauges"]:
+            st.dataframe(pd.DataFrame(sorted(snapshot["gauges"].items()), columns=["Gauge", "Value"]),
+                         hide_index=True, width="stretch")
+
+        st.download_button("Prometheus text", metrics.to_prometheus(snapshot),
+                           file_name="growagarden_metrics.prom", mime="text/plain", key="profiling_prom")
+        st.download_button("JSON", metrics.to_json(snapshot),
+                           file_name="growagarden_metrics.json", mime="application/json",
+                           key="profiling_json")
+        if st.button("Reset", key="profiling_reset"):
+            metrics.registry.reset()
@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import OrderedDict
+
+from growagarden import metrics
+
+# Trade codes stay valid this long after they are created
+DEFAULT_TRADE_TTL = 6 * 60 * 60
+# An unchanged offer refreshes its last-touched time at most this often
+TOUCH_INTERVAL = 5 * 60
+
+
+class TradeBackend:
+    """Shared trade state: trade codes and the offer each user stored for one.
+
+    The trade page, the write-behind queue and the HTTP server only use the
+    methods below, so any backend can serve them. Subclasses implement
+    ``create_trades``, ``trade_exists``, ``expire_trades``, ``_write_offers``,
+    ``_touch``, ``get_other_offer_row`` and ``get_offers``, and provide a
+    ``feed`` with ``counterparty_version(code, user)`` and ``wait``.
+
+    Skipping offers that are unchanged since this process last wrote them,
+    and rate-limiting touches, is done here for every backend.
+    """
+
+    # Whether abandoned trades have to be deleted by a TradeSweeper
+    needs_sweeper = False
+
+    def __init__(self, recent_writes=10000):
+        self._recent = OrderedDict()
+        self._recent_limit = recent_writes
+        self._recent_lock = threading.Lock()
+        self.writes = 0
+        self.skipped_writes = 0
+        self.commits = 0
+
+    def create_trade(self, ttl=DEFAULT_TRADE_TTL):
+        return self.create_trades(1, ttl)[0]
+
+    # === Offers ===
+    @metrics.timed("store.save_offer")
+    def save_offer(self, trade_code, user, offer_data):
+        """Store ``offer_data`` for ``user``; returns False when the offer was unchanged.
+
+        Unchanged offers skip the backend, apart from refreshing the
+        last-touched time every ``TOUCH_INTERVAL`` seconds.
+        """
+        return self.save_offers({(trade_code, user): offer_data}) > 0
+
+    def save_offers(self, offers):
+        """Store ``{(code, user): offer_data}`` in one batch; returns the number of offers written.
+
+        Offers are skipped (or only touched) the same way as in ``save_offer``.
+        """
+        now = time.time()
+        upserts, touches = [], []
+        with self._recent_lock:
+            for key, offer_data in offers.items():
+                recent = self._recent.get(key)
+                if recent is not None and recent[0] == offer_data:
+                    self._recent.move_to_end(key)
+                    self.skipped_writes += 1
+                    metrics.count("store.skipped_writes")
+                    if now - recent[1] >= TOUCH_INTERVAL:
+                        touches.append(key)
+                else:
+                    upserts.append((key, offer_data))
+        if not upserts and not touches:
+            return 0
+
+        self._write_offers(upserts, touches, now)
+
+        with self._recent_lock:
+            self.writes += len(upserts)
+            self.commits += 1
+            for key, offer_data in upserts:
+                self._remember(key, offer_data, now)
+            for key in touches:
+                self._remember(key, self._recent[key][0] if key in self._recent else None, now)
+        return len(upserts)
+
+    def touch(self, trade_code, user):
+        """Mark a trade as still in use so it is not swept as abandoned (rate-limited)."""
+        key = (trade_code, user)
+        now = time.time()
+        with self._recent_lock:
+            recent = self._recent.get(key)
+            if recent is not None and now - recent[1] < TOUCH_INTERVAL:
+                return
+            self._remember(key, recent[0] if recent else None, now)
+        self._touch(trade_code, user, now)
+
+    def _remember(self, key, offer_data, touched_at):
+        self._recent[key] = (offer_data, touched_at)
+        self._recent.move_to_end(key)
+        if len(self._recent) > self._recent_limit:
+            self._recent.popitem(last=False)
+
+    @metrics.timed("store.get_other_offer")
+    def get_other_offer(self, trade_code, user):
+        """Return the raw offer stored by anyone other than ``user``, or None."""
+        row = self.get_other_offer_row(trade_code, user)
+        return row[1] if row else None
+
+    # === Maintenance ===
+    def migrate_offers(self, convert, batch_size=500):
+        """Rewrite legacy offers through ``convert``; returns the number migrated."""
+        return 0
+
+    def checkpoint(self):
+        """Make everything written so far durable, e.g. before shutting down."""
+
+    def close(self):
+        pass
+
+
+def open_trade_backend(location):
+    """Open the backend for ``location``: a ``redis://host:port/db`` URL or an SQLite file path."""
+    if location.startswith("redis://"):
+        from growagarden.redis_trade_store import RedisTradeStore
+        from growagarden.resp import RespClient
+
+        return RedisTradeStore(RespClient.from_url(location))
+    from growagarden.trade_store import TradeStore
+
+    return TradeStore(location.removeprefix("sqlite:///") if location.startswith("sqlite:///") else location)
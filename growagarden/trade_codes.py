@@ -0,0 +1,34 @@
+import secrets
+
+# Crockford base32: no I, L, O or U, so codes survive being read out loud
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+CODE_LENGTH = 6
+CODE_BITS = 5 * CODE_LENGTH
+CODE_MASK = (1 << CODE_BITS) - 1
+# Odd, so multiplying by it is a bijection on CODE_BITS-bit integers
+SCRAMBLE = 0x2F0B3A35 & CODE_MASK | 1
+
+_DECODE = {c: i for i, c in enumerate(ALPHABET)}
+_DECODE.update({"I": 1, "L": 1, "O": 0})
+
+
+def new_salt():
+    return secrets.randbits(CODE_BITS)
+
+
+def code_for(counter, salt):
+    """Map a unique counter to a unique, non-sequential code.
+
+    ``(counter + salt) * SCRAMBLE`` is a permutation of the code space, so
+    distinct counters below ``2**CODE_BITS`` can never share a code.
+    """
+    n = ((counter + salt) * SCRAMBLE) & CODE_MASK
+    return "".join(ALPHABET[(n >> shift) & 31] for shift in range(CODE_BITS - 5, -1, -5))
+
+
+def normalize_code(text):
+    """Canonical form of a typed code (case, spaces, I/L/O look-alikes), or None."""
+    text = (text or "").strip().upper().replace(" ", "").replace("-", "")
+    if len(text) != CODE_LENGTH or any(c not in _DECODE for c in text):
+        return None
+    return "".join(ALPHABET[_DECODE[c]] for c in text)
@@ -0,0 +1,159 @@
+import numpy as np
+
+from growagarden.valuation import MODE_PER_KG
+
+# A trade is fair when the two sides differ by less than 10% of the larger one
+FAIR_TRADE_TOLERANCE = 0.1
+
+OBJECTIVES = ("items", "overshoot")
+# DP resolution: at least MIN_BUCKETS steps, and at most MAX_DP_CELLS entries in the took table
+MIN_BUCKETS = 1 << 14
+MAX_DP_CELLS = 1 << 26
+
+
+def is_fair(value1, value2, tolerance=FAIR_TRADE_TOLERANCE):
+    return abs(value1 - value2) < tolerance * max(value1, value2)
+
+
+def fairness_band(target, tolerance=FAIR_TRADE_TOLERANCE):
+    """Open interval of offer values that are fair against ``target``."""
+    return target * (1 - tolerance), target / (1 - tolerance)
+
+
+def _ranking(totals, counts, target, objective):
+    """Order for candidate totals: fewest items first, or smallest overshoot first.
+
+    Overshoot is how far a total is above ``target``; totals at or above it
+    rank before totals below it, which rank by how close they come.
+    """
+    over = totals - target
+    below = over < 0
+    if objective == "items":
+        return np.lexsort((np.abs(over), below, counts))
+    return np.lexsort((counts, np.abs(over), below))
+
+
+def _repair(chosen, total, values, by_value, low, high, goal):
+    """Move an unfair pick into the band: drop one item, or add items largest first.
+
+    Items are added until the total passes ``goal`` (the band's low end, or
+    the target when minimising overshoot) while staying under ``high``.
+    """
+    if total >= high:
+        droppable = [i for i in chosen if low < total - values[i] < high]
+        if not droppable:
+            return None
+        drop = min(droppable, key=values.__getitem__)
+        chosen = [i for i in chosen if i != drop]
+    else:
+        taken = set(chosen)
+        chosen = list(chosen)
+        for i in by_value:
+            if total >= goal:
+                break
+            if i not in taken and total + values[i] <= goal:
+                taken.add(int(i))
+                chosen.append(int(i))
+                total += values[i]
+        if total < goal:
+            # The smallest leftover item that crosses the goal, if it stays fair
+            for i in by_value[::-1]:
+                if i not in taken and goal <= total + values[i] < high:
+                    chosen.append(int(i))
+                    break
+    total = float(values[chosen].sum()) if chosen else 0.0
+    return (sorted(chosen), total) if low < total < high else None
+
+
+def best_counter_offer(target, values, objective="items", max_buckets=1 << 15,
+                       tolerance=FAIR_TRADE_TOLERANCE, max_checks=64):
+    """Pick the subset of ``values`` whose total is a fair trade against ``target``.
+
+    ``objective="items"`` prefers the fewest items (then the smallest
+    overshoot); ``"overshoot"`` prefers the total that exceeds ``target`` by
+    the least, or if none reaches it the one closest below (then fewest items).
+
+    Values are scaled onto integer steps for a 0/1 knapsack DP that keeps
+    the fewest items and their exact total per step. The step is no larger
+    than the smallest item, so nothing rounds away, unless that takes more
+    than ``max_buckets`` steps; items smaller than the step then only take
+    part in the repair pass. If no DP state is fair, the ``max_checks``
+    states closest to the band are repaired by dropping one item or adding
+    leftover items. Returns ``(indices, total)`` or ``None`` if nothing fits.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective '{objective}', expected one of {OBJECTIVES}.")
+    values = np.asarray(values, dtype=float)
+    if target <= 0 or values.size == 0:
+        return None
+
+    low, high = fairness_band(target, tolerance)
+    usable = np.flatnonzero((values > 0) & (values < high))
+    if usable.size == 0:
+        return None
+    # Bound the took table to MAX_DP_CELLS whatever the inventory size
+    buckets = int(min(max(np.ceil(high / values[usable].min()), MIN_BUCKETS), max_buckets,
+                      max(MAX_DP_CELLS // usable.size, MIN_BUCKETS)))
+    unit = high / buckets
+    weights = np.rint(values[usable] / unit).astype(np.int64)
+    by_value = usable[np.argsort(-values[usable], kind="stable")]
+    usable, weights = usable[weights > 0], weights[weights > 0]
+
+    # dp[s] = fewest items whose scaled total is s, exact[s] their real total;
+    # took[i, s] marks the sums that item i improved, enough to walk a pick back.
+    unreachable = len(usable) + 1
+    dp = np.full(buckets + 1, unreachable, dtype=np.int32)
+    dp[0] = 0
+    exact = np.zeros(buckets + 1)
+    took = np.zeros((len(usable), buckets + 1), dtype=bool)
+    for i, w in enumerate(weights):
+        candidate = dp[:-w] + 1
+        better = candidate < dp[w:]
+        dp[w:][better] = candidate[better]
+        exact[w:][better] = exact[:-w][better] + values[usable[i]]
+        took[i, w:] = better
+
+    def walk(s):
+        chosen = []
+        for i in range(len(usable) - 1, -1, -1):
+            if took[i, s]:
+                chosen.append(int(usable[i]))
+                s -= weights[i]
+        return chosen
+
+    sums = np.flatnonzero(dp < unreachable)
+    totals, counts = exact[sums], dp[sums]
+    fair = (totals > low) & (totals < high)
+    if fair.any():
+        best = sums[fair][_ranking(totals[fair], counts[fair], target, objective)[0]]
+        chosen = walk(best)
+        return sorted(chosen), float(values[chosen].sum())
+
+    # No state is fair (steps round, or small items were left out): repair the nearest ones
+    gap = np.where(totals <= low, low - totals, totals - high)
+    goal = np.nextafter(low, high) if objective == "items" else target
+    repaired = [result for s in sums[np.argsort(gap, kind="stable")[:max_checks]]
+                if (result := _repair(walk(s), float(exact[s]), values, by_value, low, high, goal)) is not None]
+    if not repaired:
+        return None
+    order = _ranking(np.array([total for _, total in repaired]),
+                     np.array([len(chosen) for chosen, _ in repaired]), target, objective)
+    return repaired[order[0]]
+
+
+def balance_trade(target, inventory, valuation, mode=MODE_PER_KG, **kwargs):
+    """Price ``[(crop, units, mutations), ...]`` and pick a fair counter-offer from it.
+
+    ``mode`` may be a single calculation mode or one per row. Returns
+    ``(rows, total)`` with the chosen inventory rows, or ``None``.
+    """
+    if not inventory:
+        return None
+    crops, units, mutations = zip(*inventory)
+    crop_ids, masks = valuation.encode(crops, mutations)
+    values = valuation.batch_value(crop_ids, units, mode, masks)
+    result = best_counter_offer(target, values, **kwargs)
+    if result is None:
+        return None
+    indices, total = result
+    return [inventory[i] for i in indices], total
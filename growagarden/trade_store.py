@@ -0,0 +1,423 @@
+import argparse
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from growagarden import metrics
+from growagarden.trade_backends import DEFAULT_TRADE_TTL, TradeBackend
+from growagarden.trade_codes import code_for, new_salt
+
+logger = logging.getLogger(__name__)
+
+# Trades whose versions the feed keeps in memory; older ones are re-read on demand
+FEED_CACHE_SIZE = 10000
+
+# === Statements ===
+# Kept as module constants so every pooled connection reuses the same
+# prepared statement from sqlite3's per-connection statement cache.
+CREATE_TRADES = """
+CREATE TABLE IF NOT EXISTS trades (
+    code TEXT NOT NULL,
+    user TEXT NOT NULL,
+    offer TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
+    touched_at REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (code, user)
+) WITHOUT ROWID
+"""
+# Columns added after the first release, with their definitions
+TRADES_ADDED_COLUMNS = {
+    "version": "INTEGER NOT NULL DEFAULT 1",
+    "touched_at": "REAL NOT NULL DEFAULT 0",
+}
+UPSERT_OFFER = """
+INSERT INTO trades (code, user, offer, touched_at) VALUES (?, ?, ?, ?)
+ON CONFLICT (code, user) DO UPDATE SET offer = excluded.offer, version = version + 1,
+    touched_at = excluded.touched_at
+WHERE offer IS NOT excluded.offer
+RETURNING version
+"""
+TOUCH_OFFER = "UPDATE trades SET touched_at = ? WHERE code = ? AND user = ?"
+# The code is derived from the id, so it is filled in once SQLite has assigned one
+INSERT_SESSION = ("INSERT INTO trade_sessions (created_at, expires_at, touched_at, ttl) "
+                  "VALUES (?, ?, ?, ?) RETURNING id")
+# Sliding expiry: every touch or save gives the trade its full TTL again
+TOUCH_SESSION = "UPDATE trade_sessions SET touched_at = ?, expires_at = MAX(expires_at, ? + ttl) WHERE code = ?"
+CREATE_SESSIONS = """
+CREATE TABLE IF NOT EXISTS trade_sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    code TEXT UNIQUE,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    touched_at REAL NOT NULL DEFAULT 0,
+    ttl REAL NOT NULL DEFAULT {ttl}
+)
+""".format(ttl=DEFAULT_TRADE_TTL)
+SESSIONS_ADDED_COLUMNS = {
+    "touched_at": "REAL NOT NULL DEFAULT 0",
+    "ttl": f"REAL NOT NULL DEFAULT {DEFAULT_TRADE_TTL}",
+}
+CREATE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS trade_sessions_expires_at ON trade_sessions (expires_at)",
+    "CREATE INDEX IF NOT EXISTS trade_sessions_touched_at ON trade_sessions (touched_at)",
+    "CREATE INDEX IF NOT EXISTS trades_touched_at ON trades (touched_at)",
+)
+# Legacy offers that failed to migrate, kept for inspection instead of blocking startup
+CREATE_QUARANTINE = """
+CREATE TABLE IF NOT EXISTS quarantined_offers (
+    code TEXT NOT NULL,
+    user TEXT NOT NULL,
+    offer TEXT,
+    error TEXT NOT NULL,
+    quarantined_at REAL NOT NULL
+)
+"""
+CREATE_SETTINGS = "CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+SELECT_ACTIVE_SESSION = "SELECT 1 FROM trade_sessions WHERE code = ? AND expires_at > ?"
+SELECT_OTHER_OFFER = "SELECT user, offer, version FROM trades WHERE code = ? AND user <> ? LIMIT 1"
+SELECT_OFFERS = "SELECT user, offer, version FROM trades WHERE code = ?"
+SELECT_VERSIONS = "SELECT user, version FROM trades WHERE code = ?"
+
+
+class TradeFeed:
+    """Change feed: the latest row version per (code, user).
+
+    Writers in this process publish after every effective write, which wakes
+    ``wait`` at once; sessions compare ``counterparty_version`` against what
+    they last rendered instead of re-querying the database on a timer.
+    Writes from other processes sharing the file (the HTTP server, another
+    app instance) bump SQLite's ``PRAGMA data_version``; when it has moved,
+    the versions of the trade being asked about are re-read from the table.
+    Only the ``cache_size`` most recently used trades are kept; the table is
+    the source of truth, so an evicted (or swept) trade is simply re-read.
+    """
+
+    def __init__(self, connect, poll_interval=0.1, cache_size=FEED_CACHE_SIZE):
+        self._connect = connect
+        self.poll_interval = poll_interval
+        self.cache_size = cache_size
+        self._changed = threading.Condition()
+        self._trades = OrderedDict()    # code -> [data_version last read at, {user: version}]
+        self._conn = None
+        self._conn_lock = threading.Lock()
+
+    def _entry(self, trade_code):
+        # Caller holds self._changed
+        entry = self._trades.get(trade_code)
+        if entry is None:
+            entry = self._trades[trade_code] = [None, {}]
+            if len(self._trades) > self.cache_size:
+                self._trades.popitem(last=False)
+        else:
+            self._trades.move_to_end(trade_code)
+        return entry
+
+    def publish(self, trade_code, user, version):
+        with self._changed:
+            users = self._entry(trade_code)[1]
+            # A refresh from the table may already have seen this write (or a later one)
+            users[user] = max(users.get(user, 0), version)
+            self._changed.notify_all()
+
+    def forget(self, trade_codes):
+        """Drop the cached versions of deleted trades."""
+        with self._changed:
+            for code in trade_codes:
+                self._trades.pop(code, None)
+
+    def _refresh(self, trade_code):
+        with self._conn_lock:
+            if self._conn is None:
+                self._conn = self._connect()
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            with self._changed:
+                if self._entry(trade_code)[0] == data_version:
+                    return
+            rows = self._conn.execute(SELECT_VERSIONS, (trade_code,)).fetchall()
+        with self._changed:
+            self._entry(trade_code)[:] = [data_version, dict(rows)]
+
+    def counterparty_version(self, trade_code, user):
+        self._refresh(trade_code)
+        # Row versions only grow, so their sum changes whenever any of them does
+        with self._changed:
+            users = self._entry(trade_code)[1]
+            return sum(v for u, v in users.items() if u != user)
+
+    def wait(self, trade_code, user, seen, timeout=None):
+        """Block until the counterparty version differs from ``seen`` (long-poll).
+
+        Local writes wake it immediately; other processes' are seen within ``poll_interval``.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            version = self.counterparty_version(trade_code, user)
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if version != seen or (remaining is not None and remaining <= 0):
+                return version
+            with self._changed:
+                self._changed.wait(self.poll_interval if remaining is None else min(self.poll_interval, remaining))
+
+    def close(self):
+        with self._conn_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class TradeStore(TradeBackend):
+    """SQLite-backed trade offers shared by every session of one app process.
+
+    Connections run in WAL mode so readers never wait on the writer, and are
+    handed out from a bounded pool. ``save_offer`` skips the write entirely
+    when the offer is unchanged since this store last wrote it.
+    """
+
+    needs_sweeper = True
+
+    def __init__(self, path, pool_size=4, busy_timeout=5.0, recent_writes=10000):
+        super().__init__(recent_writes)
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self.feed = TradeFeed(self._connect)
+
+        with self.connection() as conn:
+            self._setup_schema(conn)
+
+    # === Connections ===
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                               check_same_thread=False, isolation_level=None)
+        # Only takes effect on a brand-new file, so it has to come before WAL
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        # At most pool_size connections exist; extra callers wait for one
+        self._slots.acquire()
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+            self._slots.release()
+
+    def checkpoint(self):
+        with self.connection() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+    def close(self):
+        self.feed.close()
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    # === Schema ===
+    def _setup_schema(self, conn):
+        # Incremental auto-vacuum lets the sweeper hand free pages back to the
+        # filesystem a few at a time. Files created before it need one full VACUUM,
+        # which rewrites the whole file, so that is a maintenance step, not startup work.
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            logger.warning("%s does not use incremental auto-vacuum; run "
+                           "`python -m growagarden.trade_store --db %s vacuum` once to enable it",
+                           self.path, self.path)
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            columns = conn.execute("PRAGMA table_info(trades)").fetchall()
+            if columns and not any(col[5] for col in columns):
+                # Legacy table without a primary key: keep the newest row per (code, user)
+                conn.execute("ALTER TABLE trades RENAME TO trades_legacy")
+                conn.execute(CREATE_TRADES)
+                conn.execute("INSERT OR REPLACE INTO trades (code, user, offer, touched_at) "
+                             "SELECT code, user, offer, ? FROM trades_legacy "
+                             "WHERE code IS NOT NULL AND user IS NOT NULL ORDER BY rowid", (time.time(),))
+                conn.execute("DROP TABLE trades_legacy")
+            else:
+                conn.execute(CREATE_TRADES)
+            conn.execute(CREATE_SESSIONS)
+            self._add_columns(conn, "trades", TRADES_ADDED_COLUMNS)
+            self._add_columns(conn, "trade_sessions", SESSIONS_ADDED_COLUMNS)
+            for statement in CREATE_INDEXES:
+                conn.execute(statement)
+            conn.execute(CREATE_SETTINGS)
+            conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('code_salt', ?)", (str(new_salt()),))
+            self._code_salt = int(conn.execute("SELECT value FROM settings WHERE key = 'code_salt'").fetchone()[0])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def enable_incremental_vacuum(self):
+        """Switch an older database to incremental auto-vacuum with one full VACUUM; returns True if it ran."""
+        with self.connection() as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                return False
+            conn.execute("VACUUM")
+        return True
+
+    def _add_columns(self, conn, table, added_columns):
+        existing = {col[1] for col in conn.execute(f"PRAGMA table_info({table})")}
+        for name, definition in added_columns.items():
+            if name not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+                if name == "touched_at":
+                    # Start the idle clock for existing rows now rather than at the epoch
+                    conn.execute(f"UPDATE {table} SET touched_at = ?", (time.time(),))
+
+    def migrate_offers(self, convert, batch_size=500):
+        """Rewrite legacy text offers through ``convert``; returns the number migrated.
+
+        Row versions are left alone since the offers themselves do not change.
+        Rows ``convert`` rejects are logged and moved to ``quarantined_offers``,
+        so one bad legacy row neither blocks startup nor reaches a reader.
+        """
+        migrated = 0
+        with self.connection() as conn:
+            while True:
+                rows = conn.execute("SELECT code, user, offer FROM trades "
+                                    "WHERE typeof(offer) = 'text' LIMIT ?", (batch_size,)).fetchall()
+                if not rows:
+                    return migrated
+                updates, rejected = [], []
+                for code, user, offer in rows:
+                    try:
+                        updates.append((convert(offer), code, user))
+                    except Exception as e:
+                        logger.warning("Quarantining legacy offer of %r in trade %r: %s", user, code, e)
+                        rejected.append((code, user, offer, f"{type(e).__name__}: {e}"))
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.executemany("UPDATE trades SET offer = ? WHERE code = ? AND user = ?", updates)
+                    if rejected:
+                        conn.execute(CREATE_QUARANTINE)
+                        now = time.time()
+                        conn.executemany("INSERT INTO quarantined_offers (code, user, offer, error, quarantined_at) "
+                                         "VALUES (?, ?, ?, ?, ?)", [(*row, now) for row in rejected])
+                        conn.executemany("DELETE FROM trades WHERE code = ? AND user = ?",
+                                         [(code, user) for code, user, _, _ in rejected])
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                migrated += len(updates)
+
+    # === Trade sessions ===
+    def create_trades(self, count=1, ttl=DEFAULT_TRADE_TTL):
+        """Allocate ``count`` new trade codes valid until ``ttl`` seconds after their last use.
+
+        Codes come from the AUTOINCREMENT id SQLite assigns each row,
+        scrambled with this database's salt, so they are unique by
+        construction; the UNIQUE index on ``code`` is the final collision check.
+        """
+        now = time.time()
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Allocation is rare enough to also clear out expired trades
+                self._expire(conn, now)
+                ids = [conn.execute(INSERT_SESSION, (now, now + ttl, now, ttl)).fetchone()[0] for _ in range(count)]
+                codes = [code_for(i, self._code_salt) for i in ids]
+                conn.executemany("UPDATE trade_sessions SET code = ? WHERE id = ?", zip(codes, ids))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return codes
+
+    def trade_exists(self, trade_code):
+        """True if ``trade_code`` was allocated here and has not expired."""
+        with self.connection() as conn:
+            return conn.execute(SELECT_ACTIVE_SESSION, (trade_code, time.time())).fetchone() is not None
+
+    def expire_trades(self, now=None):
+        """Delete expired trade sessions and their offers; returns the number of sessions removed."""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                removed = self._expire(conn, time.time() if now is None else now)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return removed
+
+    def _expire(self, conn, now):
+        conn.execute("DELETE FROM trades WHERE code IN "
+                     "(SELECT code FROM trade_sessions WHERE expires_at <= ?)", (now,))
+        codes = [row[0] for row in conn.execute("DELETE FROM trade_sessions WHERE expires_at <= ? RETURNING code",
+                                                (now,))]
+        self.feed.forget(codes)
+        return len(codes)
+
+    # === Offers ===
+    def _write_offers(self, upserts, touches, now):
+        published = []
+        codes = {code for (code, _), _ in upserts} | {code for code, _ in touches}
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for (code, user), offer_data in upserts:
+                    rows = conn.execute(UPSERT_OFFER, (code, user, offer_data, now)).fetchall()
+                    if rows:
+                        published.append((code, user, rows[0][0]))
+                conn.executemany(TOUCH_OFFER, [(now, code, user) for code, user in touches])
+                conn.executemany(TOUCH_SESSION, [(now, now, code) for code in codes])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        for code, user, version in published:
+            self.feed.publish(code, user, version)
+
+    def _touch(self, trade_code, user, now):
+        with self.connection() as conn:
+            conn.execute(TOUCH_OFFER, (now, trade_code, user))
+            conn.execute(TOUCH_SESSION, (now, now, trade_code))
+
+    def get_other_offer_row(self, trade_code, user):
+        """``(user, raw offer, version)`` of the counterparty, or None; the version moves on every edit."""
+        with self.connection() as conn:
+            return conn.execute(SELECT_OTHER_OFFER, (trade_code, user)).fetchone()
+
+    @metrics.timed("store.get_offers")
+    def get_offers(self, trade_code):
+        """Return ``[(user, raw offer, version), ...]`` for everyone in the trade."""
+        with self.connection() as conn:
+            return conn.execute(SELECT_OFFERS, (trade_code,)).fetchall()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grow a Garden trade store maintenance")
+    parser.add_argument("--db", default="/mount/data/growagarden.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("vacuum", help="switch an older database to incremental auto-vacuum (rewrites the file)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    store = TradeStore(args.db)
+    try:
+        if store.enable_incremental_vacuum():
+            logger.info("%s now uses incremental auto-vacuum", args.db)
+        else:
+            logger.info("%s already uses incremental auto-vacuum", args.db)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
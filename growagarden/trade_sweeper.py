@@ -0,0 +1,162 @@
+import logging
+import os
+import threading
+import time
+
+from growagarden import metrics
+
+logger = logging.getLogger(__name__)
+
+# Trades nobody has touched for this long are considered abandoned
+DEFAULT_IDLE_TTL = 60 * 60
+
+
+class TradeSweeper:
+    """Background garbage collector for a ``TradeStore`` database.
+
+    Every ``interval`` seconds it deletes expired or abandoned trade sessions
+    (and their offers) plus orphaned offers, ``batch_size`` rows per short
+    transaction with a pause in between so foreground writers are never held
+    up for long. It then returns up to ``vacuum_pages`` free pages with
+    ``incremental_vacuum`` and runs a PASSIVE WAL checkpoint, which never
+    waits on readers or writers. Sweep counts, timings and database size
+    also go to ``growagarden.metrics`` under ``trade_sweeper.*``.
+    """
+
+    def __init__(self, store, interval=60, idle_ttl=DEFAULT_IDLE_TTL, batch_size=500,
+                 batch_pause=0.01, vacuum_pages=256):
+        self.store = store
+        self.interval = interval
+        self.idle_ttl = idle_ttl
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.vacuum_pages = vacuum_pages
+        self._stop = threading.Event()
+        self._thread = None
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "sweeps": 0,
+            "sessions_swept": 0,
+            "offers_swept": 0,
+            "last_sweep_seconds": 0.0,
+            "db_size_bytes": 0,
+            "freelist_pages": 0,
+            "last_error": None,
+        }
+
+    # === Lifecycle ===
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="trade-sweeper", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        # A dedicated connection, so sweeping never takes a slot from the request pool
+        conn = self.store._connect()
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    self.sweep_once(conn)
+                except Exception as e:
+                    logger.exception("Trade sweep failed")
+                    metrics.count("trade_sweeper.errors")
+                    with self._metrics_lock:
+                        self._metrics["last_error"] = repr(e)
+        finally:
+            conn.close()
+
+    def metrics(self):
+        with self._metrics_lock:
+            return dict(self._metrics)
+
+    # === Sweeping ===
+    def sweep_once(self, conn=None, now=None):
+        """Run one full sweep; returns ``(sessions_swept, offers_swept)``."""
+        if conn is None:
+            conn = self.store._connect()
+            try:
+                return self.sweep_once(conn, now)
+            finally:
+                conn.close()
+
+        started = time.perf_counter()
+        now = time.time() if now is None else now
+        idle_cutoff = now - self.idle_ttl
+
+        sessions = offers = 0
+        while not self._stop.is_set():
+            swept = self._in_transaction(conn, self._sweep_sessions, now, idle_cutoff)
+            sessions += swept[0]
+            offers += swept[1]
+            if swept[0] < self.batch_size:
+                break
+            time.sleep(self.batch_pause)
+        while not self._stop.is_set():
+            # Offers left behind by codes that no longer have a session (e.g. legacy rows)
+            swept = self._in_transaction(conn, self._sweep_orphans, idle_cutoff)
+            offers += swept
+            if swept < self.batch_size:
+                break
+            time.sleep(self.batch_pause)
+
+        conn.execute(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)})").fetchall()
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+        freelist_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        elapsed = time.perf_counter() - started
+        db_size = self._db_size()
+
+        with self._metrics_lock:
+            self._metrics["sweeps"] += 1
+            self._metrics["sessions_swept"] += sessions
+            self._metrics["offers_swept"] += offers
+            self._metrics["last_sweep_seconds"] = elapsed
+            self._metrics["db_size_bytes"] = db_size
+            self._metrics["freelist_pages"] = freelist_pages
+            self._metrics["last_error"] = None
+        if metrics.is_enabled():
+            metrics.registry.observe("trade_sweeper.sweep", elapsed)
+            metrics.count("trade_sweeper.sessions_swept", sessions)
+            metrics.count("trade_sweeper.offers_swept", offers)
+            metrics.gauge("trade_sweeper.db_size_bytes", db_size)
+            metrics.gauge("trade_sweeper.freelist_pages", freelist_pages)
+        return sessions, offers
+
+    def _in_transaction(self, conn, sweep, *args):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = sweep(conn, *args)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def _sweep_sessions(self, conn, now, idle_cutoff):
+        codes = [row[0] for row in conn.execute(
+            "SELECT code FROM trade_sessions WHERE expires_at <= ? OR touched_at < ? LIMIT ?",
+            (now, idle_cutoff, self.batch_size))]
+        if not codes:
+            return 0, 0
+        placeholders = ",".join("?" * len(codes))
+        offers = conn.execute(f"DELETE FROM trades WHERE code IN ({placeholders})", codes).rowcount
+        conn.execute(f"DELETE FROM trade_sessions WHERE code IN ({placeholders})", codes)
+        self.store.feed.forget(codes)
+        return len(codes), offers
+
+    def _sweep_orphans(self, conn, idle_cutoff):
+        # Offers of live sessions are left to _sweep_sessions, however idle one side is
+        return conn.execute(
+            "DELETE FROM trades WHERE (code, user) IN "
+            "(SELECT code, user FROM trades WHERE touched_at < ? AND NOT EXISTS "
+            "(SELECT 1 FROM trade_sessions WHERE trade_sessions.code = trades.code) LIMIT ?)",
+            (idle_cutoff, self.batch_size)).rowcount
+
+    def _db_size(self):
+        return sum(os.path.getsize(path) for path in (self.store.path, self.store.path + "-wal")
+                   if os.path.exists(path))
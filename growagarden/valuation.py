@@ -0,0 +1,85 @@
+import numpy as np
+
+from growagarden.metrics import timed
+from growagarden.mutations import MutationResolver
+
+# === Calculation modes ===
+MODE_PER_KG = 0
+MODE_PER_ITEM = 1
+
+CALCULATION_MODES = {
+    "Price per KG": MODE_PER_KG,
+    "Fixed Base Price per Item": MODE_PER_ITEM,
+}
+
+
+class ValuationTable:
+    """Interned price tables for pricing many rows in one NumPy pass.
+
+    Crops are mapped to integer ids in the order given; mutation sets are
+    bitmasks as defined by the table's ``MutationResolver``.
+    """
+
+    def __init__(self, price_per_kg, base_prices=None, mutations=None):
+        base_prices = base_prices or {}
+        self.mutations = mutations or MutationResolver({})
+
+        self.crop_names = list(dict.fromkeys([*price_per_kg, *base_prices]))
+        self.crop_ids = {name: i for i, name in enumerate(self.crop_names)}
+        # Prices as given (usually ints), for exact single-row values
+        self._scalar_prices = {MODE_PER_KG: dict(price_per_kg), MODE_PER_ITEM: dict(base_prices)}
+
+        # One extra trailing slot priced at 0 for unknown crops (id -1)
+        self.price_per_kg = np.zeros(len(self.crop_names) + 1)
+        self.base_prices = np.zeros(len(self.crop_names) + 1)
+        for name, price in price_per_kg.items():
+            self.price_per_kg[self.crop_ids[name]] = price
+        for name, price in base_prices.items():
+            self.base_prices[self.crop_ids[name]] = price
+
+    # === Interning ===
+    def crop_id(self, crop):
+        return self.crop_ids.get(crop, -1)
+
+    def mutation_mask(self, mutations):
+        return self.mutations.mask(mutations)
+
+    def encode(self, crops, mutation_lists):
+        crop_ids = np.fromiter((self.crop_id(c) for c in crops), dtype=np.int64)
+        masks = np.fromiter((self.mutation_mask(m) for m in mutation_lists), dtype=np.int64)
+        return crop_ids, masks
+
+    # === Valuation ===
+    def multipliers(self, masks):
+        # Each distinct mask is resolved once through the shared LRU
+        masks = np.asarray(masks, dtype=np.int64)
+        unique, inverse = np.unique(masks, return_inverse=True)
+        table = np.array([float(self.mutations.multiplier(int(m))) for m in unique])
+        return table[inverse].reshape(masks.shape)
+
+    @timed("valuation.batch_value")
+    def batch_value(self, crop_ids, units, modes, masks):
+        """Value every row: ``price[crop] * units * multiplier[mask]``.
+
+        ``modes`` is a scalar or array of ``MODE_PER_KG``/``MODE_PER_ITEM``;
+        per-item rows truncate ``units`` to whole items.
+        """
+        crop_ids = np.asarray(crop_ids, dtype=np.int64)
+        units = np.asarray(units, dtype=float)
+        per_item = np.asarray(modes) == MODE_PER_ITEM
+
+        prices = np.where(per_item, self.base_prices[crop_ids], self.price_per_kg[crop_ids])
+        units = np.where(per_item, np.trunc(units), units)
+        return prices * units * self.multipliers(masks)
+
+    def value(self, crop, units, mutations, mode=MODE_PER_KG):
+        """Value one row without NumPy: a price lookup times the resolver's cached multiplier.
+
+        Per-item rows with integer prices and multipliers stay exact Python
+        ints; ``batch_value`` works in float64 and rounds huge values.
+        """
+        price = self._scalar_prices[mode].get(crop, 0)
+        multiplier = self.mutations.multiplier(self.mutations.mask(mutations))
+        if mode == MODE_PER_ITEM:
+            return price * int(units) * multiplier
+        return price * float(units) * multiplier
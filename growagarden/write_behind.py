@@ -0,0 +1,222 @@
+import atexit
+import logging
+import threading
+import time
+
+from growagarden import metrics
+
+logger = logging.getLogger(__name__)
+
+# How long interpreter exit waits for the last flush
+SHUTDOWN_TIMEOUT = 30
+# Offers failing one at a time, with nothing written yet in the flush, before
+# the backend is taken to be down (rather than those offers to be bad)
+OUTAGE_FAILURES = 3
+
+
+class WriteBehind:
+    """Write-behind queue in front of a trade backend's ``save_offer``.
+
+    ``save_offer`` only records the offer in a map keyed by ``(code, user)``
+    and returns, so the page never waits on the disk or a locked database,
+    and a session that edits several times between flushes costs one row
+    write. A background thread commits whatever is pending every
+    ``interval`` seconds through the backend's ``save_offers``, ``batch_size``
+    offers per transaction. A failed batch is retried one offer at a time, so
+    one bad offer cannot hold back the rest; offers that still fail are
+    retried after ``retry_delay`` and dropped (with an error logged) after
+    ``max_attempts`` failed writes. While the backend itself is down nothing
+    is counted against the offers.
+
+    Reads through ``pending_offer`` / ``get_offers`` see offers that are not
+    committed yet (read-your-writes); other sessions see them once they are
+    committed and show up on the backend's change feed. ``flush`` waits for
+    everything queued so far, and ``stop`` (also run at interpreter exit)
+    drains the queue and checkpoints the backend.
+    """
+
+    def __init__(self, store, interval=0.05, batch_size=500, retry_delay=1.0, max_attempts=5):
+        self.store = store
+        self.interval = interval
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self._changed = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._pending = {}      # (code, user) -> offer not yet handed to the store
+        self._inflight = {}     # offers being committed right now
+        self._failures = {}     # (code, user) -> failed writes of its queued offer
+        self._queued = 0        # save_offer calls so far
+        self._committed = 0     # save_offer calls known to be committed
+        self._urgent = False
+        self._stopping = False
+        self._thread = None
+        self._metrics = {
+            "queued": 0,
+            "coalesced": 0,
+            "flushes": 0,
+            "offers_flushed": 0,
+            "dropped": 0,
+            "last_flush_seconds": 0.0,
+            "last_error": None,
+        }
+
+    # === Lifecycle ===
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="trade-write-behind", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop, SHUTDOWN_TIMEOUT)
+        return self
+
+    def stop(self, timeout=None):
+        """Commit everything still queued, then make it durable (``TradeBackend.checkpoint``)."""
+        with self._changed:
+            self._stopping = True
+            self._changed.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            atexit.unregister(self.stop)
+        elif self._pending:
+            self.flush_once()
+        with self._changed:
+            lost = len(self._pending) + len(self._inflight)
+        if lost:
+            logger.error("Write-behind stopped with %d offers not committed", lost)
+            return
+        self.store.checkpoint()
+
+    def _run(self):
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self._pending or self._stopping)
+                if not self._pending:
+                    return
+                # Give the first edit a moment to collect others; flush() and stop() cut it short
+                self._changed.wait_for(lambda: self._urgent or self._stopping, self.interval)
+            try:
+                self.flush_once()
+            except Exception:
+                logger.exception("Write-behind flush failed")
+                time.sleep(self.retry_delay)
+
+    def metrics(self):
+        with self._changed:
+            return dict(self._metrics, pending=len(self._pending) + len(self._inflight))
+
+    # === Writing ===
+    def save_offer(self, trade_code, user, offer_data):
+        """Queue ``offer_data`` for ``user``, replacing any offer of theirs still queued."""
+        key = (trade_code, user)
+        with self._changed:
+            if key in self._pending:
+                self._metrics["coalesced"] += 1
+                metrics.count("write_behind.coalesced")
+            elif not self._pending:
+                self._changed.notify_all()
+            self._pending[key] = offer_data
+            self._queued += 1
+            self._metrics["queued"] += 1
+
+    def flush(self, timeout=None):
+        """Wait until every offer queued before the call is committed; returns False on timeout."""
+        with self._changed:
+            target = self._queued
+            self._urgent = True
+            self._changed.notify_all()
+            return self._changed.wait_for(lambda: self._committed >= target, timeout)
+
+    def flush_once(self):
+        """Commit what is pending now, in the calling thread; returns the number of offers written."""
+        with self._flush_lock:
+            return self._flush_once()
+
+    def _flush_once(self):
+        with self._changed:
+            batch, self._pending = self._pending, {}
+            self._inflight = batch
+            target = self._queued
+            self._urgent = False
+        started = time.perf_counter()
+        items = list(batch.items())
+        written, done, errors, down = 0, set(), {}, False
+        with metrics.timer("write_behind.flush"):
+            for i in range(0, len(items), self.batch_size):
+                chunk = dict(items[i:i + self.batch_size])
+                try:
+                    written += self.store.save_offers(chunk)
+                    done.update(chunk)
+                except Exception:
+                    chunk_written, down = self._save_each(chunk, done, errors)
+                    written += chunk_written
+                    if down:
+                        break
+
+        with self._changed:
+            self._inflight = {}
+            retry = 0
+            for key, offer_data in batch.items():
+                if key in done or key in self._pending:
+                    # Written, or replaced by a newer offer that starts with a clean slate
+                    self._failures.pop(key, None)
+                    continue
+                if key in errors and not down:
+                    attempts = self._failures.get(key, 0) + 1
+                    if attempts >= self.max_attempts:
+                        self._failures.pop(key, None)
+                        logger.error("Dropping offer of %r in trade %r after %d failed writes: %r",
+                                     key[1], key[0], attempts, errors[key])
+                        self._metrics["dropped"] += 1
+                        metrics.count("write_behind.dropped")
+                        continue
+                    self._failures[key] = attempts
+                # Goes back behind anything queued meanwhile, so failing offers stop going first
+                self._pending[key] = offer_data
+                retry += 1
+            if retry:
+                self._metrics["last_error"] = repr(next(reversed(errors.values())))
+            else:
+                self._committed = max(self._committed, target)
+                self._metrics["last_error"] = None
+            self._metrics["flushes"] += 1
+            self._metrics["offers_flushed"] += written
+            self._metrics["last_flush_seconds"] = time.perf_counter() - started
+            self._changed.notify_all()
+        if retry:
+            raise next(reversed(errors.values()))
+        return written
+
+    def _save_each(self, chunk, done, errors):
+        """Write ``chunk`` one offer at a time into ``done`` / ``errors``; returns ``(written, backend down)``."""
+        written = failed = 0
+        for key, offer_data in chunk.items():
+            try:
+                written += self.store.save_offers({key: offer_data})
+                done.add(key)
+            except Exception as e:
+                errors[key] = e
+                failed += 1
+                if not done and failed >= OUTAGE_FAILURES:
+                    return written, True
+        return written, False
+
+    # === Reading your own writes ===
+    def pending_offer(self, trade_code, user):
+        """The offer queued for ``user`` that is not committed yet, or None."""
+        key = (trade_code, user)
+        with self._changed:
+            return self._pending.get(key, self._inflight.get(key))
+
+    def get_offers(self, trade_code):
+        """The backend's ``get_offers`` with queued offers applied on top.
+
+        Queued rows keep the version of the last committed one (0 if none).
+        """
+        # Snapshot first: anything missing from it was already committed before the read below
+        with self._changed:
+            queued = {user: offer for (code, user), offer in {**self._inflight, **self._pending}.items()
+                      if code == trade_code}
+        rows = {user: (user, offer, version) for user, offer, version in self.store.get_offers(trade_code)}
+        for user, offer in queued.items():
+            rows[user] = (user, offer, rows[user][2] if user in rows else 0)
+        return list(rows.values())